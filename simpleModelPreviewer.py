@@ -4,55 +4,72 @@
 # Email: jianming[dot]tom[at]gmail[dot]com
 # Description:  This is a model preview plugin for baseFX's test. Tested under Maya 2014 x64.
 # License: GPL v3
+# Usage:
+#   import simpleModelPreviewer
+#   simpleModelPreviewer.show()
 # Points to mention:
 # 1. Right after load the geometry, this plugin moves the imported geometry root parents as a whole to the origin automatically.
+#    Heavy models are drawn through decimated or bounding box proxies, the full geometry is only rendered, see smp_proxy.py.
+#    Every model is imported into its own namespace and loading the next one unloads it completely, see smp_assets.py.
 # 2. This plugin automatically sets a simple simulated skylight configuration created from multiple directional lights.
+#    Cheaper rigs with the same light energy can be chosen in Sky Light Rig, see smp_skyrig.py.
 # 3. After load the geometry from a file, one single click of rendering button will start the batch rendering on the automatically created camera motion with the default configuration
+#    The camera motion is baked into animation curves, turntable, multiple rings or an elevation sweep, see smp_orbit.py.
+#    The camera distance is solved from the model bounds and the aperture so the model stays in frame all around, see smp_framing.py.
+#    Render Mode sparse renders a few views of the orbit as stills, progressive renders every 64th frame first and fills in.
+#    Quality draft renders a fast half resolution look into a draft folder, final renders the draft first, then full quality. Untick Draft First to skip the draft.
 # 4. To use the materials, user must manually load the material.ma file attached
-# 5. Latest version of this code can be found at https://github.com/tomriddle1234/mayatools/
+#    The file is referenced once, its shaders are found in the file and get reusable shading groups, see smp_matlib.py.
+#    Materials can also be assigned by rules from a <model>.materials.json file next to the model, see smp_materials.py.
+#    While frames are rendered they are streamed into a turntable movie and a contact sheet with ffmpeg, see smp_encode.py.
+#    Renders run in the background, the window shows their progress and time left and Cancel Render stops them, see smp_monitor.py.
+#    Material Variants renders the model in every material of the library in one job, a render layer and a folder each, see smp_variants.py.
+# 5. Set SMP_PROFILE=1 to write stage timings and maya.cmds call counts of every model to ~/smp_profiles, see smp_profile.py.
+# 6. This file is the window only. The pipeline is smp_core.py and its settings smp_settings.py, importing either one
+#    has no side effects. Settings are saved and loaded as presets, shared by the window and the batch driver.
+# 7. Latest version of this code can be found at https://github.com/tomriddle1234/mayatools/
 
 
 import os
+import threading
 
 import maya.cmds as cmds
-import maya.mel
-
-
-class simpleModelPreviewer(object):
+import maya.utils
+
+import smp_core
+import smp_encode
+import smp_monitor
+import smp_orbit
+import smp_profile
+import smp_proxy
+import smp_quality
+import smp_render
+import smp_scenecache
+import smp_settings
+import smp_skyrig
+
+
+class simpleModelPreviewer(smp_core.ModelPreviewer):
     def __init__(self, *args):
+        smp_core.ModelPreviewer.__init__(self)
         self._name = "simpleModelPreviewer"
         self._title = "Simple Model Previewer"
 
         self._modelFilePath = ""
-        self.renderOutputFilePath = ""
 
         self.meshList = []
+        self.materialOption = None
 
-        self.materialStrList = ["rock", "plastic", "glass", "wood"]
-
-        self.frameLength = 60.0
-        self.animationFPS = 24
-
-        self.totalFramenumber = int(self.frameLength * self.animationFPS)
-        self.startFrame = 1
-        self.endFrame = self.totalFramenumber
-
-        self.outputWidth = 720
-        self.outputHeight = 576
-        self.deviceAspectRatio = 720.0 / 576.0
-        self.pixelAspectRatio = 1.0
-
-        self.outputFormat = "png"
-        self.outputFormatID = 32
-
-        # config maya unit
-        cmds.currentUnit(angle='degree', time='film')
+        self.renderProgressBar = None
+        self.renderStatusText = None
 
     def show(self):
+        self.set_scene_units()
         self.createLayout()
 
     def createLayout(self):
         # create UI
+        settings = self.settings
         win = self._name
         if cmds.window(win, ex=True):
             cmds.deleteUI(win)
@@ -89,17 +106,28 @@ class simpleModelPreviewer(object):
         self.button3 = cmds.button("Create Camera and Motion", c=self.create_camera)
         self.button4 = cmds.button("Adjust Camera and Motion", c=self.adjust_camera)
         cmds.text("Animation Length (seconds):")
-        self.frameLengthField = cmds.floatField(minValue=0.0, value=self.frameLength, precision=2,
+        self.frameLengthField = cmds.floatField(minValue=0.0, value=settings.frameLength, precision=2,
                                                 changeCommand=self.config_animation_length)
         cmds.text("Animation FPS:")
         self.animationFPSOption = cmds.optionMenu(changeCommand=self.config_animation_fps)
-        cmds.menuItem(label="12")
-        cmds.menuItem(label="24")
-        cmds.menuItem(label="25")
-        cmds.menuItem(label="30")
-        cmds.menuItem(label="50")
-        cmds.menuItem(label="60")
-        cmds.optionMenu(self.animationFPSOption, e=True, value="24")
+        for fps in smp_settings.FPS_CHOICES:
+            cmds.menuItem(label=str(fps))
+        cmds.optionMenu(self.animationFPSOption, e=True, value=str(settings.animationFPS))
+        cmds.text("Camera Orbit:")
+        self.orbitOption = cmds.optionMenu(changeCommand=self.on_orbit_change)
+        for orbit in smp_orbit.ORBIT_NAMES:
+            cmds.menuItem(label=orbit)
+        cmds.optionMenu(self.orbitOption, e=True, value=settings.orbit)
+        cmds.text("Viewport Proxy:")
+        self.viewportProxyOption = cmds.optionMenu(changeCommand=self.on_viewport_proxy_change)
+        for mode in smp_proxy.PROXY_MODES:
+            cmds.menuItem(label=mode)
+        cmds.optionMenu(self.viewportProxyOption, e=True, value=settings.viewportProxy)
+        cmds.text("Sky Light Rig:")
+        self.skyRigOption = cmds.optionMenu(changeCommand=self.on_sky_rig_change)
+        for strategy in smp_skyrig.STRATEGY_NAMES:
+            cmds.menuItem(label=strategy)
+        cmds.optionMenu(self.skyRigOption, e=True, value=settings.skyRig)
 
         cmds.setParent("..")
         cmds.separator()
@@ -119,12 +147,12 @@ class simpleModelPreviewer(object):
                              rs=[(1, 5), (2, 5)])
 
         self.materialOption = cmds.optionMenu()
-        cmds.menuItem(label="rock")
-        cmds.menuItem(label="plastic")
-        cmds.menuItem(label="glass")
-        cmds.menuItem(label="wood")
+        for material in self.materialStrList:
+            cmds.menuItem(label=material)
 
         self.button6 = cmds.button("Assign Material", c=self.config_model_material)
+        cmds.text(label="")
+        cmds.button("Apply Material Rules", c=self.apply_material_rules)
 
         cmds.setParent("..")
         cmds.separator()
@@ -150,23 +178,60 @@ class simpleModelPreviewer(object):
         cmds.menuItem(label="png")
         cmds.menuItem(label="tif")
         cmds.menuItem(label="tga")
+        cmds.optionMenu(self.outputFormatOption, e=True, value=settings.outputFormat)
 
         cmds.text("Start Frame:")
-        self.startFrameField = cmds.intField(minValue=1, value=1, changeCommand=self.on_start_frame_change)
+        self.startFrameField = cmds.intField(minValue=1, value=settings.startFrame,
+                                             changeCommand=self.on_start_frame_change)
         cmds.text("End Frame:")
-        self.endFrameField = cmds.intField(minValue=1, value=self.totalFramenumber,
+        self.endFrameField = cmds.intField(minValue=1, value=settings.endFrame,
                                            changeCommand=self.on_end_frame_change)
 
         cmds.text("Output Width:")
-        self.outputWidthField = cmds.intField(minValue=0, value=self.outputWidth,
+        self.outputWidthField = cmds.intField(minValue=0, value=settings.outputWidth,
                                               changeCommand=self.on_output_width_change)
         cmds.text("OutputHeight:")
-        self.outputHeightField = cmds.intField(minValue=0, value=self.outputHeight,
+        self.outputHeightField = cmds.intField(minValue=0, value=settings.outputHeight,
                                                changeCommand=self.on_output_height_change)
 
+        cmds.text("Render Processes:")
+        self.renderProcessesField = cmds.intField(minValue=1, value=settings.renderProcesses,
+                                                  changeCommand=self.on_render_processes_change)
+
+        cmds.text("Render Mode:")
+        self.renderModeOption = cmds.optionMenu(changeCommand=self.on_render_mode_change)
+        for mode in smp_render.RENDER_MODES:
+            cmds.menuItem(label=mode)
+        cmds.optionMenu(self.renderModeOption, e=True, value=settings.renderMode)
+        cmds.text("Quality:")
+        self.qualityOption = cmds.optionMenu(changeCommand=self.on_quality_change)
+        for tier in smp_quality.TIER_NAMES:
+            cmds.menuItem(label=tier)
+        cmds.optionMenu(self.qualityOption, e=True, value=settings.quality)
+        cmds.text("Draft First:")
+        self.draftPreviewBox = cmds.checkBox(label="draft before final", value=settings.draftPreview,
+                                             changeCommand=self.on_draft_preview_change)
+        cmds.text("Encode Preview:")
+        self.encodePreviewOption = cmds.optionMenu(changeCommand=self.on_encode_preview_change)
+        for mode in smp_encode.ENCODE_MODES:
+            cmds.menuItem(label=mode)
+        cmds.optionMenu(self.encodePreviewOption, e=True, value=settings.encodePreview)
+        cmds.text("Sparse Views:")
+        self.sparseViewsField = cmds.intField(minValue=1, value=settings.sparseViews,
+                                              changeCommand=self.on_sparse_views_change)
+        cmds.text("Material Variants:")
+        self.renderVariantsBox = cmds.checkBox(label="every material", value=settings.renderVariants,
+                                               changeCommand=self.on_render_variants_change)
+        cmds.button("Save Preset", c=self.save_preset)
+        cmds.button("Load Preset", c=self.load_preset)
+
         cmds.setParent("..")
         cmds.separator()
         self.renderButton = cmds.button("RENDER", width=200, backgroundColor=[0, 1, 0], c=self.renderOutput)
+        self.renderProgressBar = cmds.progressBar(maxValue=100, width=200)
+        self.renderStatusText = cmds.text(label="")
+        self.cancelRenderButton = cmds.button("Cancel Render", width=200, enable=False,
+                                              c=self.on_cancel_batch_render)
         cmds.separator()
 
         cmds.setParent(menu=True)
@@ -183,7 +248,7 @@ class simpleModelPreviewer(object):
             return
 
         self.inputModelFilename = self.load_model_dialog[0]
-        print self.inputModelFilename
+        print(self.inputModelFilename)
         if self.inputModelFilename != "":
             cmds.textFieldButtonGrp(self.button1, text=self.inputModelFilename, e=True)
             cmds.textFieldButtonGrp(self.button7, text=os.path.dirname(self.inputModelFilename), e=True)
@@ -203,29 +268,30 @@ class simpleModelPreviewer(object):
         if not (len(self.load_material_dialog)):
             return
 
-        self.inputMaterialFilename = self.load_material_dialog[0]
-        print self.inputMaterialFilename
+        inputMaterialFilename = self.load_material_dialog[0]
+        print(inputMaterialFilename)
         if self.inputModelFilename != "":
-            cmds.textFieldButtonGrp(self.loadMaterialField, text=self.inputMaterialFilename, e=True)
-            cmds.file(self.inputMaterialFilename, i=True)
-
-            # create SG
-            for i in self.materialStrList:
-                cmds.sets(empty=True, renderable=True,
-                          noSurfaceShader=True, name=i + 'SG')
-                attA = i + '.outColor'
-                attB = i + 'SG.surfaceShader'
-                cmds.connectAttr(attA, attB, force=True)
-
-            if 'rock' in cmds.ls(materials=True):
-                print ("Materials are loaded.")
+            cmds.textFieldButtonGrp(self.loadMaterialField, text=inputMaterialFilename, e=True)
+            self.load_material_library(inputMaterialFilename)
         else:
             print ("Error, material file name is empty.")
 
-
+    def load_material_library(self, filename):
+        materials = smp_core.ModelPreviewer.load_material_library(self, filename)
+        if materials and self.materialOption and cmds.optionMenu(self.materialOption, exists=True):
+            # the menu lists the materials the library actually has
+            for item in cmds.optionMenu(self.materialOption, query=True, itemListLong=True) or []:
+                cmds.deleteUI(item)
+            for material in materials:
+                cmds.menuItem(label=material, parent=self.materialOption)
+        return materials
+
+    @smp_profile.profiled("reload_model")
     def reload_model(self, *args):
         # check self.inputModelFilename
         if self.inputModelFilename:
+            # the model loaded before goes away as a whole, the lights, camera and materials stay
+            self.unload_model()
             # check if scene is empty or show a dialog
             currentMeshList = cmds.ls(geometry=True)
             if len(currentMeshList) > 0:
@@ -243,156 +309,65 @@ class simpleModelPreviewer(object):
                     cmds.button(self.button2, e=True, enable=False)
                     return
 
-            print ("Loading %s..." % self.inputModelFilename)
+            # the prepared scene cached before replaces the open one, the model is not imported and prepared again
+            replaceScene = None
+            cachedScene = self.cached_scene(self.inputModelFilename)
+            if cachedScene and not smp_scenecache.scene_is_untouched():
+                val = cmds.confirmDialog(title='Prepared scene cached.',
+                                         message='This model was prepared before with the same settings. Open the '
+                                                 'prepared scene instead of the current one? Unsaved changes of the '
+                                                 'current scene are lost.',
+                                         button=['Open Prepared', 'Import'], defaultButton='Open Prepared',
+                                         cancelButton='Import', dismissString='Import')
+                replaceScene = val == "Open Prepared"
+
             try:
-                cmds.file(self.inputModelFilename, i=True)
-                print ("Loading is done.")
-            except:
-                print ("Error, unable to load file %s." % self.inputModelFilename)
+                self.import_model(self.inputModelFilename, replaceScene)
+            except Exception as e:
+                print ("Error, unable to load file %s. %s" % (self.inputModelFilename, e))
                 return
-            self.prep_model()
-            self.create_camera()
         else:
             print ("Error, input model filename is empty.")
 
-    def prep_model(self):
-        """
-        prepare newly imported geometry. move them to the origin. mute all the existing lights,
-        """
-        # find all the geometry objects
-        self.allGeometry = cmds.ls(geometry=True)
-        allRoot = []
-
-        # find all root objects
-        for obj in self.allGeometry:
-            objIter = obj
-            while True:
-                parent = cmds.listRelatives(objIter, allParents=True, path=True)
-                if not parent:
-                    allRoot.append(objIter[0])
-                    break
-                objIter = parent
-        # make root objects be unique in the container
-        allRoot = set(allRoot)
-        allRoot = list(allRoot)
-        #select all the root objects
-        cmds.select(allRoot)
-        #move all the root objects as one object to the origin
-        boundingbox_center = cmds.xform(q=True, bb=True, ws=True)
-        cmds.move(-(boundingbox_center[0] + boundingbox_center[3]) / 2.0,
-                  -(boundingbox_center[1] + boundingbox_center[4]) / 2.0,
-                  -(boundingbox_center[2] + boundingbox_center[5]) / 2.0,
-                  absolute=True)
-        cmds.select(None)
-
-        # delete the light group created by this plugin
-        if "SMP_Lights" in cmds.ls("SMP_Lights"):
-            cmds.select("SMP_Lights")
-            cmds.delete()
-        #hide all lights
-        if cmds.ls(type='light'):
-            cmds.select(cmds.ls(type='light'))
-            cmds.hide()
-            cmds.select(None)
-        #create 3 layer of directional lights plus a top light
-        topLayer = []
-        midLayer = []
-        botLayer = []
-        #3 layer at +75, 0, -75 degree
-        angleStep = 5.0
-        topAngle = 75.0
-        midAngle = 0.0
-        botAngle = -75.0
-        #this formula gives the unit light intensity
-        generalIntensity = 1 / (360.0 / angleStep * 3) * 1.5
-        #create circles of lights in a loop
-        angle = 0.0
-        while (angle < 360.0):
-            topLayer.append(cmds.directionalLight(intensity=generalIntensity, rotation=(topAngle, angle, 0)))
-            midLayer.append(cmds.directionalLight(intensity=generalIntensity * 2, rotation=(midAngle, angle, 0)))
-            botLayer.append(cmds.directionalLight(intensity=generalIntensity, rotation=(botAngle, angle, 0)))
-            angle += angleStep
-        #add the top light
-        above = cmds.directionalLight(intensity=generalIntensity * 360 / angleStep * 0.5, rotation=(-90, 0, 0))
-        #organize all lights into group
-        lightLists = topLayer + midLayer + botLayer + [above]
-        cmds.select(lightLists)
-        cmds.group(n="SMP_Lights")
-        cmds.select(None)
-
-    def create_camera(self, *args):
-        # delete SMP_Camera is already exists
-        if "SMP_Camera" in cmds.listCameras():
-            cmds.select("SMP_Camera")
-            cmds.delete()
-        newcam = cmds.camera()
-        # it appears SMP_CameraShape was modified automatically
-        cmds.rename(newcam[0], "SMP_Camera")
-
-        cmds.select(self.allGeometry)
-        # fit camera, factor of 0.5 means the geometry will occupy about half of the fov
-        cmds.viewFit("SMP_CameraShape", an=False, f=0.5)
-        cmds.select("SMP_Camera")
-        cmds.rotate(-20, 0, 0, p=[0, 0, 0], a=True)
-
-        #move camera pivot to origin
-        cmds.move(0, 0, 0, str("SMP_Camera" + ".scalePivot"), str("SMP_Camera" + ".rotatePivot"), a=True)
-        #create an expression for camera motion
-        angleStepPerFrame = str(360.0 / self.totalFramenumber)
-        expr = "SMP_Camera.rotateY=(frame-1) * " + angleStepPerFrame
-        self.camera_motion_expression = cmds.expression(n="SMP_Camera_Motion_Expression",
-                                                        s=expr)
-
-        # adjust play bar
-        cmds.playbackOptions(min=self.startFrame, max=self.endFrame)
-
-    def adjust_camera(self):
-        """
-        Cause the options like frame length can change, so must update the expression here
-        """
-        cmds.select(self.allGeometry)
-        # fit camera, factor of 0.5 means the geometry will occupy about half of the fov
-        cmds.viewFit("SMP_CameraShape", an=False, f=0.5)
-        cmds.select("SMP_Camera")
-        cmds.rotate(-20, 0, 0, p=[0, 0, 0], a=True)
-
-        # move camera pivot to origin
-        cmds.move(0, 0, 0, str("SMP_Camera" + ".scalePivot"), str("SMP_Camera" + ".rotatePivot"), a=True)
-        #create an expression for camera motion
-        angleStepPerFrame = str(360.0 / self.totalFramenumber)
-        expr = "SMP_Camera.rotateY=(frame-1) * " + angleStepPerFrame
-        self.camera_motion_expression = cmds.expression(n="SMP_Camera_Motion_Expression",
-                                                        s=expr)
-        # adjust play bar
-        cmds.playbackOptions(min=self.startFrame, max=self.endFrame)
-
     def config_animation_length(self, *args):
-        self.frameLength = cmds.floatField(self.frameLengthField, query=True, value=True)
-        print(self.frameLength)
-        self.totalFramenumber = int(self.frameLength * self.animationFPS)
+        self.settings.frameLength = cmds.floatField(self.frameLengthField, query=True, value=True)
+        print(self.settings.frameLength)
         self.adjust_camera()
 
     def config_animation_fps(self, *args):
-        self.animationFPS = int(cmds.optionMenu(self.animationFPSOption, query=True, value=True))
-        print(self.animationFPS)
-        self.totalFramenumber = int(self.frameLength * self.animationFPS)
+        self.settings.animationFPS = int(cmds.optionMenu(self.animationFPSOption, query=True, value=True))
+        print(self.settings.animationFPS)
         self.adjust_camera()
 
+    def on_orbit_change(self, *args):
+        self.settings.orbit = cmds.optionMenu(self.orbitOption, query=True, value=True)
+        print(self.settings.orbit)
+        if cmds.ls("SMP_Camera"):
+            self.bake_camera_orbit()
+
+    def on_viewport_proxy_change(self, *args):
+        self.settings.viewportProxy = cmds.optionMenu(self.viewportProxyOption, query=True, value=True)
+        print(self.settings.viewportProxy)
+        # the model is centered already, the proxies are built from the scene as it is and not cached
+        if self.hierarchy is not None:
+            self.build_viewport_proxies()
+
+    def on_sky_rig_change(self, *args):
+        self.settings.skyRig = cmds.optionMenu(self.skyRigOption, query=True, value=True)
+        print(self.settings.skyRig)
+        # swap the rig right away when a model is loaded
+        if cmds.ls(smp_skyrig.RIG_GROUP):
+            smp_skyrig.ensure_rig(self.settings.skyRig, **self.settings.skyRigOptions)
+
+    @smp_profile.profiled("config_model_material")
     def config_model_material(self, *args):
         # must select geometery to assign the material
-        if not cmds.ls(sl=True):
+        selection = cmds.ls(sl=True, long=True)
+        if not selection:
             print("Please select geometry to assign material")
             return
-        assignable = cmds.filterExpand(sm=(10, 12, 34, 38, 68, 70, 72))
-        if not assignable:
-            print("Selected objects maybe not material assignable.")
         self.currentMaterial = cmds.optionMenu(self.materialOption, query=True, value=True)
-        for i in assignable:
-            cmds.select(i)
-            try:
-                cmds.sets(i, e=True, forceElement=self.currentMaterial + 'SG')
-            except:
-                print("Cannot assign material to %s" % str(i))
+        self.assign_material(self.currentMaterial, selection)
 
     def config_output_path(self, *args):
         self.output_path_dialog = cmds.fileDialog2(dir=os.path.dirname(self.inputModelFilename), dialogStyle=2, fm=3)
@@ -401,104 +376,145 @@ class simpleModelPreviewer(object):
         cmds.textFieldButtonGrp(self.button7, text=self.renderOutputFilePath, e=True)
 
     def on_output_path_text_changed(self, *args):
-        self.renderOutputFilePath = cmds.textFieldButtonGrp(self.button7, query=True)
+        self.renderOutputFilePath = cmds.textFieldButtonGrp(self.button7, query=True, text=True)
 
     def on_output_format_change(self, *arg):
-        self.outputFormat = cmds.optionMenu(self.outputFormatOption, query=True, value=True)
-        print (self.outputFormat)
-
-        if self.outputFormat == "png":
-            self.outputFormatID = 32
-        elif self.outputFormat == "tif":
-            self.outputFormatID = 3
-        elif self.outputFormat == "tga":
-            self.outputFormatID = 19
+        outputFormat = cmds.optionMenu(self.outputFormatOption, query=True, value=True)
+        print (outputFormat)
+
+        if outputFormat in smp_settings.OUTPUT_FORMAT_IDS:
+            self.settings.outputFormat = outputFormat
         else:
             print ("Using unsupported file format")
 
     def on_start_frame_change(self, *arg):
-        self.startFrame = cmds.intField(self.startFrameField, query=True, value=True)
-        print(self.startFrame)
-        cmds.playbackOptions(min=self.startFrame, max=self.endFrame)
+        self.settings.startFrame = cmds.intField(self.startFrameField, query=True, value=True)
+        print(self.settings.startFrame)
+        cmds.playbackOptions(min=self.settings.startFrame, max=self.settings.endFrame)
 
     def on_end_frame_change(self, *arg):
-        self.endFrame = cmds.intField(self.endFrameField, query=True, value=True)
-        print(self.endFrame)
-        cmds.playbackOptions(min=self.startFrame, max=self.endFrame)
+        self.settings.endFrame = cmds.intField(self.endFrameField, query=True, value=True)
+        print(self.settings.endFrame)
+        cmds.playbackOptions(min=self.settings.startFrame, max=self.settings.endFrame)
 
     def on_output_width_change(self, *arg):
-        self.outputWidth = cmds.intField(self.outputWidthField, query=True, value=True)
-        print(self.outputWidth)
+        self.settings.outputWidth = cmds.intField(self.outputWidthField, query=True, value=True)
+        print(self.settings.outputWidth)
 
     def on_output_height_change(self, *arg):
-        self.outputHeight = cmds.intField(self.outputHeightField, query=True, value=True)
-        print(self.outputHeight)
+        self.settings.outputHeight = cmds.intField(self.outputHeightField, query=True, value=True)
+        print(self.settings.outputHeight)
+
+    def on_render_processes_change(self, *arg):
+        self.settings.renderProcesses = cmds.intField(self.renderProcessesField, query=True, value=True)
+        print(self.settings.renderProcesses)
+
+    def on_render_mode_change(self, *arg):
+        self.settings.renderMode = cmds.optionMenu(self.renderModeOption, query=True, value=True)
+        print(self.settings.renderMode)
+
+    def on_quality_change(self, *arg):
+        self.settings.quality = cmds.optionMenu(self.qualityOption, query=True, value=True)
+        print(self.settings.quality)
+
+    def on_draft_preview_change(self, *arg):
+        self.settings.draftPreview = cmds.checkBox(self.draftPreviewBox, query=True, value=True)
+        print(self.settings.draftPreview)
+
+    def on_encode_preview_change(self, *arg):
+        self.settings.encodePreview = cmds.optionMenu(self.encodePreviewOption, query=True, value=True)
+        print(self.settings.encodePreview)
+
+    def on_sparse_views_change(self, *arg):
+        self.settings.sparseViews = cmds.intField(self.sparseViewsField, query=True, value=True)
+        print(self.settings.sparseViews)
+
+    def on_render_variants_change(self, *arg):
+        self.settings.renderVariants = cmds.checkBox(self.renderVariantsBox, query=True, value=True)
+        print(self.settings.renderVariants)
+
+    def save_preset(self, *args):
+        directory = smp_settings.preset_dir()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = cmds.fileDialog2(fileFilter="Presets (*.json)", dir=directory, dialogStyle=2, fm=0)
+        if not path:
+            return
+        try:
+            self.check_settings()
+        except ValueError as e:
+            print ("Error, the preset is not saved. %s" % e)
+            return
+        print ("Preset saved to %s" % smp_settings.save_preset(self.settings, path[0]))
 
+    def load_preset(self, *args):
+        path = cmds.fileDialog2(fileFilter="Presets (*.json)", dir=smp_settings.preset_dir(), dialogStyle=2, fm=1)
+        if not path:
+            return
+        try:
+            settings = smp_settings.load_preset(path[0])
+            settings.validate(smp_core.SCENE_CHOICES)
+        except (IOError, OSError, ValueError) as e:
+            print ("Error, unable to load preset %s. %s" % (path[0], e))
+            return
+        self.settings = settings
+        print ("Preset loaded from %s" % path[0])
+        # the window is built again from the new settings, the loaded model follows them
+        self.createLayout()
+        if cmds.ls("SMP_Camera") and self.hierarchy is not None:
+            self.adjust_camera()
+
+    @smp_profile.profiled("renderOutput")
     def renderOutput(self, *args):
-        # Unlock the render globals' current renderer attribute
-        cmds.setAttr("defaultRenderGlobals.currentRenderer", l=False)
-
-        # Sets the current renderer to maya software
-        cmds.setAttr("defaultRenderGlobals.currentRenderer", "mayaSoftware", type="string")
-
-
-        # Set render bg color
-        cmds.setAttr("SMP_CameraShape.backgroundColor", 0.451, 0.451, 0.451)
-        # Set camera aspect ratio
-        cmds.setAttr("SMP_CameraShape.cameraAperture", 1.181 / 720.0 * self.outputWidth, 0.945)
-        # Set renderable camera
-        cameralist = cmds.listCameras()
-        for i in cameralist:
-            cmds.setAttr(i + "Shape.renderable", 0)
-        cmds.setAttr("SMP_CameraShape.renderable", 1)
-
-        # Set output format
-        cmds.setAttr("defaultRenderGlobals.imageFormat", self.outputFormatID)
-
-        # Set output file path, as a better practice, it shouldn't be set to places other than the project_path/images
-        # cmds.workspace(fr=["images", self.renderOutputFilePath])
-        # cmds.workspace(u=True)
-        # cmds.workspace(s=True)
-        # cmds.file(s=True)
-
-        cmds.setAttr("defaultRenderGlobals.outFormatControl", 0)
-        cmds.setAttr("defaultRenderGlobals.animation", 1)
-        cmds.setAttr("defaultRenderGlobals.putFrameBeforeExt", 1)
-        cmds.setAttr("defaultRenderGlobals.extensionPadding", 4)
-        cmds.setAttr("defaultRenderGlobals.periodInExt", 1)
-
-        # Set start and end frame
-        cmds.setAttr("defaultRenderGlobals.startFrame", self.startFrame)
-        cmds.setAttr("defaultRenderGlobals.endFrame", self.endFrame)
-
-        # Set resolution
-        cmds.select("defaultRenderGlobals")
-        cmds.setAttr("defaultResolution.width", self.outputWidth)
-        cmds.setAttr("defaultResolution.height", self.outputHeight)
-
-        # Set aspect Ratio
-        cmds.setAttr("defaultResolution.aspectLock", 1)
-        cmds.setAttr("defaultResolution.pixelAspect", self.pixelAspectRatio)
-        cmds.setAttr("defaultResolution.deviceAspectRatio", self.deviceAspectRatio)
-
-
-        # Set High quality
-        cmds.setAttr("defaultRenderQuality.edgeAntiAliasing", 1)
-        cmds.setAttr("defaultRenderQuality.enableRaytracing", 1)
-        cmds.setAttr("defaultRenderQuality.reflections", 2)
-
-        # render! somehow cmds.batchRender() refuse to work
+        outputDir, prefix = self.render_output_location()
+
+        # the draft tier first for a fast look, then the chosen quality, unless Draft First is off
+        jobs = self.prepare_render_jobs(outputDir, prefix)
+
+        # render! the frame range is shared between local render processes, frames already on disk are skipped
         print("Start Batch Rendering.")
-        maya.mel.eval("mayaBatchRender();")
-        print("Batch Rendering in SMP is submitted, please check maya output for rendering progress.")
+        self.enable_cancel_render(True)
+        renderThread = threading.Thread(target=self.run_render_jobs_in_background, args=(jobs,))
+        renderThread.daemon = True
+        renderThread.start()
+        print("Batch Rendering in SMP is submitted to %d render processes, images are written to %s." %
+              (self.settings.renderProcesses, outputDir))
+
+    def run_render_jobs_in_background(self, jobs):
+        try:
+            self.run_render_jobs(jobs, self.on_render_progress)
+        finally:
+            maya.utils.executeDeferred(self.enable_cancel_render, False)
+            # the render stage ran on this thread, its report is written from the main thread
+            if self.profiler.enabled:
+                maya.utils.executeDeferred(self.profiler.write)
+
+    def on_render_progress(self, tier, status):
+        # called from the monitor thread, the window is only touched from the main thread
+        maya.utils.executeDeferred(self.show_render_progress, tier, status)
+
+    def show_render_progress(self, tier, status):
+        if not self.renderProgressBar or not cmds.progressBar(self.renderProgressBar, exists=True):
+            return
+        cmds.progressBar(self.renderProgressBar, e=True, maxValue=max(1, status["total"]), progress=status["done"])
+        cmds.text(self.renderStatusText, e=True, label="%s: %s" % (tier, smp_monitor.describe(status)))
 
-        # change workspace back
-        # cmds.workspace(fr=[self.renderOutputFilePath, "images"])
+    def enable_cancel_render(self, enable):
+        if self.renderProgressBar and cmds.progressBar(self.renderProgressBar, exists=True):
+            cmds.button(self.cancelRenderButton, e=True, enable=enable)
 
     def on_cancel_batch_render(self, *args):
-        # this never worked in the test. Please use maya menu instead for this function.
-        pass
+        # kills the render processes, the frames they finished stay on disk and a later render resumes from them
+        if not self.cancel_render():
+            print("No render is running.")
+            return
+        print("Cancelling the render, frames already written are kept.")
 
 
-smp = simpleModelPreviewer()
-smp.show()
+def show():
+    """
+    open the previewer window, for the shelf button. Returns the previewer.
+    """
+    smp = simpleModelPreviewer()
+    smp.show()
+    return smp
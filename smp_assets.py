@@ -0,0 +1,67 @@
+# Title: Simple Model Previewer - asset namespaces
+# Description: Imports every model into a namespace of its own, smpAsset_<file name>, so everything the file brings
+#              along (meshes, its shaders and lights, nested namespaces and references) is one unit. Unloading
+#              the asset removes exactly that namespace and what is in it and flushes the undo queue that would
+#              still hold on to the deleted nodes. The previewer's own nodes, SMP_Lights, SMP_Camera and the
+#              material library, live outside of it and stay for the next asset.
+# License: GPL v3
+
+
+import os
+import re
+
+import maya.cmds as cmds
+
+
+NAMESPACE_PREFIX = "smpAsset_"
+
+
+def asset_namespace(modelFile):
+    """
+    namespace of a model file, named after it so the same file always gets the same one.
+    """
+    base = os.path.splitext(os.path.basename(modelFile))[0]
+    return NAMESPACE_PREFIX + (re.sub(r"\W", "_", base) or "model")
+
+
+def loaded_namespaces():
+    """
+    asset namespaces present in the scene.
+    """
+    namespaces = cmds.namespaceInfo(":", listOnlyNamespaces=True) or []
+    return [ns.lstrip(":") for ns in namespaces if ns.lstrip(":").startswith(NAMESPACE_PREFIX)]
+
+
+def import_asset(modelFile):
+    """
+    import a model file into its namespace, unloading what an earlier import of it left. Returns the namespace.
+    """
+    namespace = asset_namespace(modelFile)
+    if cmds.namespace(exists=namespace):
+        unload_asset(namespace)
+    cmds.file(modelFile, i=True, namespace=namespace, mergeNamespacesOnClash=False)
+    return namespace
+
+
+def remove_references(namespace):
+    # a namespace holding references cannot be removed, the model's own references go first
+    for referenceFile in cmds.file(q=True, reference=True) or []:
+        referenceNamespace = cmds.file(referenceFile, q=True, namespace=True) or ""
+        if (referenceNamespace.lstrip(":") + ":").startswith(namespace + ":"):
+            cmds.file(referenceFile, removeReference=True)
+
+
+def unload_asset(namespace):
+    """
+    delete an asset namespace with all of its nodes. Nothing outside the namespace is touched.
+    """
+    if not cmds.namespace(exists=namespace):
+        return
+    remove_references(namespace)
+    cmds.namespace(removeNamespace=namespace, deleteNamespaceContent=True)
+    # the undo queue keeps deleted nodes alive
+    cmds.flushUndo()
+
+
+def in_asset(node, namespace):
+    return node.split("|")[-1].lstrip(":").startswith(namespace + ":")
@@ -0,0 +1,430 @@
+# Title: Simple Model Previewer - batch turntable driver
+# Description: Runs the Simple Model Previewer pipeline (load, center, light, camera, render) headless over many model
+#              files. Every asset is handled by one worker process of a pool, each worker owning one scene at a time,
+#              and a json manifest with one result per asset is written to the output directory. A worker that dies
+#              (mayapy crashing on an asset) fails its asset, the rest of the batch goes on.
+# License: GPL v3
+# Usage:
+#   mayapy smp_batch.py -o /renders/tonight -j 8 "/assets/chairs/*.mb" /assets/table.ma
+#   python smp_batch.py --fake --no-render -o /tmp/smp_test model_a.ma model_b.ma
+#   mayapy smp_batch.py --preset hd_final --quality draft -o /renders/tonight /assets
+#   mayapy smp_batch.py --no-draft-first -o /renders/tonight /assets
+
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+try:
+    from multiprocessing import SimpleQueue
+except ImportError:
+    # python 2
+    from multiprocessing.queues import SimpleQueue
+
+import smp_encode
+import smp_monitor
+import smp_profile
+import smp_quality
+import smp_render
+import smp_settings
+
+
+MODEL_EXTENSIONS = (".ma", ".mb", ".obj", ".fbx")
+MANIFEST_NAME = "smp_manifest.json"
+# seconds between two progress lines of the batch
+PROGRESS_INTERVAL = 30.0
+# seconds between two checks of the workers, and how long the worker of an asset may be gone before the asset
+# counts as lost, a worker leaving after its last asset (--max-assets-per-worker) hands in the result first
+WORKER_POLL = 1.0
+WORKER_GRACE = 5.0
+
+# previewer of a worker process, kept from one asset to the next along with its lights, camera and materials
+_workerPreviewer = None
+# queue a worker announces the assets it starts on, (output folder, process id), so the batch knows whose they are
+_startedQueue = None
+
+# settings of the batch workers that differ from the window, nobody looks at the viewport of a worker unless the
+# batch is asked to build the proxy caches. The proxies are not part of the prepared scene cache key, the window
+# opens the scenes prepared here with its own proxies
+BATCH_DEFAULTS = {"viewportProxy": "none"}
+
+
+def expand_inputs(patterns):
+    """
+    turn a list of files, directories and glob patterns into a sorted list of unique model files.
+    """
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, f) for f in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern) or [pattern]
+        for path in matches:
+            if os.path.splitext(path)[1].lower() not in MODEL_EXTENSIONS:
+                continue
+            path = os.path.abspath(path)
+            if path not in found:
+                found.append(path)
+    return sorted(found)
+
+
+def asset_output_dirs(assets, outputRoot):
+    """
+    give every asset its own output folder named after the file, numbered when two assets share a name.
+    """
+    dirs = []
+    used = set()
+    for asset in assets:
+        name = os.path.splitext(os.path.basename(asset))[0]
+        candidate = name
+        index = 2
+        while candidate in used:
+            candidate = "%s_%d" % (name, index)
+            index += 1
+        used.add(candidate)
+        dirs.append(os.path.join(outputRoot, candidate))
+    return dirs
+
+
+def apply_settings(smp, settings):
+    """
+    give a previewer instance the batch settings, checked against the choices of the maya side modules as well.
+    """
+    smp.settings = smp_settings.PreviewSettings.from_dict(settings)
+    smp.check_settings()
+
+
+def init_worker(useFake=False, startedQueue=None):
+    """
+    start maya once per worker process. With useFake the stand-in maya module is used instead.
+    """
+    global _startedQueue
+    _startedQueue = startedQueue
+    if useFake:
+        import smp_fakemaya
+        smp_fakemaya.install()
+    else:
+        import maya.standalone
+        maya.standalone.initialize(name="python")
+    import maya.cmds as cmds
+    # nobody undoes anything in a worker, the queue would only hold on to the nodes of unloaded assets
+    cmds.undoInfo(state=False)
+
+
+def process_asset(job):
+    """
+    run the whole preview pipeline for one asset inside a worker and return its manifest entry.
+    The asset before it is unloaded from the scene, after a failure the scene is started over.
+    """
+    global _workerPreviewer
+    asset, outputDir, settings, renderExecutable = job
+    if _startedQueue is not None:
+        # written straight to the pipe, a crash right after it still leaves the batch knowing who had the asset
+        _startedQueue.put((outputDir, os.getpid()))
+    import maya.cmds as cmds
+    import smp_core
+    import smp_materials
+
+    result = {"asset": asset,
+              "output_dir": outputDir,
+              "scene": None,
+              "status": "failed",
+              "error": None,
+              "worker": os.getpid()}
+    start = time.time()
+    smp = _workerPreviewer
+    # kept for the next asset only when this one goes through
+    _workerPreviewer = None
+    try:
+        if not os.path.isdir(outputDir):
+            os.makedirs(outputDir)
+        if smp is None:
+            cmds.file(new=True, force=True)
+            smp = smp_core.ModelPreviewer()
+            smp.cancelStalledRenders = True
+            smp.replaceScene = True
+        else:
+            smp.unload_model()
+        # stays the same from asset to asset when unloading leaves nothing behind
+        result["scene_nodes"] = len(cmds.ls() or [])
+        # the profile of an asset goes next to its renders
+        smp.profiler.reportDir = outputDir
+        smp.profiler.reportName = smp_profile.REPORT_NAME
+        apply_settings(smp, settings)
+        smp.renderOutputFilePath = os.path.join(outputDir, smp_render.IMAGE_PREFIX)
+        smp.import_model(asset)
+        if smp.settings.inputMaterialFilename:
+            smp.load_material_library(smp.settings.inputMaterialFilename)
+        if smp.settings.materialRules or os.path.isfile(smp_materials.asset_rules_path(asset)):
+            smp.apply_material_rules()
+            result["material_failures"] = smp.materialFailures
+        result["load"] = smp.lastLoad
+        result["frames"] = [smp.settings.startFrame, smp.settings.endFrame]
+
+        # the draft tier first, then the chosen quality, unless the draft pre-pass is off
+        jobs = []
+        for tier in smp_quality.render_tiers(smp.settings.quality, smp.settings.draftPreview):
+            tierDir = smp_quality.tier_output_dir(outputDir, tier)
+            result["scene"] = smp.write_render_scene(tierDir, tier)
+            if renderExecutable:
+                # frames left by an earlier run of the same asset are not rendered again
+                scheduler, keys = smp.prepare_render_job(result["scene"], tierDir,
+                                                         renderExecutable=renderExecutable)
+                jobs.append((tier, scheduler, keys))
+        if jobs:
+            result["render"] = {}
+            for tier, report in smp.run_render_jobs(jobs).items():
+                result["render"][tier] = dict((key, report.get(key)) for key in ("chunks", "skipped", "rendered",
+                                                                                  "cached", "seconds"))
+                result["render"][tier]["seconds_per_frame"] = report["quality"]["seconds_per_frame"]
+                result["render"][tier]["state"] = report["progress"]["state"]
+                result["render"][tier]["encode"] = report.get("encode")
+                result["render"][tier]["variants"] = report.get("layers")
+                if report["missing"]:
+                    raise RuntimeError("%d frames of the %s tier failed to render" % (len(report["missing"]), tier))
+        result["status"] = "ok"
+        _workerPreviewer = smp
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+    result["seconds"] = round(time.time() - start, 3)
+    if smp is not None and smp.profiler.enabled:
+        result["profile"] = smp.profiler.write()
+    return result
+
+
+def render_folders(outputDirs, tiers):
+    return [smp_quality.tier_output_dir(outputDir, tier) for outputDir in outputDirs for tier in tiers]
+
+
+def print_progress(outputDirs, tiers, start):
+    """
+    one line of the progress of the renders running in the workers, from their progress files.
+    """
+    totals, statuses = smp_monitor.folders_progress(render_folders(outputDirs, tiers))
+    if not statuses:
+        return
+    print("[%s] %d/%d frames, %.1f frames/min, %d rendering, %d stalled, %d failed, %d done." %
+          (smp_monitor.format_seconds(time.time() - start), totals["done"], totals["total"],
+           totals["frames_per_minute"], totals["states"][smp_monitor.RENDERING],
+           totals["states"][smp_monitor.STALLED], totals["states"][smp_monitor.FAILED],
+           totals["states"][smp_monitor.DONE]))
+    for status in statuses:
+        if status["state"] == smp_monitor.STALLED:
+            print("  stalled: %s" % status["output_dir"])
+
+
+def lost_result(job, pid):
+    asset, outputDir, settings, renderExecutable = job
+    return {"asset": asset,
+            "output_dir": outputDir,
+            "scene": None,
+            "status": "failed",
+            "error": "WorkerDied: worker process %d exited while processing the asset" % pid,
+            "worker": pid}
+
+
+def wait_for_results(pool, jobs, pending, startedQueue, progress=None, progressInterval=PROGRESS_INTERVAL):
+    """
+    wait for the result of every job. The asset of a worker that died is given a failed result instead, the pool
+    starts a new worker for the assets left. progress() is called every progressInterval seconds.
+    Returns the results in the order of the jobs and the number of lost assets.
+    """
+    results = [None] * len(jobs)
+    index = dict((job[1], i) for i, job in enumerate(jobs))
+    workerOf = {}
+    goneSince = {}
+    lastProgress = time.time()
+    while True:
+        while not startedQueue.empty():
+            outputDir, pid = startedQueue.get()
+            workerOf[index[outputDir]] = pid
+        # the pool replaces dead workers, the ones it holds now are the living ones
+        alive = set(process.pid for process in pool._pool if process.is_alive())
+        now = time.time()
+        for i, result in enumerate(pending):
+            if results[i] is not None or not result.ready() and workerOf.get(i) in alive:
+                goneSince.pop(i, None)
+                continue
+            if result.ready():
+                results[i] = result.get()
+            elif i in workerOf:
+                if now - goneSince.setdefault(i, now) > WORKER_GRACE:
+                    results[i] = lost_result(jobs[i], workerOf[i])
+                    print("failed %s, worker %d died" % (jobs[i][0], workerOf[i]))
+        if all(result is not None for result in results):
+            return results, len([i for i, result in enumerate(pending) if not result.ready()])
+        # short waits keep the parent responsive to Ctrl+C
+        waiting = [result for i, result in enumerate(pending) if results[i] is None]
+        waiting[0].wait(WORKER_POLL)
+        if progress and progressInterval and time.time() - lastProgress >= progressInterval:
+            progress()
+            lastProgress = time.time()
+
+
+def run_batch(assets, outputRoot, workers=None, settings=None, render=True, renderExecutable=None,
+              useFake=False, maxAssetsPerWorker=None, progressInterval=PROGRESS_INTERVAL):
+    """
+    process every asset on a pool of worker processes and write the manifest. Returns the manifest dictionary.
+    The settings are checked before any worker starts, ValueError names what is wrong with them. An asset whose
+    worker dies is recorded as failed.
+    """
+    settings = dict(BATCH_DEFAULTS, **(settings or {}))
+    workers = workers or multiprocessing.cpu_count()
+    # the cores are shared between the assets rendering at the same time
+    settings.setdefault("renderProcesses", max(1, multiprocessing.cpu_count() // workers))
+    previewSettings = smp_settings.PreviewSettings.from_dict(settings).validate()
+    tiers = smp_quality.render_tiers(previewSettings.quality, previewSettings.draftPreview)
+    if not render:
+        renderExecutable = None
+    elif not renderExecutable:
+        renderExecutable = smp_render.default_render_executable()
+
+    if not os.path.isdir(outputRoot):
+        os.makedirs(outputRoot)
+    jobs = [(asset, outputDir, settings, renderExecutable)
+            for asset, outputDir in zip(assets, asset_output_dirs(assets, outputRoot))]
+
+    start = time.time()
+    startedQueue = SimpleQueue()
+    pool = multiprocessing.Pool(processes=min(workers, max(len(jobs), 1)),
+                                initializer=init_worker,
+                                initargs=(useFake, startedQueue),
+                                maxtasksperchild=maxAssetsPerWorker)
+    finished = False
+    try:
+        # one task per asset, so a dead worker takes only its own asset down
+        pending = [pool.apply_async(process_asset, (job,)) for job in jobs]
+        progress = None
+        if render:
+            progress = lambda: print_progress([outputDir for asset, outputDir, _, _ in jobs], tiers, start)
+        results, lost = wait_for_results(pool, jobs, pending, startedQueue, progress, progressInterval)
+        finished = not lost
+    finally:
+        # the pool keeps waiting for the tasks of dead workers, it is only closed when every task came back
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+
+    manifest = {"output_root": os.path.abspath(outputRoot),
+                "workers": workers,
+                "settings": settings,
+                "seconds": round(time.time() - start, 3),
+                "succeeded": len([r for r in results if r["status"] == "ok"]),
+                "failed": len([r for r in results if r["status"] != "ok"]),
+                "assets": results}
+    with open(os.path.join(outputRoot, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Render preview turntables for many model files.")
+    parser.add_argument("inputs", nargs="+", help="model files, directories or glob patterns")
+    parser.add_argument("-o", "--output", required=True, help="output root, one sub folder per asset")
+    parser.add_argument("-j", "--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument("--preset",
+                        help="settings preset, a name in $%s or ~/smp_presets or a json file, the options below "
+                             "override it" % smp_settings.PRESET_ENV_VAR)
+    parser.add_argument("--length", type=float, dest="frameLength", help="animation length in seconds")
+    parser.add_argument("--fps", type=int, dest="animationFPS", help="animation frames per second")
+    parser.add_argument("--width", type=int, dest="outputWidth", help="output width")
+    parser.add_argument("--height", type=int, dest="outputHeight", help="output height")
+    parser.add_argument("--format", dest="outputFormat", choices=["png", "tif", "tga"], help="output format")
+    parser.add_argument("--sky-rig", dest="skyRig",
+                        help="sky light rig strategy, full, adaptive, importance, ambient_key or dome (default: full)")
+    parser.add_argument("--orbit", help="camera orbit, turntable, rings or sweep (default: turntable)")
+    parser.add_argument("--render-processes", type=int, dest="renderProcesses",
+                        help="render processes per asset (default: cores divided by workers)")
+    parser.add_argument("--render-mode", dest="renderMode", choices=smp_render.RENDER_MODES,
+                        help="full turntable, sparse views of the orbit or the turntable coarse to fine")
+    parser.add_argument("--quality", choices=smp_quality.TIER_NAMES,
+                        help="draft renders a fast half resolution look, final full quality (default: final)")
+    parser.add_argument("--no-draft-first", dest="draftPreview", action="store_const", const=False,
+                        help="go straight to the final tier, without the draft look rendered before it")
+    parser.add_argument("--encode", dest="encodePreview", choices=smp_encode.ENCODE_MODES,
+                        help="encode a movie, a contact sheet or both from the frames while they render, with "
+                             "ffmpeg or $%s (default: both)" % smp_encode.ENV_VAR)
+    parser.add_argument("--views", type=int, dest="sparseViews", help="azimuths per elevation of a sparse render")
+    parser.add_argument("--no-cache", dest="useRenderCache", action="store_const", const=False,
+                        help="do not reuse or store frames in the render cache")
+    parser.add_argument("--no-scene-cache", dest="useSceneCache", action="store_const", const=False,
+                        help="always import and prepare the models, ignoring prepared scenes cached next to them")
+    parser.add_argument("--tight-framing", dest="tightFraming", action="store_const", const=True,
+                        help="frame the camera on a bounding sphere of the vertices (needs NumPy)")
+    parser.add_argument("--viewport-proxy", dest="viewportProxy",
+                        help="decimated or bbox, build the viewport proxies of heavy models into their cache for "
+                             "later interactive loads (default: none)")
+    parser.add_argument("--material-file", dest="inputMaterialFilename",
+                        help="material library referenced in every asset scene")
+    parser.add_argument("--variants", dest="renderVariants", action="store_const", const=True,
+                        help="render every material of --material-file as a variant in the same job, one render "
+                             "layer and sub folder each")
+    parser.add_argument("--material-rules", dest="materialRulesFile",
+                        help="json material rules applied to every asset, after the <asset>.materials.json ones")
+    parser.add_argument("--profile", action="store_true",
+                        help="write stage timings and maya.cmds call counts to smp_profile.json in every asset folder")
+    parser.add_argument("--stall-timeout", type=float, dest="stallSeconds",
+                        help="cancel the render of an asset after this many seconds without a new frame "
+                             "(default: %d, longer for slow frames)" % smp_monitor.STALL_SECONDS)
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL,
+                        help="seconds between progress lines, 0 for none")
+    parser.add_argument("--no-render", action="store_true", help="only write the prepared scenes")
+    parser.add_argument("--render-executable", help="maya Render command (default: $MAYA_LOCATION/bin/Render)")
+    parser.add_argument("--max-assets-per-worker", type=int, help="restart a worker after this many assets")
+    parser.add_argument("--fake", action="store_true", help="use the stand-in maya module, for testing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    assets = expand_inputs(args.inputs)
+    if not assets:
+        print("Error, no model files found.")
+        return 1
+    settings = {}
+    try:
+        if args.preset:
+            settings = smp_settings.load_preset(args.preset).to_dict(changedOnly=True)
+    except (IOError, OSError, ValueError) as e:
+        print("Error, %s" % e)
+        return 1
+    settings.update((key, getattr(args, key)) for key in smp_settings.SETTING_KEYS
+                    if getattr(args, key, None) is not None)
+    if args.inputMaterialFilename:
+        # the prepared scenes keep a reference to it
+        settings["inputMaterialFilename"] = os.path.abspath(args.inputMaterialFilename)
+    if args.materialRulesFile:
+        with open(args.materialRulesFile) as f:
+            settings["materialRules"] = json.load(f)
+
+    if args.profile:
+        # the workers inherit it
+        os.environ[smp_profile.ENV_VAR] = "1"
+    print("Processing %d assets on %d workers..." % (len(assets), args.workers))
+    try:
+        manifest = run_batch(assets, args.output,
+                             workers=args.workers,
+                             settings=settings,
+                             render=not args.no_render,
+                             renderExecutable=args.render_executable,
+                             useFake=args.fake,
+                             maxAssetsPerWorker=args.max_assets_per_worker,
+                             progressInterval=args.progress_interval)
+    except ValueError as e:
+        print("Error, %s" % e)
+        return 1
+    for result in manifest["assets"]:
+        print("%s %s %s" % (result["status"], result["asset"], result["error"] or ""))
+    print("Done, %d succeeded, %d failed in %.1f seconds." % (manifest["succeeded"], manifest["failed"],
+                                                              manifest["seconds"]))
+    return 0 if manifest["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,444 @@
+# Title: Simple Model Previewer - benchmarks
+# Description: Runs pipeline stages of the Simple Model Previewer on synthetic scenes with the stand-in maya module
+#              and reports how many maya.cmds calls each stage makes as the scene grows. The --suite mode checks
+#              the calls of every stage against a stored baseline, so CI catches scaling regressions. Times are
+#              only checked with --compare-times or SMP_BENCH_TIMES=1, on a quiet machine like the baseline's.
+# License: GPL v3
+# Usage:
+#   python smp_benchmark.py
+#   python smp_benchmark.py --sizes 100 1000 10000 --depth 6
+#   mayapy smp_benchmark.py --sky-rig --maya --frames 5
+#   python smp_benchmark.py --scene-cache --sizes 1000 10000
+#   python smp_benchmark.py --materials --faces 200
+#   python smp_benchmark.py --suite                       fails when a stage regressed against the baseline
+#   python smp_benchmark.py --suite --compare-times       the time of every stage as well
+#   python smp_benchmark.py --suite --update-baseline --sizes 10 100 1000
+
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+MATERIALS = ("rock", "plastic", "glass", "wood")
+DEFAULT_SIZES = [10, 100, 1000]
+# the legacy per face loop of --materials slows down with the square of the faces, these finish in seconds
+MATERIAL_SIZES = [10, 100]
+# stages of the regression suite, in pipeline order
+SUITE_STAGES = ("prep_model", "create_camera", "assign_materials", "setup_render")
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "smp_benchmark_baseline.json")
+# a stage regresses when it makes more than 10% more maya.cmds calls, or takes more than twice as long
+# and at least TIME_FLOOR seconds longer than its baseline
+CALL_TOLERANCE = 0.1
+# the stage times of the baseline are a few milliseconds on one machine, comparing them is asked for explicitly
+TIME_ENV_VAR = "SMP_BENCH_TIMES"
+TIME_TOLERANCE = 1.0
+TIME_FLOOR = 0.01
+
+
+def synthetic_scene(shapeCount, depth=3, rootCount=4, materials=None):
+    """
+    describe a scene of rootCount hierarchies, each depth groups deep, with shapeCount unit meshes spread over them.
+    With materials, the meshes are named <material>_geo<n> in turn, targets for name pattern material rules.
+    The result can be written to a file and imported by the stand-in maya module.
+    """
+    nodes = []
+    leaves = []
+    for r in range(rootCount):
+        parent = None
+        for level in range(depth):
+            name = "root%d" % r if level == 0 else "root%d_grp%d" % (r, level)
+            nodes.append({"name": name, "type": "transform", "parent": parent})
+            parent = name
+        leaves.append(parent)
+    for i in range(shapeCount):
+        transform = "geo%d" % i if not materials else "%s_geo%d" % (materials[i % len(materials)], i)
+        offset = float(i % 97)
+        nodes.append({"name": transform, "type": "transform", "parent": leaves[i % rootCount],
+                      "translate": [offset, offset * 0.5, -offset]})
+        nodes.append({"name": transform + "Shape", "type": "mesh", "parent": transform,
+                      "bbox": [-0.5, -0.5, -0.5, 0.5, 0.5, 0.5]})
+    return {"nodes": nodes}
+
+
+def write_scene(scene, directory, name):
+    path = os.path.join(directory, name + ".ma")
+    with open(path, "w") as f:
+        json.dump(scene, f)
+    return path
+
+
+def legacy_find_roots(cmds):
+    """
+    the per-shape parent walk prep_model used before the hierarchy index, kept as the comparison point.
+    """
+    allRoot = []
+    for obj in cmds.ls(geometry=True):
+        objIter = obj
+        while True:
+            parent = cmds.listRelatives(objIter, allParents=True, path=True)
+            if not parent:
+                allRoot.append(objIter[0])
+                break
+            objIter = parent
+    return list(set(allRoot))
+
+
+def legacy_assign_material(cmds, selection, shadingGroup):
+    """
+    the per element loop config_model_material used before smp_materials, one select and one sets call per face.
+    """
+    for i in cmds.filterExpand(selection, sm=(10, 12, 34, 38, 68, 70, 72)) or []:
+        cmds.select(i)
+        try:
+            cmds.sets(i, e=True, forceElement=shadingGroup)
+        except Exception:
+            print("Cannot assign material to %s" % str(i))
+
+
+def create_materials(cmds, materials=MATERIALS):
+    for material in materials:
+        shader = cmds.shadingNode("lambert", asShader=True, name=material)
+        cmds.sets(empty=True, renderable=True, noSurfaceShader=True, name=material + "SG")
+        cmds.connectAttr(shader + ".outColor", material + "SG.surfaceShader", force=True)
+
+
+def measure(cmds, function):
+    cmds.reset_calls()
+    start = time.time()
+    function()
+    return cmds.call_count(), time.time() - start
+
+
+def setup_maya(useMaya=False):
+    """
+    return a call recording maya.cmds, the stand-in one or, with useMaya, the real one of a mayapy session.
+    """
+    import smp_fakemaya
+    if not useMaya:
+        return smp_fakemaya.install()
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+    import maya.cmds
+    recorder = smp_fakemaya.CommandRecorder(maya.cmds)
+    maya.cmds = recorder
+    sys.modules["maya.cmds"] = recorder
+    return recorder
+
+
+def bench_prep_model(sizes, depth):
+    cmds = setup_maya()
+    import smp_core
+
+    rows = []
+    directory = tempfile.mkdtemp(prefix="smp_benchmark_")
+    for size in sizes:
+        path = write_scene(synthetic_scene(size, depth), directory, "scene%d" % size)
+
+        cmds.file(new=True, force=True)
+        cmds.file(path, i=True)
+        legacyCalls, legacyTime = measure(cmds, lambda: legacy_find_roots(cmds))
+
+        cmds.file(new=True, force=True)
+        cmds.file(path, i=True)
+        smp = smp_core.ModelPreviewer()
+        calls, seconds = measure(cmds, smp.prep_model)
+        rows.append({"shapes": size, "depth": depth,
+                     "legacy_root_walk_calls": legacyCalls, "legacy_root_walk_seconds": round(legacyTime, 4),
+                     "prep_model_calls": calls, "prep_model_seconds": round(seconds, 4)})
+    return rows
+
+
+def bench_sky_rig(strategies, frames=3, useMaya=False):
+    """
+    build every sky rig strategy (all of them by default) around a sphere and render a few frames of the turntable with maya software.
+    Render times are only meaningful with useMaya, the stand-in does not draw anything.
+    """
+    cmds = setup_maya(useMaya)
+    import smp_core
+    import smp_skyrig
+
+    rows = []
+    for strategy in strategies or smp_skyrig.STRATEGY_NAMES:
+        cmds.file(new=True, force=True)
+        if useMaya:
+            cmds.polySphere(subdivisionsX=64, subdivisionsY=64)
+        else:
+            cmds.file(write_scene(synthetic_scene(1), tempfile.mkdtemp(prefix="smp_benchmark_"), "sphere"), i=True)
+        smp = smp_core.ModelPreviewer()
+        smp.settings.skyRig = strategy
+        buildCalls, buildTime = measure(cmds, smp.prep_model)
+        smp.create_camera()
+        smp.setup_render()
+
+        frameTimes = []
+        for frame in range(1, frames + 1):
+            cmds.currentTime(frame)
+            frameTimes.append(measure(cmds, lambda: cmds.render("SMP_Camera"))[1])
+        lights = smp_skyrig.light_specs(strategy)
+        rows.append({"strategy": strategy,
+                     "lights": len(lights),
+                     "energy": round(smp_skyrig.rig_energy(lights), 6),
+                     "build_calls": buildCalls,
+                     "build_seconds": round(buildTime, 4),
+                     "render_seconds_per_frame": round(sum(frameTimes) / len(frameTimes), 4)})
+    baseline = rows[0]["render_seconds_per_frame"] if rows else 0.0
+    for row in rows:
+        row["render_time_vs_first"] = round(row["render_seconds_per_frame"] / baseline, 3) if baseline else None
+    return rows
+
+
+def bench_scene_cache(sizes, depth):
+    """
+    load each synthetic scene twice through import_model: cold (import and prepare, then cached) and warm
+    (the cached prepared scene opened directly).
+    """
+    cmds = setup_maya()
+    import smp_core
+
+    rows = []
+    directory = tempfile.mkdtemp(prefix="smp_benchmark_")
+    for size in sizes:
+        path = write_scene(synthetic_scene(size, depth), directory, "scene%d" % size)
+        row = {"shapes": size}
+        for mode in ("cold", "warm"):
+            cmds.file(new=True, force=True)
+            smp = smp_core.ModelPreviewer()
+            calls, seconds = measure(cmds, lambda: smp.import_model(path))
+            row[mode + "_mode"] = smp.lastLoad["mode"]
+            row[mode + "_calls"] = calls
+            row[mode + "_seconds"] = round(seconds, 4)
+        rows.append(row)
+    return rows
+
+
+def bench_materials(sizes, faces, depth):
+    """
+    assign a material to every face of the scene, selected as one face range per shape, with the legacy per element
+    loop and with the bulk assignment; then assign the four materials to the whole scene by rules.
+    """
+    cmds = setup_maya()
+    import smp_materials
+
+    rules = [{"pattern": "geo*1Shape", "material": "glass"},
+             {"root": "root0", "material": "wood"},
+             {"pattern": "geo*[02468]", "material": "rock"},
+             {"material": "plastic"}]
+    rows = []
+    directory = tempfile.mkdtemp(prefix="smp_benchmark_")
+    for size in sizes:
+        path = write_scene(synthetic_scene(size, depth), directory, "scene%d" % size)
+        row = {"shapes": size, "faces": size * faces}
+        for mode in ("legacy", "bulk", "rules"):
+            cmds.file(new=True, force=True)
+            cmds.file(path, i=True)
+            create_materials(cmds)
+            selection = ["%s.f[0:%d]" % (shape, faces - 1) for shape in cmds.ls(geometry=True, long=True)]
+            if mode == "legacy":
+                function = lambda: legacy_assign_material(cmds, selection, "rockSG")
+            elif mode == "bulk":
+                function = lambda: smp_materials.assign({"rockSG": smp_materials.selection_targets(selection)})
+            else:
+                function = lambda: smp_materials.apply_rules(rules)
+            calls, seconds = measure(cmds, function)
+            row[mode + "_calls"] = calls
+            row[mode + "_seconds"] = round(seconds, 4)
+        row["speedup"] = round(row["legacy_seconds"] / row["bulk_seconds"], 1) if row["bulk_seconds"] else None
+        rows.append(row)
+    return rows
+
+
+def bench_suite(sizes, depth, repeat=3):
+    """
+    run the suite stages on synthetic scenes of every size, {size: {stage: {"calls", "seconds"}}}.
+    Each scene is prepared repeat times, the fastest time of a stage is kept.
+    """
+    cmds = setup_maya()
+    import smp_core
+    import smp_materials
+
+    rules = [{"pattern": material + "_*", "material": material} for material in MATERIALS]
+    results = {}
+    directory = tempfile.mkdtemp(prefix="smp_benchmark_")
+    for size in sizes:
+        path = write_scene(synthetic_scene(size, depth, materials=MATERIALS), directory, "suite%d" % size)
+        row = {}
+        for i in range(repeat):
+            cmds.file(new=True, force=True)
+            cmds.file(path, i=True)
+            create_materials(cmds)
+            smp = smp_core.ModelPreviewer()
+            stages = {"prep_model": smp.prep_model,
+                      "create_camera": smp.create_camera,
+                      "assign_materials": lambda: smp_materials.apply_rules(rules, smp.hierarchy),
+                      "setup_render": smp.setup_render}
+            for stage in SUITE_STAGES:
+                calls, seconds = measure(cmds, stages[stage])
+                if stage not in row or seconds < row[stage]["seconds"]:
+                    row[stage] = {"calls": calls, "seconds": round(seconds, 4)}
+        results[str(size)] = row
+    return results
+
+
+def read_baseline(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def python_version():
+    return "%d.%d" % sys.version_info[:2]
+
+
+def write_baseline(path, results, depth):
+    with open(path, "w") as f:
+        json.dump({"depth": depth, "python": python_version(), "results": results}, f, indent=1, sort_keys=True)
+
+
+def compare(results, baseline, callTolerance=CALL_TOLERANCE, timeTolerance=TIME_TOLERANCE, compareTimes=False):
+    """
+    the stages of results that regressed against the baseline, as readable lines. Call counts are always
+    compared, times with compareTimes and only on the python version the baseline was measured with.
+    """
+    regressions = []
+    if compareTimes and baseline.get("python") != python_version():
+        compareTimes = False
+        print("Baseline was measured with python %s, only maya.cmds calls are compared." % baseline.get("python"))
+    for size, stages in sorted(results.items(), key=lambda item: int(item[0])):
+        for stage in SUITE_STAGES:
+            base = baseline["results"].get(size, {}).get(stage)
+            if base is None or stage not in stages:
+                continue
+            value = stages[stage]
+            if value["calls"] > base["calls"] * (1.0 + callTolerance):
+                regressions.append("%s with %s shapes: %d maya.cmds calls, baseline %d" %
+                                   (stage, size, value["calls"], base["calls"]))
+            if compareTimes and value["seconds"] > max(base["seconds"] * (1.0 + timeTolerance), base["seconds"] + TIME_FLOOR):
+                regressions.append("%s with %s shapes: %.4f seconds, baseline %.4f" %
+                                   (stage, size, value["seconds"], base["seconds"]))
+    return regressions
+
+
+def run_suite(args):
+    """
+    run the suite and check it against the stored baseline, or store a new one. Returns the exit code.
+    """
+    baseline = None if args.update_baseline else read_baseline(args.baseline)
+    sizes, depth = args.sizes, args.depth
+    if baseline:
+        # measure what the baseline measured
+        sizes, depth = sorted(int(size) for size in baseline["results"]), baseline["depth"]
+    results = bench_suite(sizes, depth, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print("%8s %18s %10s %10s" % ("shapes", "stage", "calls", "seconds"))
+        for size in sizes:
+            for stage in SUITE_STAGES:
+                value = results[str(size)][stage]
+                print("%8d %18s %10d %10.4f" % (size, stage, value["calls"], value["seconds"]))
+
+    if baseline is None:
+        write_baseline(args.baseline, results, depth)
+        print("Baseline written to %s." % args.baseline)
+        return 0
+    compareTimes = args.compare_times or os.environ.get(TIME_ENV_VAR, "") not in ("", "0")
+    regressions = compare(results, baseline, args.call_tolerance, args.time_tolerance, compareTimes)
+    for regression in regressions:
+        print("Regression, %s" % regression)
+    if regressions:
+        return 1
+    print("No regression against %s." % args.baseline)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count maya.cmds calls of the previewer on synthetic scenes.")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        help="shapes per synthetic scene (default: %s, %s with --materials)" %
+                             (" ".join(map(str, DEFAULT_SIZES)), " ".join(map(str, MATERIAL_SIZES))))
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--sky-rig", action="store_true",
+                        help="compare the sky rig strategies instead, light count, build cost and render time")
+    parser.add_argument("--scene-cache", action="store_true",
+                        help="compare a cold model load with a warm one from the prepared scene cache")
+    parser.add_argument("--materials", action="store_true",
+                        help="compare the per element material assignment loop with the bulk and rule assignment")
+    parser.add_argument("--faces", type=int, default=50, help="faces assigned per shape with --materials")
+    parser.add_argument("--suite", action="store_true",
+                        help="run the regression suite: prep_model, camera, materials and render setup per size, "
+                             "checked against the stored baseline (written when there is none)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file of the suite")
+    parser.add_argument("--update-baseline", action="store_true", help="store the suite results as the baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size in the suite, the fastest counts")
+    parser.add_argument("--call-tolerance", type=float, default=CALL_TOLERANCE,
+                        help="allowed relative increase of maya.cmds calls per stage")
+    parser.add_argument("--compare-times", action="store_true",
+                        help="check the stage times against the baseline as well, also on with $%s=1" %
+                             TIME_ENV_VAR)
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE,
+                        help="allowed relative increase of the time per stage")
+    parser.add_argument("--frames", type=int, default=3, help="frames rendered per sky rig strategy")
+    parser.add_argument("--maya", action="store_true", help="run in a real mayapy session instead of the stand-in")
+    parser.add_argument("--json", action="store_true", help="print the raw results as json")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    args.sizes = args.sizes or (MATERIAL_SIZES if args.materials else DEFAULT_SIZES)
+
+    if args.suite:
+        return run_suite(args)
+
+    if args.sky_rig:
+        rows = bench_sky_rig(None, args.frames, args.maya)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+            return 0
+        print("%12s %8s %10s %12s %16s %10s" % ("strategy", "lights", "energy", "build calls", "render s/frame",
+                                               "vs full"))
+        for row in rows:
+            print("%12s %8d %10.4f %12d %16.4f %10s" % (row["strategy"], row["lights"], row["energy"],
+                                                       row["build_calls"], row["render_seconds_per_frame"],
+                                                       row["render_time_vs_first"]))
+        return 0
+
+    if args.scene_cache:
+        rows = bench_scene_cache(args.sizes, args.depth)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+            return 0
+        print("%8s %12s %12s %12s %12s" % ("shapes", "cold calls", "cold s", "warm calls", "warm s"))
+        for row in rows:
+            print("%8d %12d %12.4f %12d %12.4f" % (row["shapes"], row["cold_calls"], row["cold_seconds"],
+                                                   row["warm_calls"], row["warm_seconds"]))
+        return 0
+
+    if args.materials:
+        rows = bench_materials(args.sizes, args.faces, args.depth)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+            return 0
+        print("%8s %10s %14s %12s %12s %12s %12s %10s" % ("shapes", "faces", "legacy calls", "legacy s",
+                                                           "bulk calls", "bulk s", "rule calls", "speedup"))
+        for row in rows:
+            print("%8d %10d %14d %12.4f %12d %12.4f %12d %10s" % (row["shapes"], row["faces"], row["legacy_calls"],
+                                                                 row["legacy_seconds"], row["bulk_calls"],
+                                                                 row["bulk_seconds"], row["rules_calls"],
+                                                                 row["speedup"]))
+        return 0
+
+    rows = bench_prep_model(args.sizes, args.depth)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print("%8s %8s %18s %18s" % ("shapes", "depth", "legacy root walk", "prep_model"))
+    for row in rows:
+        print("%8d %8d %18d %18d" % (row["shapes"], row["depth"], row["legacy_root_walk_calls"],
+                                      row["prep_model_calls"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+# Title: Simple Model Previewer - render cache
+# Description: Content addressed cache of rendered frames. Every frame gets a key made from the model file hash and
+#              everything that changes its pixels: resolution, aspect, quality flags, the camera transform at that
+#              frame, the light rig and the material assignment. Frames with a known key are copied (or converted
+#              when only the output format changed) instead of rendered. The cache directory is kept under a size
+#              limit by evicting the least recently used frames, so it can live on a shared scratch disk.
+# License: GPL v3
+
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+import maya.cmds as cmds
+
+import smp_render
+import smp_skyrig
+
+
+CACHE_DIR = os.environ.get("SMP_RENDER_CACHE", os.path.join(os.path.expanduser("~"), "smp_cache", "renders"))
+CACHE_SIZE_GB = float(os.environ.get("SMP_RENDER_CACHE_GB", "5"))
+# frame -> key of the images in an output directory, so frames rendered with other settings are not reused
+FRAME_INDEX = "smp_frames.json"
+# frame -> key of the frames a render of the output directory was started for and has not collected yet, so the
+# frames an interrupted render wrote are resumed from and not mistaken for frames of other settings
+PENDING_INDEX = "smp_frames_pending.json"
+IMAGE_EXTENSIONS = ("png", "tif", "tga")
+
+# render settings that change the pixels of a frame. The image format is left out on purpose,
+# a frame cached in another format is converted instead of rendered again.
+RENDER_ATTRS = ("defaultRenderGlobals.currentRenderer",
+                "defaultResolution.width",
+                "defaultResolution.height",
+                "defaultResolution.pixelAspect",
+                "defaultResolution.deviceAspectRatio",
+                "defaultRenderQuality.edgeAntiAliasing",
+                "defaultRenderQuality.enableRaytracing",
+                "defaultRenderQuality.reflections",
+                "SMP_CameraShape.cameraAperture",
+                "SMP_CameraShape.focalLength",
+                "SMP_CameraShape.backgroundColor")
+
+_fileDigests = {}
+
+
+def digest(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    """
+    sha1 of a file's content, remembered for as long as its size and modification time do not change.
+    """
+    stat = os.stat(path)
+    memo = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if memo not in _fileDigests:
+        sha = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        _fileDigests[memo] = sha.hexdigest()
+    return _fileDigests[memo]
+
+
+def material_assignment():
+    """
+    shading group -> (surface shader, sorted members) for every shading group with members.
+    """
+    assignment = {}
+    for sg in cmds.ls(type="shadingEngine") or []:
+        members = cmds.sets(sg, q=True) or []
+        if members:
+            shader = cmds.listConnections(sg + ".surfaceShader") or []
+            assignment[sg] = [shader, sorted(members)]
+    return assignment
+
+
+def scene_state(modelFile, materialFile=None):
+    """
+    everything except the camera that decides what a frame of the prepared scene looks like.
+    """
+    state = {"model": file_digest(modelFile),
+             "materials": file_digest(materialFile) if materialFile and os.path.isfile(materialFile) else None,
+             "render": dict((attr, cmds.getAttr(attr)) for attr in RENDER_ATTRS),
+             "assignment": material_assignment(),
+             "lights": None}
+    if cmds.ls(smp_skyrig.RIG_GROUP) and \
+            cmds.attributeQuery(smp_skyrig.RIG_TAG_ATTR, node=smp_skyrig.RIG_GROUP, exists=True):
+        state["lights"] = cmds.getAttr(smp_skyrig.RIG_GROUP + "." + smp_skyrig.RIG_TAG_ATTR)
+    return state
+
+
+def frame_keys(modelFile, startFrame, endFrame, materialFile=None, camera="SMP_Camera", frames=None):
+    """
+    cache key of every frame of the range, or of the given frames, the scene state combined with the camera world
+    matrix at that frame.
+    """
+    base = digest(scene_state(modelFile, materialFile))
+    keys = {}
+    for frame in range(startFrame, endFrame + 1) if frames is None else frames:
+        matrix = cmds.getAttr(camera + ".worldMatrix", time=frame)
+        keys[frame] = digest([base, [round(value, 5) for value in matrix]])
+    return keys
+
+
+def convert_image(source, destination):
+    """
+    convert between image formats with maya's imgcvt, or PIL when it is installed. Returns False if neither works.
+    """
+    mayaLocation = os.environ.get("MAYA_LOCATION")
+    if mayaLocation:
+        imgcvt = os.path.join(mayaLocation, "bin", "imgcvt")
+        extension = os.path.splitext(destination)[1][1:]
+        try:
+            if subprocess.call([imgcvt, "-t", extension, source, destination]) == 0:
+                return True
+        except OSError:
+            pass
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+    try:
+        Image.open(source).save(destination)
+    except (IOError, OSError, ValueError):
+        # unreadable or truncated cached image, or a format PIL cannot write; the frame is rendered instead
+        if os.path.isfile(destination):
+            os.remove(destination)
+        return False
+    return True
+
+
+class RenderCache(object):
+    """
+    frames stored as <cacheDir>/<key[:2]>/<key>.<extension>. The modification time of a file is its last use.
+    """
+
+    def __init__(self, cacheDir=CACHE_DIR, maxBytes=None):
+        self.cacheDir = cacheDir
+        self.maxBytes = int(CACHE_SIZE_GB * (1 << 30)) if maxBytes is None else maxBytes
+
+    def path(self, key, extension):
+        return os.path.join(self.cacheDir, key[:2], "%s.%s" % (key, extension))
+
+    def lookup(self, key, extension):
+        """
+        cached image of a key, in the wanted format if there is one, else in any other format.
+        """
+        for ext in [extension] + [e for e in IMAGE_EXTENSIONS if e != extension]:
+            path = self.path(key, ext)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def fetch(self, key, destination):
+        """
+        copy or convert the cached image of key to destination. Returns "copied", "converted" or None.
+        """
+        source = self.lookup(key, os.path.splitext(destination)[1][1:])
+        if source is None:
+            return None
+        if os.path.splitext(source)[1] == os.path.splitext(destination)[1]:
+            shutil.copyfile(source, destination)
+            result = "copied"
+        elif convert_image(source, destination):
+            # keep the converted image too, the next run in this format is a plain copy
+            self.store(key, destination, evict=False)
+            result = "converted"
+        else:
+            return None
+        os.utime(source, None)
+        return result
+
+    def store(self, key, source, evict=True):
+        """
+        add an image to the cache. The file is written under a temporary name first and then renamed,
+        so other machines sharing the cache never read half written frames.
+        """
+        destination = self.path(key, os.path.splitext(source)[1][1:])
+        directory = os.path.dirname(destination)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # created by another process in the meantime
+                pass
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(handle)
+        shutil.copyfile(source, temporary)
+        os.rename(temporary, destination)
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """
+        delete the least recently used frames until the cache fits its size limit. Returns the bytes freed.
+        """
+        entries = []
+        total = 0
+        for root, dirs, files in os.walk(self.cacheDir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        freed = 0
+        for mtime, size, path in sorted(entries):
+            if total - freed <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        return freed
+
+    def prepare_output(self, keys, outputDir, extension, prefix=smp_render.IMAGE_PREFIX):
+        """
+        before rendering: remove frames of the output directory rendered with other settings or not recorded at
+        all, then fill in every missing frame the cache knows. The keys of the frames left to render are recorded
+        as pending, a render of them that is interrupted is resumed by the next one. Returns counts of what was
+        done.
+        """
+        index = read_frame_index(outputDir)
+        pending = read_frame_index(outputDir, PENDING_INDEX)
+        stats = {"kept": 0, "stale": 0, "copied": 0, "converted": 0}
+        for frame, key in sorted(keys.items()):
+            path = os.path.join(outputDir, smp_render.frame_filename(frame, extension, prefix))
+            if os.path.isfile(path):
+                resumed = pending.get(str(frame)) == key and \
+                    smp_render.frame_written(outputDir, frame, extension, prefix)
+                if index.get(str(frame)) == key or resumed:
+                    stats["kept"] += 1
+                    continue
+                os.remove(path)
+                stats["stale"] += 1
+            fetched = self.fetch(key, path)
+            if fetched:
+                index[str(frame)] = key
+                stats[fetched] += 1
+        write_frame_index(outputDir, index)
+        write_frame_index(outputDir, dict((str(frame), key) for frame, key in keys.items()
+                                          if index.get(str(frame)) != key), PENDING_INDEX)
+        return stats
+
+    def collect(self, keys, outputDir, extension, prefix=smp_render.IMAGE_PREFIX):
+        """
+        after rendering: store the newly rendered frames in the cache and record their keys, they are no longer
+        pending. Returns the count.
+        """
+        index = read_frame_index(outputDir)
+        pending = read_frame_index(outputDir, PENDING_INDEX)
+        stored = 0
+        for frame, key in sorted(keys.items()):
+            path = os.path.join(outputDir, smp_render.frame_filename(frame, extension, prefix))
+            if index.get(str(frame)) == key or not smp_render.frame_written(outputDir, frame, extension, prefix):
+                continue
+            if not os.path.isfile(self.path(key, extension)):
+                self.store(key, path, evict=False)
+                stored += 1
+            index[str(frame)] = key
+        write_frame_index(outputDir, index)
+        write_frame_index(outputDir, dict((frame, key) for frame, key in pending.items() if index.get(frame) != key),
+                          PENDING_INDEX)
+        if stored:
+            self.evict()
+        return stored
+
+
+def read_frame_index(outputDir, name=FRAME_INDEX):
+    path = os.path.join(outputDir, name)
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_frame_index(outputDir, index, name=FRAME_INDEX):
+    """
+    write an index of the output directory, an empty pending index is removed.
+    """
+    path = os.path.join(outputDir, name)
+    if not index and name == PENDING_INDEX:
+        if os.path.isfile(path):
+            os.remove(path)
+        return
+    if not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+    with open(path, "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
@@ -0,0 +1,560 @@
+# Title: Simple Model Previewer - core
+# Description: The preview pipeline without the window: load a model into its namespace, center it, light it,
+#              frame and orbit the camera, assign materials and render the quality tiers. Importing it does not touch
+#              the scene, and a ModelPreviewer is driven by a PreviewSettings object, see smp_settings. The window
+#              of simpleModelPreviewer.py and the batch workers of smp_batch.py are both built on it.
+# License: GPL v3
+# Usage:
+#   previewer = smp_core.ModelPreviewer(smp_settings.load_preset("hd_final"))
+#   previewer.import_model("/assets/chair.mb")
+#   previewer.render("/renders/chair")
+
+
+import os
+import time
+
+import maya.cmds as cmds
+
+import smp_assets
+import smp_cache
+import smp_encode
+import smp_framing
+import smp_hierarchy
+import smp_materials
+import smp_matlib
+import smp_monitor
+import smp_orbit
+import smp_profile
+import smp_proxy
+import smp_quality
+import smp_render
+import smp_scenecache
+import smp_settings
+import smp_skyrig
+import smp_variants
+
+
+# choices of the settings that depend on the maya side modules, checked on top of smp_settings.CHOICES
+SCENE_CHOICES = {"skyRig": smp_skyrig.STRATEGY_NAMES,
+                 "orbit": smp_orbit.ORBIT_NAMES,
+                 "viewportProxy": smp_proxy.PROXY_MODES}
+
+
+class ModelPreviewer(object):
+    """
+    the preview pipeline of one scene. The settings can be replaced or changed between the steps.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or smp_settings.PreviewSettings()
+
+        self.inputModelFilename = ""
+        self.renderOutputFilePath = ""
+
+        # namespace the loaded model was imported into, see smp_assets
+        self.assetNamespace = None
+        # hierarchy index of the loaded model, see smp_hierarchy
+        self.hierarchy = None
+        self.allGeometry = []
+        # proxies drawn instead of the heavy roots, see smp_proxy
+        self.proxies = {}
+
+        # materials of the loaded material library
+        self.materialStrList = ["rock", "plastic", "glass", "wood"]
+        # members the last material rules could not assign
+        self.materialFailures = []
+
+        self.renderCache = smp_cache.RenderCache()
+        # a cached prepared scene may replace the open one even when it was changed, batch workers own their scene
+        self.replaceScene = False
+        self.lastLoad = None
+
+        # the render job running in the background and its progress, see smp_monitor
+        self.renderScheduler = None
+        self.renderMonitor = None
+        # headless runs cancel stalled renders themselves
+        self.cancelStalledRenders = False
+
+        # stage timings and maya.cmds call counts, on when SMP_PROFILE is set, see smp_profile
+        self.profiler = smp_profile.Profiler()
+
+    def check_settings(self):
+        """
+        raise ValueError when the settings cannot be used.
+        """
+        return self.settings.validate(SCENE_CHOICES)
+
+    def set_scene_units(self):
+        # the orbit is keyed in degrees on film frames
+        cmds.currentUnit(angle='degree', time='film')
+
+    def cached_scene(self, filename):
+        """
+        the prepared scene cached for the model with the current settings, None when there is none.
+        """
+        if not self.settings.useSceneCache:
+            return None
+        cachePath = smp_scenecache.cache_path(filename, self.scene_cache_settings())
+        return cachePath if os.path.isfile(cachePath) else None
+
+    @smp_profile.profiled("import_model")
+    def import_model(self, filename, replaceScene=None):
+        """
+        import the model file, then prepare it and create the camera.
+        When the model was prepared before with the same settings, the cached prepared scene is opened instead, if
+        the open scene may be replaced: it is untouched, or replaceScene (self.replaceScene by default) allows it.
+        """
+        start = time.time()
+        self.profiler.set_asset(filename)
+        self.inputModelFilename = filename
+        self.unload_model()
+        self.set_scene_units()
+        settings = self.settings
+        replaceScene = self.replaceScene if replaceScene is None else replaceScene
+        cachePath = None
+        if settings.useSceneCache:
+            cachePath = smp_scenecache.cache_path(filename, self.scene_cache_settings())
+            if os.path.isfile(cachePath) and (replaceScene or smp_scenecache.scene_is_untouched()):
+                print ("Loading prepared scene %s..." % cachePath)
+                smp_scenecache.open_cached(cachePath, filename)
+                namespace = smp_assets.asset_namespace(filename)
+                self.assetNamespace = namespace if cmds.namespace(exists=namespace) else None
+                self.hierarchy = smp_hierarchy.SceneHierarchy(self.assetNamespace)
+                self.allGeometry = self.hierarchy.shapes
+                if smp_proxy.scene_proxy_mode() == settings.viewportProxy:
+                    self.proxies = smp_proxy.scene_proxies()
+                else:
+                    # the scene was prepared with other proxies, the model is centered so they are built in place
+                    self.build_viewport_proxies()
+                cmds.playbackOptions(min=settings.startFrame, max=settings.endFrame)
+                self.report_load(filename, "warm", start)
+                return
+
+        print ("Loading %s..." % filename)
+        self.assetNamespace = smp_assets.import_asset(filename)
+        print ("Loading is done.")
+        self.prep_model()
+        # the camera of the model before is kept and fitted to this one
+        if cmds.ls("SMP_Camera"):
+            self.adjust_camera()
+        else:
+            self.create_camera()
+        if cachePath:
+            smp_scenecache.store(cachePath)
+        self.report_load(filename, "cold", start)
+
+    @smp_profile.profiled("unload_model")
+    def unload_model(self):
+        """
+        remove the loaded model, its namespaces and its proxies. SMP_Lights, SMP_Camera and the material library
+        stay in the scene for the next model.
+        """
+        smp_proxy.remove_proxies()
+        for namespace in smp_assets.loaded_namespaces():
+            smp_assets.unload_asset(namespace)
+        self.assetNamespace = None
+        self.hierarchy = None
+        self.allGeometry = []
+        self.proxies = {}
+
+    def scene_cache_settings(self):
+        """
+        the settings a prepared scene depends on, part of its cache key. The viewport proxies are left out, a
+        warm load swaps them for the ones of the settings, so the batch and the window share prepared scenes.
+        """
+        settings = self.settings
+        return {"skyRig": settings.skyRig,
+                "skyRigOptions": settings.skyRigOptions,
+                "orbit": settings.orbit,
+                "orbitOptions": settings.orbitOptions,
+                "totalFramenumber": settings.totalFramenumber,
+                # the camera is framed in the prepared scene, its film aperture follows the output width
+                "tightFraming": settings.tightFraming,
+                "outputWidth": settings.outputWidth,
+                "outputHeight": settings.outputHeight}
+
+    def report_load(self, filename, mode, start):
+        self.lastLoad = {"file": filename, "mode": mode, "seconds": round(time.time() - start, 3)}
+        print ("Preparing %s took %.2f seconds (%s load%s)." %
+               (os.path.basename(filename), self.lastLoad["seconds"], mode,
+                ", from the prepared scene cache" if mode == "warm" else ""))
+
+    @smp_profile.profiled("prep_model")
+    def prep_model(self):
+        """
+        prepare newly imported geometry. move them to the origin. mute all the existing lights,
+        """
+        # index the scene hierarchy once, geometry and root objects are then looked up in memory
+        self.hierarchy = smp_hierarchy.SceneHierarchy(self.assetNamespace)
+        self.allGeometry = self.hierarchy.shapes
+        allRoot = self.hierarchy.roots()
+        # proxies are made where the file put the model, they are moved along with it
+        self.build_viewport_proxies(self.inputModelFilename)
+        #move all the root objects as one object to the origin, the bounds come from one query without selecting
+        if allRoot:
+            boundingbox_center = smp_framing.world_bounds(allRoot)
+            cmds.move(-(boundingbox_center[0] + boundingbox_center[3]) / 2.0,
+                      -(boundingbox_center[1] + boundingbox_center[4]) / 2.0,
+                      -(boundingbox_center[2] + boundingbox_center[5]) / 2.0,
+                      allRoot + ([smp_proxy.PROXY_GROUP] if self.proxies else []), relative=True, worldSpace=True)
+
+        #hide all lights except the ones of the sky rig
+        ownLights, otherLights = smp_skyrig.rig_lights(cmds.ls(type='light', long=True) or [])
+        if otherLights:
+            cmds.hide(otherLights)
+        # create the simulated skylight, the rig of an earlier load is reused when it was built the same way
+        smp_skyrig.ensure_rig(self.settings.skyRig, **self.settings.skyRigOptions)
+
+    @smp_profile.profiled("build_viewport_proxies")
+    def build_viewport_proxies(self, modelFile=None):
+        """
+        replace the heavy roots by proxies in the viewport, see smp_proxy. With the model file the proxies are
+        taken from or written to its cache, which holds them in the coordinates of the file.
+        """
+        self.proxies = smp_proxy.load_proxies(modelFile, self.hierarchy, self.settings.viewportProxy)
+        smp_proxy.show_proxies(self.proxies)
+        if self.proxies:
+            print("Viewport proxies for %s." % ", ".join(sorted(self.proxies)))
+
+    @smp_profile.profiled("create_camera")
+    def create_camera(self, *args):
+        # delete SMP_Camera is already exists
+        if "SMP_Camera" in cmds.listCameras():
+            cmds.delete("SMP_Camera")
+        newcam = cmds.camera()
+        # it appears SMP_CameraShape was modified automatically
+        cmds.rename(newcam[0], "SMP_Camera")
+
+        # fit camera, factor of 0.5 means the geometry will occupy about half of the fov, pivot goes to the origin
+        self.frame_camera()
+        #bake the camera motion into animation curves
+        self.bake_camera_orbit()
+
+        # adjust play bar
+        cmds.playbackOptions(min=self.settings.startFrame, max=self.settings.endFrame)
+
+    @smp_profile.profiled("adjust_camera")
+    def adjust_camera(self, *args):
+        """
+        Cause the options like frame length can change, so must update the camera motion here
+        """
+        # fit camera, factor of 0.5 means the geometry will occupy about half of the fov, pivot goes to the origin
+        self.frame_camera()
+        #update the camera motion curves in place
+        self.bake_camera_orbit()
+        # adjust play bar
+        cmds.playbackOptions(min=self.settings.startFrame, max=self.settings.endFrame)
+
+    def frame_camera(self):
+        """
+        solve the camera distance from the model bounds and the render aperture, so the model stays in frame
+        all around the orbit. The selection is left alone.
+        """
+        smp_framing.frame_camera(self.hierarchy.roots(), self.allGeometry, aperture=self.render_aperture(),
+                                 fitFactor=smp_framing.FIT_FACTOR, tight=self.settings.tightFraming)
+
+    def render_aperture(self):
+        # camera aperture matching the output width, in inches
+        return 1.181 / 720.0 * self.settings.outputWidth, 0.945
+
+    def bake_camera_orbit(self):
+        """
+        key the camera orbit as linear animation curves, nothing is evaluated by script while playing or rendering.
+        """
+        settings = self.settings
+        segments = smp_orbit.orbit_segments(settings.orbit, settings.totalFramenumber, **settings.orbitOptions)
+        smp_orbit.bake_orbit(segments)
+
+    @smp_profile.profiled("load_material")
+    def load_material_library(self, filename):
+        """
+        reference the material library, see smp_matlib. Loading the same file again changes nothing.
+        Returns the materials found.
+        """
+        materials = smp_matlib.load_library(filename)
+        if not materials:
+            print("Warning, no materials found in %s" % filename)
+            return []
+        self.settings.inputMaterialFilename = filename
+        self.materialStrList = materials
+        print ("Materials are loaded: %s" % ", ".join(materials))
+        return materials
+
+    def assign_material(self, material, selection):
+        """
+        assign a material to the selected geometry, a selected proxy standing for the full geometry of its root.
+        Returns the assigned members.
+        """
+        selection = smp_proxy.source_selection(selection, self.proxies)
+        assignable = smp_materials.selection_targets(selection)
+        if not assignable:
+            print("Selected objects maybe not material assignable.")
+            return []
+        # one sets call for the whole selection
+        smp_materials.assign({smp_materials.shading_group(material): assignable})
+        return assignable
+
+    @smp_profile.profiled("apply_material_rules")
+    def apply_material_rules(self, *args):
+        """
+        assign materials to the whole model by rules, the ones of the mapping file next to the model first,
+        then the materialRules setting. See smp_materials.
+        """
+        rules = smp_materials.asset_rules(self.inputModelFilename) + \
+            smp_materials.normalize_rules(self.settings.materialRules)
+        if not rules:
+            print("No material rules, add a %s file next to the model." % smp_materials.RULES_SUFFIX)
+            return {}
+        assignment, self.materialFailures = smp_materials.apply_rules(rules, self.hierarchy)
+        for sg, members in sorted(assignment.items()):
+            print("%s: %d shapes" % (sg, len(members)))
+        if self.materialFailures:
+            print("Warning, %d members kept their material." % len(self.materialFailures))
+        return assignment
+
+    def variant_materials(self):
+        """
+        the materials rendered as variants, none unless the renderVariants setting is on. They need the material
+        library, see load_material_library.
+        """
+        if not self.settings.renderVariants:
+            return []
+        materials = smp_variants.available_materials(self.materialStrList)
+        if not materials:
+            raise RuntimeError("Material variants need the material library, load it first.")
+        return materials
+
+    def render_output_location(self):
+        """
+        output directory and image prefix, from the output path or the images folder of the project.
+        """
+        path = self.renderOutputFilePath
+        if not path:
+            return os.path.join(cmds.workspace(q=True, rd=True), "images"), smp_render.IMAGE_PREFIX
+        if os.path.isdir(path):
+            return path, smp_render.IMAGE_PREFIX
+        return os.path.dirname(path), os.path.basename(path)
+
+    def prepare_render_jobs(self, outputDir, prefix=smp_render.IMAGE_PREFIX, renderExecutable=None):
+        """
+        write the scene of the chosen quality tier, after the draft one with draftPreview, and set up its render.
+        Returns [(tier, scheduler, keys)] for run_render_jobs.
+        """
+        jobs = []
+        for tier in smp_quality.render_tiers(self.settings.quality, self.settings.draftPreview):
+            tierDir = smp_quality.tier_output_dir(outputDir, tier)
+            scene = self.write_render_scene(tierDir, tier)
+            scheduler, keys = self.prepare_render_job(scene, tierDir, prefix, renderExecutable)
+            jobs.append((tier, scheduler, keys))
+        return jobs
+
+    def render(self, outputDir=None, renderExecutable=None):
+        """
+        render the loaded model into outputDir, the output location by default, and wait for it.
+        Returns {tier: report}.
+        """
+        if outputDir:
+            prefix = smp_render.IMAGE_PREFIX
+        else:
+            outputDir, prefix = self.render_output_location()
+        return self.run_render_jobs(self.prepare_render_jobs(outputDir, prefix, renderExecutable))
+
+    def write_render_scene(self, outputDir, tier=None):
+        """
+        set up the render of a quality tier and write the scene the render processes read. The open scene keeps
+        its name. Returns the written scene.
+        """
+        self.setup_render(tier)
+        if not os.path.isdir(outputDir):
+            os.makedirs(outputDir)
+        scene = os.path.join(outputDir, smp_render.SCENE_NAME)
+        # the render processes get the full geometry, and a render layer per material variant
+        with smp_proxy.FullGeometry(self.proxies), \
+                smp_variants.VariantLayers(self.variant_materials(), self.hierarchy):
+            cmds.file(scene, exportAll=True, type="mayaBinary", force=True)
+        return scene
+
+    def run_render_jobs(self, jobs, progress=None):
+        """
+        run the render jobs of the tiers one after the other and record the cost per frame of each. A monitor
+        follows every job and calls progress(tier, status) from its thread, and the preview movie and contact
+        sheet are encoded while the frames come in. A cancel skips the tiers left.
+        Returns {tier: report}.
+        """
+        settings = self.settings
+        reports = {}
+        for tier, scheduler, keys in jobs:
+            self.renderScheduler = scheduler
+            self.renderMonitor = smp_monitor.RenderMonitor(scheduler, stallSeconds=settings.stallSeconds,
+                                                           cancelStalled=self.cancelStalledRenders)
+            if progress:
+                self.renderMonitor.watch(lambda status, tier=tier: progress(tier, status))
+            else:
+                self.renderMonitor.watch()
+            # every variant gets its own movie and contact sheet
+            encoders = {}
+            if settings.encodePreview != "none":
+                for layer in scheduler.layers or [None]:
+                    encoders[layer] = smp_encode.StreamEncoder(scheduler, fps=settings.animationFPS,
+                                                               mode=settings.encodePreview, layer=layer)
+                    encoders[layer].start()
+            report = self.run_render_job(scheduler, keys)
+            self.renderMonitor.stop()
+            report["progress"] = self.renderMonitor.status()
+            if scheduler.layers and encoders:
+                report["encode"] = dict((layer, encoder.join()) for layer, encoder in encoders.items())
+            elif encoders:
+                report["encode"] = encoders[None].join()
+            resolution = smp_quality.scaled_resolution(settings.outputWidth, settings.outputHeight, tier)
+            report["quality"] = smp_quality.record_cost(scheduler.outputDir, tier, report, resolution)
+            print("%s tier: %s seconds per frame at %dx%d." % (tier, report["quality"]["seconds_per_frame"],
+                                                              resolution[0], resolution[1]))
+            reports[tier] = report
+            if scheduler.cancelled:
+                print("Batch Rendering in SMP is cancelled.")
+                break
+        return reports
+
+    def render_progress(self):
+        """
+        status of the render job running now, see smp_monitor. None before the first render.
+        """
+        return self.renderMonitor.status() if self.renderMonitor else None
+
+    def cancel_render(self):
+        """
+        kill the render processes, the frames they finished stay on disk and a later render resumes from them.
+        Returns False when no render is running.
+        """
+        if self.renderMonitor is None or self.renderScheduler.finished:
+            return False
+        self.renderMonitor.cancel()
+        return True
+
+    @smp_profile.profiled("prepare_render_job")
+    def prepare_render_job(self, scene, outputDir, prefix=smp_render.IMAGE_PREFIX, renderExecutable=None):
+        """
+        fill the output directory from the render cache and set up the scheduler for the frames still missing.
+        Queries the scene, so it runs on the main thread. Returns the scheduler and the frame cache keys of every
+        folder the job writes to, one per material variant.
+        """
+        settings = self.settings
+        keys = None
+        frames = None
+        views = None
+        if settings.renderMode == "sparse":
+            views = self.sparse_views()
+            frames = [frame for frame, azimuth, elevation in views]
+        layers = smp_variants.variant_layers(self.variant_materials())
+        scheduler = smp_render.RenderScheduler(scene, outputDir, settings.startFrame, settings.endFrame,
+                                               extension=settings.outputFormat,
+                                               processes=settings.renderProcesses,
+                                               renderExecutable=renderExecutable,
+                                               prefix=prefix,
+                                               frames=frames,
+                                               progressive=settings.renderMode == "progressive",
+                                               layers=layers)
+        if views:
+            for frameDir in scheduler.frame_dirs():
+                smp_render.write_views_index(frameDir, views, settings.outputFormat, prefix)
+        modelFile = self.inputModelFilename
+        if settings.useRenderCache and modelFile and os.path.isfile(modelFile):
+            frameKeys = smp_cache.frame_keys(modelFile, settings.startFrame, settings.endFrame,
+                                             materialFile=settings.inputMaterialFilename, frames=frames)
+            keys = {}
+            for layer, frameDir in zip(scheduler.layers or [None], scheduler.frame_dirs()):
+                if not os.path.isdir(frameDir):
+                    os.makedirs(frameDir)
+                # the open scene is the master layer, a variant differs from it by its layer
+                keys[frameDir] = frameKeys if layer is None else \
+                    dict((frame, smp_cache.digest([key, layer])) for frame, key in frameKeys.items())
+                stats = self.renderCache.prepare_output(keys[frameDir], frameDir, settings.outputFormat, prefix)
+                print("Render cache: %(copied)d frames reused, %(converted)d converted, %(stale)d outdated removed." %
+                      stats)
+        return scheduler, keys
+
+    def sparse_views(self):
+        """
+        the frames of the camera orbit facing the model from sparseViews evenly spaced azimuths, on every elevation
+        of the orbit, within the frame range. They are frames of the turntable, so the render cache shares them.
+        """
+        settings = self.settings
+        segments = smp_orbit.orbit_segments(settings.orbit, settings.totalFramenumber, **settings.orbitOptions)
+        return [view for view in smp_orbit.view_frames(segments, settings.sparseViews)
+                if settings.startFrame <= view[0] <= settings.endFrame]
+
+    @smp_profile.profiled("render", sceneQueries=False)
+    def run_render_job(self, scheduler, keys=None):
+        """
+        render the missing frames and add them to the render cache. No maya commands, safe to run on a thread, the
+        profile report is written by the caller.
+        """
+        report = scheduler.run()
+        if self.profiler.enabled:
+            self.profiler.add_frames(smp_profile.frame_durations(report, scheduler.extension, scheduler.prefix))
+        if keys:
+            report["cached"] = sum(self.renderCache.collect(frameKeys, frameDir, scheduler.extension, scheduler.prefix)
+                                   for frameDir, frameKeys in keys.items())
+        print("Batch Rendering in SMP is done, %d frames rendered, %d skipped, %d missing." %
+              (report["rendered"], report["skipped"], len(report["missing"])))
+        return report
+
+    @smp_profile.profiled("setup_render")
+    def setup_render(self, tier=None):
+        """
+        write the render settings into the scene, used by both the RENDER button and batch workers.
+        The resolution and quality come from a quality tier, the chosen quality by default.
+        """
+        settings = self.settings
+        tier = tier or settings.quality
+        # Unlock the render globals' current renderer attribute
+        cmds.setAttr("defaultRenderGlobals.currentRenderer", l=False)
+
+        # Sets the current renderer to maya software
+        cmds.setAttr("defaultRenderGlobals.currentRenderer", "mayaSoftware", type="string")
+
+
+        # Set render bg color
+        cmds.setAttr("SMP_CameraShape.backgroundColor", 0.451, 0.451, 0.451)
+        # Set camera aspect ratio
+        aperture = self.render_aperture()
+        cmds.setAttr("SMP_CameraShape.cameraAperture", aperture[0], aperture[1])
+        # Set renderable camera
+        cameralist = cmds.listCameras()
+        for i in cameralist:
+            cmds.setAttr(i + "Shape.renderable", 0)
+        cmds.setAttr("SMP_CameraShape.renderable", 1)
+
+        # Set output format
+        cmds.setAttr("defaultRenderGlobals.imageFormat", settings.outputFormatID)
+
+        # Set output file path, as a better practice, it shouldn't be set to places other than the project_path/images
+        # cmds.workspace(fr=["images", self.renderOutputFilePath])
+        # cmds.workspace(u=True)
+        # cmds.workspace(s=True)
+        # cmds.file(s=True)
+
+        cmds.setAttr("defaultRenderGlobals.outFormatControl", 0)
+        cmds.setAttr("defaultRenderGlobals.animation", 1)
+        cmds.setAttr("defaultRenderGlobals.putFrameBeforeExt", 1)
+        cmds.setAttr("defaultRenderGlobals.extensionPadding", smp_render.FRAME_PADDING)
+        cmds.setAttr("defaultRenderGlobals.periodInExt", 1)
+
+        # Set start and end frame
+        cmds.setAttr("defaultRenderGlobals.startFrame", settings.startFrame)
+        cmds.setAttr("defaultRenderGlobals.endFrame", settings.endFrame)
+
+        # Set resolution, scaled by the quality tier
+        width, height = smp_quality.scaled_resolution(settings.outputWidth, settings.outputHeight, tier)
+        cmds.setAttr("defaultResolution.width", width)
+        cmds.setAttr("defaultResolution.height", height)
+
+        # Set aspect Ratio
+        cmds.setAttr("defaultResolution.aspectLock", 1)
+        cmds.setAttr("defaultResolution.pixelAspect", settings.pixelAspectRatio)
+        cmds.setAttr("defaultResolution.deviceAspectRatio", settings.deviceAspectRatio)
+
+
+        # Set anti-aliasing, raytracing and reflections of the quality tier
+        for attr, value in smp_quality.render_attrs(tier):
+            cmds.setAttr(attr, value)
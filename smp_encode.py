@@ -0,0 +1,201 @@
+# Title: Simple Model Previewer - streaming preview encode
+# Description: Turns the rendered frames into a turntable movie and a contact sheet of thumbnails while the render is
+#              still running. Frames are taken in frame order as soon as they are complete on disk and piped to
+#              ffmpeg, one frame in memory at a time, so the movie and the sheet are ready right after the last
+#              frame instead of needing a second pass over the whole sequence. The frame naming, padding and format
+#              are the ones the render job writes. A job rendering several layers gets an encoder per layer.
+# License: GPL v3
+# Usage:
+#   encoder = smp_encode.StreamEncoder(scheduler, fps=24)
+#   encoder.start()
+#   scheduler.run()
+#   result = encoder.join()
+#   SMP_FFMPEG=/opt/ffmpeg/bin/ffmpeg selects the ffmpeg executable, ffmpeg on the PATH otherwise
+
+
+import math
+import os
+import subprocess
+import threading
+import time
+
+import smp_render
+
+
+ENV_VAR = "SMP_FFMPEG"
+# none, the movie only, the contact sheet only, or both
+ENCODE_MODES = ["none", "movie", "sheet", "both"]
+MOVIE_SUFFIX = ".mp4"
+SHEET_SUFFIX = "_sheet.png"
+SHEET_COLUMNS = 8
+SHEET_FRAMES = 48
+THUMBNAIL_WIDTH = 160
+# a frame is complete once it has not been written to for this long, or when the render job is over
+SETTLE_SECONDS = 1.0
+POLL_INTERVAL = 0.5
+# ffmpeg decoders of the output formats
+DECODERS = {"png": "png", "tif": "tiff", "tga": "targa"}
+
+
+def ffmpeg_executable():
+    return os.environ.get(ENV_VAR) or "ffmpeg"
+
+
+def sheet_frames(frames, count=SHEET_FRAMES):
+    """
+    up to count frames evenly spread over the sequence, the first one included.
+    """
+    frames = sorted(frames)
+    if len(frames) <= count:
+        return frames
+    step = len(frames) / float(count)
+    return [frames[int(i * step)] for i in range(count)]
+
+
+def movie_command(extension, fps, path):
+    # yuv420p needs even sizes, the turntable resolution is padded by a pixel when it is odd
+    return [ffmpeg_executable(), "-y", "-loglevel", "error", "-f", "image2pipe", "-c:v", DECODERS[extension],
+            "-framerate", str(fps), "-i", "-", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", "libx264",
+            "-pix_fmt", "yuv420p", path]
+
+
+def sheet_command(extension, count, path, columns=SHEET_COLUMNS, width=THUMBNAIL_WIDTH):
+    columns = max(1, min(columns, count))
+    rows = int(math.ceil(count / float(columns)))
+    return [ffmpeg_executable(), "-y", "-loglevel", "error", "-f", "image2pipe", "-c:v", DECODERS[extension],
+            "-i", "-", "-vf", "scale=%d:-2,tile=%dx%d" % (width, columns, rows), "-frames:v", "1", path]
+
+
+class StreamEncoder(object):
+    """
+    follows the frames of a RenderScheduler job in order and feeds them to the movie and contact sheet encoders.
+    A sparse job is a set of stills, it only gets the contact sheet. With a layer the frames, movie and sheet are
+    the ones in the folder of that layer.
+    """
+
+    def __init__(self, scheduler, fps=24, mode="both", settleSeconds=SETTLE_SECONDS, pollInterval=POLL_INTERVAL,
+                 layer=None):
+        if mode not in ENCODE_MODES:
+            raise ValueError("Unknown encode mode %s" % mode)
+        if scheduler.extension not in DECODERS:
+            raise ValueError("Cannot encode %s frames" % scheduler.extension)
+        self.scheduler = scheduler
+        self.fps = fps
+        self.movie = mode in ("movie", "both") and scheduler.frames is None
+        self.sheet = mode in ("sheet", "both")
+        self.settleSeconds = settleSeconds
+        self.pollInterval = pollInterval
+        self.layer = layer
+        self.frameDir = os.path.join(scheduler.outputDir, layer) if layer else scheduler.outputDir
+        base = os.path.join(self.frameDir, scheduler.prefix)
+        self.moviePath = base + MOVIE_SUFFIX
+        self.sheetPath = base + SHEET_SUFFIX
+        self.result = None
+        self._thread = None
+
+    def frame_path(self, frame):
+        return os.path.join(self.frameDir,
+                            smp_render.frame_filename(frame, self.scheduler.extension, self.scheduler.prefix))
+
+    def wait_for_frame(self, frame):
+        """
+        block until a frame is complete. Returns False when the job ended without writing it.
+        """
+        path = self.frame_path(frame)
+        while True:
+            # read before the stat, a frame written after the job ended is not waited for
+            over = self.scheduler.finished or self.scheduler.cancelled
+            try:
+                stat = os.stat(path)
+                if stat.st_size > 0 and (over or time.time() - stat.st_mtime >= self.settleSeconds):
+                    return True
+            except OSError:
+                pass
+            if over:
+                return False
+            time.sleep(self.pollInterval)
+
+    def start_encoders(self, sheetCount):
+        logDir = os.path.join(self.scheduler.outputDir, smp_render.LOG_DIR)
+        if not os.path.isdir(logDir):
+            os.makedirs(logDir)
+        encoders = {}
+        if self.movie:
+            encoders["movie"] = (movie_command(self.scheduler.extension, self.fps, self.moviePath), self.moviePath)
+        if self.sheet and sheetCount:
+            encoders["sheet"] = (sheet_command(self.scheduler.extension, sheetCount, self.sheetPath), self.sheetPath)
+        processes = {}
+        for name, (command, path) in encoders.items():
+            log = open(os.path.join(logDir, "encode_%s%s.log" % (self.layer + "_" if self.layer else "", name)), "w")
+            try:
+                processes[name] = (subprocess.Popen(command, stdin=subprocess.PIPE, stdout=log,
+                                                    stderr=subprocess.STDOUT), log, path)
+            except OSError as e:
+                log.close()
+                for process, otherLog, otherPath in processes.values():
+                    process.kill()
+                    otherLog.close()
+                raise OSError("Cannot start %s, set %s to the ffmpeg executable. %s" % (command[0], ENV_VAR, e))
+        return processes
+
+    def encode(self):
+        """
+        stream the frames of the job into the encoders. Returns the result, also kept as self.result.
+        """
+        frames = self.scheduler.job_frames()
+        sheetSet = set(sheet_frames(frames)) if self.sheet else set()
+        result = {"movie": None, "sheet": None, "frames": 0, "missing": [], "error": None}
+        if not self.movie and not sheetSet:
+            return result
+        start = time.time()
+        processes = {}
+        try:
+            processes = self.start_encoders(len(sheetSet))
+            for frame in frames:
+                if not self.wait_for_frame(frame):
+                    result["missing"].append(frame)
+                    continue
+                with open(self.frame_path(frame), "rb") as f:
+                    data = f.read()
+                if "movie" in processes:
+                    processes["movie"][0].stdin.write(data)
+                if frame in sheetSet and "sheet" in processes:
+                    processes["sheet"][0].stdin.write(data)
+                result["frames"] += 1
+                if self.scheduler.cancelled:
+                    break
+        except (IOError, OSError) as e:
+            result["error"] = str(e)
+        for name, (process, log, path) in processes.items():
+            try:
+                process.stdin.close()
+            except (IOError, OSError):
+                pass
+            returnCode = process.wait()
+            log.close()
+            if self.scheduler.cancelled or returnCode != 0 or result["error"]:
+                # a cut short movie is worse than none
+                if os.path.isfile(path):
+                    os.remove(path)
+                if returnCode != 0 and not result["error"]:
+                    result["error"] = "%s encoder failed with code %d, see %s" % (name, returnCode, log.name)
+            else:
+                result[name] = path
+        result["seconds"] = round(time.time() - start, 3)
+        # how long the deliverables took after the render itself
+        result["seconds_after_render"] = round(max(0.0, time.time() - (self.scheduler.finishedTime or time.time())), 3)
+        if result["error"]:
+            print("Warning, preview encode failed. %s" % result["error"])
+        self.result = result
+        return result
+
+    def start(self):
+        self._thread = threading.Thread(target=self.encode)
+        self._thread.daemon = True
+        self._thread.start()
+        return self._thread
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+        return self.result
@@ -0,0 +1,932 @@
+# Title: Simple Model Previewer - stand-in maya module
+# Description: A small in-memory imitation of maya.cmds / maya.mel, good enough to run the Simple Model Previewer
+#              pipeline outside of Maya. Every command call is recorded so the pipeline can be checked and measured
+#              on a plain python interpreter.
+# License: GPL v3
+# Usage:
+#   import smp_fakemaya
+#   smp_fakemaya.install()
+#   import smp_core
+
+
+import fnmatch
+import json
+import math
+import os
+import re
+import sys
+import types
+
+
+class FakeNode(object):
+    def __init__(self, name, nodeType, parent=None):
+        self.name = name
+        self.type = nodeType
+        self.parent = parent
+        self.attrs = {}
+        self.translate = [0.0, 0.0, 0.0]
+        self.rotate = [0.0, 0.0, 0.0]
+        # local bounding box of shape nodes, [xmin, ymin, zmin, xmax, ymax, zmax]
+        self.bbox = None
+
+    def to_dict(self):
+        return {"name": self.name,
+                "type": self.type,
+                "parent": self.parent,
+                "attrs": self.attrs,
+                "translate": self.translate,
+                "rotate": self.rotate,
+                "bbox": self.bbox}
+
+    @classmethod
+    def from_dict(cls, data):
+        node = cls(data["name"], data.get("type", "transform"), data.get("parent"))
+        node.attrs = dict(data.get("attrs") or {})
+        node.translate = list(data.get("translate") or [0.0, 0.0, 0.0])
+        node.rotate = list(data.get("rotate") or [0.0, 0.0, 0.0])
+        node.bbox = data.get("bbox")
+        return node
+
+
+GEOMETRY_TYPES = ("mesh", "nurbsSurface", "nurbsCurve", "subdiv")
+LIGHT_TYPES = ("directionalLight", "ambientLight", "pointLight", "spotLight", "areaLight", "volumeLight")
+DEFAULT_NODES = (("defaultRenderGlobals", "renderGlobals"),
+                 ("defaultResolution", "resolution"),
+                 ("defaultRenderQuality", "renderQuality"),
+                 ("defaultRenderLayer", "renderLayer"))
+DEFAULT_CAMERAS = ("persp", "top", "front", "side")
+DAG_TYPES = ("transform", "camera") + GEOMETRY_TYPES + LIGHT_TYPES
+
+
+def _as_list(objs):
+    if objs is None:
+        return []
+    if isinstance(objs, (list, tuple)):
+        result = []
+        for i in objs:
+            result.extend(_as_list(i))
+        return result
+    return [objs]
+
+
+class FakeCmds(object):
+    """
+    the command set, one method per maya.cmds command used by the previewer.
+    """
+
+    def __init__(self):
+        self.new_scene()
+
+    # ---- scene bookkeeping ----
+
+    def new_scene(self):
+        self.nodes = {}
+        self.order = []
+        self.selection = []
+        self.options = {}
+        self.sceneName = ""
+        # [path, namespace] of the referenced files
+        self.references = []
+        for name, nodeType in DEFAULT_NODES:
+            self._add(FakeNode(name, nodeType))
+        self.nodes["defaultRenderLayer"].attrs["renderable"] = 1
+        self.options["currentRenderLayer"] = "defaultRenderLayer"
+        for name in DEFAULT_CAMERAS:
+            self._add(FakeNode(name, "transform"))
+            self._add(FakeNode(name + "Shape", "camera", name))
+
+    def _add(self, node):
+        self.nodes[node.name] = node
+        self.order.append(node.name)
+        return node
+
+    def _unique(self, name):
+        if name not in self.nodes:
+            return name
+        base = name.rstrip("0123456789")
+        index = 1
+        while base + str(index) in self.nodes:
+            index += 1
+        return base + str(index)
+
+    def _node(self, name):
+        short = str(name).split(".")[0].split("|")[-1]
+        if short not in self.nodes:
+            raise ValueError("No object matches name: %s" % name)
+        return self.nodes[short]
+
+    def _children(self, name):
+        return [n for n in self.order if self.nodes[n].parent == name]
+
+    def _descendants(self, name):
+        # one pass over the scene for the parent -> children map, then a depth first walk
+        children = {}
+        for n in self.order:
+            children.setdefault(self.nodes[n].parent, []).append(n)
+        result = []
+        stack = list(reversed(children.get(name, [])))
+        while stack:
+            child = stack.pop()
+            result.append(child)
+            stack.extend(reversed(children.get(child, [])))
+        return result
+
+    def _path(self, name):
+        parts = [name]
+        parent = self.nodes[name].parent
+        while parent:
+            parts.insert(0, parent)
+            parent = self.nodes[parent].parent
+        return "|" + "|".join(parts)
+
+    def _world_translate(self, name):
+        total = [0.0, 0.0, 0.0]
+        while name:
+            node = self.nodes[name]
+            total = [a + b for a, b in zip(total, node.translate)]
+            name = node.parent
+        return total
+
+    def _world_bbox(self, names):
+        shapes = []
+        for name in names:
+            for n in [name] + self._descendants(name):
+                if self.nodes[n].bbox:
+                    shapes.append(n)
+        if not shapes:
+            return [0.0] * 6
+        box = [float("inf")] * 3 + [float("-inf")] * 3
+        for n in shapes:
+            offset = self._world_translate(n)
+            local = self.nodes[n].bbox
+            for axis in range(3):
+                box[axis] = min(box[axis], local[axis] + offset[axis])
+                box[axis + 3] = max(box[axis + 3], local[axis + 3] + offset[axis])
+        return box
+
+    def _targets(self, objs):
+        objs = _as_list(objs)
+        if not objs:
+            return list(self.selection)
+        return [self._node(o).name for o in objs]
+
+    def _transform_of(self, name):
+        node = self.nodes[name]
+        if node.type != "transform" and node.parent:
+            return node.parent
+        return name
+
+    def _load(self, path, namespace=None):
+        """
+        read a scene description. files written by this module (or json synthetic scenes) are read back node by node,
+        anything else becomes one unit cube mesh named after the file. A description with "crash": <exit code> ends
+        the process the way a mayapy crash does.
+        """
+        data = None
+        if os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except ValueError:
+                data = None
+        if isinstance(data, dict) and data.get("crash"):
+            os._exit(data["crash"])
+        if data is None:
+            base = os.path.splitext(os.path.basename(path))[0] or "model"
+            data = {"nodes": [{"name": base, "type": "transform"},
+                              {"name": base + "Shape", "type": "mesh", "parent": base,
+                               "bbox": [-0.5, -0.5, -0.5, 0.5, 0.5, 0.5]}]}
+        return [FakeNode.from_dict(n) for n in data.get("nodes", [])], data
+
+    def _dump(self, path, selected=False):
+        defaults = [name for name, nodeType in DEFAULT_NODES]
+        referenced = set(n for n in self.order if self.nodes[n].attrs.get("referenced"))
+        names = self.order
+        if selected:
+            names = set()
+            for name in self.selection:
+                names.update([name] + self._descendants(name))
+            names = [n for n in self.order if n in names]
+        data = {"nodes": [self.nodes[n].to_dict() for n in names if n not in defaults and n not in referenced],
+                "defaults": dict((n, self.nodes[n].attrs) for n in defaults),
+                "references": self.references}
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    # ---- commands ----
+
+    def about(self, batch=False, version=False, **kwargs):
+        if version:
+            return "2014"
+        return True
+
+    def currentUnit(self, **kwargs):
+        self.options.update(kwargs)
+
+    def workspace(self, *args, **kwargs):
+        if args:
+            self.options["workspace"] = args[0]
+        return self.options.get("workspace", os.getcwd())
+
+    def _reference(self, path, namespace):
+        """
+        bring in the nodes of a file as namespace:name, flagged as referenced so they are not saved with the scene.
+        """
+        while any(ns == namespace for p, ns in self.references):
+            namespace = namespace.rstrip("0123456789") + str(len(self.references))
+        nodes, data = self._load(path)
+        for node in nodes:
+            node.name = namespace + ":" + node.name
+            if node.parent:
+                node.parent = namespace + ":" + node.parent
+            node.attrs["referenced"] = True
+            self._add(node)
+        self.references.append([path, namespace])
+        return path
+
+    def file(self, path=None, i=False, o=False, open=False, new=False, force=False, rename=None, save=False,
+             exportAll=False, exportSelected=False, q=False, query=False, sceneName=False, type=None, reference=False,
+             namespace=None, removeReference=False, **kwargs):
+        if q or query:
+            if sceneName:
+                return self.sceneName
+            if reference:
+                return [p for p, ns in self.references]
+            if namespace:
+                return [ns for p, ns in self.references if p == path][0]
+            if kwargs.get("modified"):
+                # anything besides the default nodes counts as a change
+                return len(self.order) > len(DEFAULT_NODES) + 2 * len(DEFAULT_CAMERAS)
+            return None
+        if new:
+            self.new_scene()
+            return ""
+        if removeReference:
+            namespace = [ns for p, ns in self.references if p == path][0]
+            self.references = [[p, ns] for p, ns in self.references if p != path]
+            content = [n for n in self.order if n.startswith(namespace + ":")]
+            if content:
+                self.delete(content)
+            return path
+        if rename:
+            self.sceneName = rename
+            return rename
+        if save:
+            self._dump(self.sceneName)
+            return self.sceneName
+        if exportAll:
+            self._dump(path)
+            return path
+        if exportSelected:
+            self._dump(path, selected=True)
+            return path
+        if reference:
+            return self._reference(path, namespace or os.path.splitext(os.path.basename(path))[0])
+        if o or open:
+            nodes, data = self._load(path)
+            self.new_scene()
+            for node in nodes:
+                if node.name in self.nodes:
+                    self.nodes[node.name] = node
+                else:
+                    self._add(node)
+            for name, attrs in (data.get("defaults") or {}).items():
+                self.nodes[name].attrs.update(attrs)
+            for refPath, refNamespace in data.get("references") or []:
+                self._reference(refPath, refNamespace)
+            self.sceneName = path
+            return path
+        if i:
+            nodes, data = self._load(path)
+            renamed = {}
+            for node in nodes:
+                if node.type == "camera" and node.parent in DEFAULT_CAMERAS:
+                    continue
+                if node.name in DEFAULT_CAMERAS:
+                    continue
+                newName = self._unique(namespace + ":" + node.name if namespace else node.name)
+                renamed[node.name] = newName
+                node.name = newName
+            for node in nodes:
+                if node.name in DEFAULT_CAMERAS or (node.parent in DEFAULT_CAMERAS and node.type == "camera"):
+                    continue
+                if node.parent:
+                    node.parent = renamed.get(node.parent, node.parent)
+                self._add(node)
+            return path
+        raise RuntimeError("file: unsupported flags")
+
+    def ls(self, *args, **kwargs):
+        names = _as_list(args)
+        if kwargs.get("sl") or kwargs.get("selection"):
+            result = list(self.selection)
+        elif names:
+            result = []
+            for name in names:
+                short = name.split("|")[-1].split(".")[0]
+                if "*" in short:
+                    result.extend(n for n in self.order if fnmatch.fnmatchcase(n, short))
+                elif short in self.nodes:
+                    result.append(name.split("|")[-1])
+        else:
+            result = list(self.order)
+        if kwargs.get("dag"):
+            result = [n for n in result if self.nodes[n].type in DAG_TYPES]
+        if kwargs.get("geometry"):
+            result = [n for n in result if self.nodes[n].type in GEOMETRY_TYPES]
+        nodeType = kwargs.get("type")
+        if nodeType:
+            types = _as_list(nodeType)
+            if "light" in types:
+                types = list(types) + list(LIGHT_TYPES)
+            result = [n for n in result if self.nodes[n].type in types]
+        if kwargs.get("materials"):
+            result = [n for n in result if self.nodes[n].type in ("lambert", "blinn", "phong", "phongE",
+                                                                  "anisotropic", "surfaceShader")]
+        if kwargs.get("long"):
+            result = [self._path(n) for n in result]
+        return result
+
+    def listRelatives(self, objs=None, allParents=False, parent=False, children=False, allDescendents=False,
+                      shapes=False, path=False, fullPath=False, type=None, **kwargs):
+        result = []
+        for name in [self._node(o).name for o in _as_list(objs)]:
+            if allParents or parent:
+                if self.nodes[name].parent:
+                    result.append(self.nodes[name].parent)
+            elif allDescendents:
+                result.extend(reversed(self._descendants(name)))
+            else:
+                result.extend(self._children(name))
+        if shapes:
+            result = [n for n in result if self.nodes[n].type != "transform"]
+        if type:
+            result = [n for n in result if self.nodes[n].type in _as_list(type)]
+        if path or fullPath:
+            result = [self._path(n) for n in result]
+        return result or None
+
+    def select(self, *args, **kwargs):
+        objs = _as_list(args)
+        if kwargs.get("clear") or kwargs.get("cl") or (len(args) == 1 and args[0] is None):
+            self.selection = []
+            return
+        names = [self._node(o).name for o in objs]
+        if kwargs.get("add"):
+            self.selection.extend(n for n in names if n not in self.selection)
+        else:
+            self.selection = names
+
+    def xform(self, *args, **kwargs):
+        components = [a for a in _as_list(args) if a.endswith(".vtx[*]")]
+        if components:
+            # the fake meshes are boxes, their vertices are the 8 corners of the bounding box
+            box = self._world_bbox([self._node(c.split(".", 1)[0]).name for c in components])
+            return [box[i] for cx in (0, 3) for cy in (1, 4) for cz in (2, 5) for i in (cx, cy, cz)]
+        targets = self._targets(args)
+        if kwargs.get("q") or kwargs.get("query"):
+            if kwargs.get("bb") or kwargs.get("boundingBox"):
+                return self._world_bbox(targets)
+            if kwargs.get("t") or kwargs.get("translation"):
+                return list(self.nodes[targets[0]].translate)
+            if kwargs.get("ro") or kwargs.get("rotation"):
+                return list(self.nodes[targets[0]].rotate)
+        return None
+
+    def exactWorldBoundingBox(self, *args, **kwargs):
+        return self._world_bbox(self._targets(args))
+
+    def move(self, x=0.0, y=0.0, z=0.0, *args, **kwargs):
+        # pivot moves are accepted but do not change the fake transforms
+        targets = [a for a in _as_list(args) if "." not in a]
+        if args and not targets:
+            return
+        for name in self._targets(targets):
+            node = self.nodes[self._transform_of(name)]
+            if kwargs.get("r") or kwargs.get("relative"):
+                node.translate = [node.translate[0] + x, node.translate[1] + y, node.translate[2] + z]
+            else:
+                node.translate = [x, y, z]
+
+    def rotate(self, x=0.0, y=0.0, z=0.0, *args, **kwargs):
+        for name in self._targets(args):
+            self.nodes[self._transform_of(name)].rotate = [x, y, z]
+
+    def delete(self, *args, **kwargs):
+        for name in self._targets(args):
+            if name not in self.nodes:
+                continue
+            for n in [name] + self._descendants(name):
+                self.nodes.pop(n, None)
+                if n in self.order:
+                    self.order.remove(n)
+                if n in self.selection:
+                    self.selection.remove(n)
+        # deleted shapes leave their sets
+        for n in self.order:
+            if "members" in self.nodes[n].attrs:
+                self.nodes[n].attrs["members"] = [m for m in self.nodes[n].attrs["members"]
+                                                  if m.split(".")[0].split("|")[-1] in self.nodes]
+        # animation curves go away with the node they drive
+        for n in list(self.order):
+            target = self.nodes[n].attrs.get("target") if self.nodes[n].type.startswith("animCurve") else None
+            if target and target.split(".")[0] not in self.nodes:
+                self.nodes.pop(n)
+                self.order.remove(n)
+
+    def hide(self, *args, **kwargs):
+        for name in self._targets(args):
+            self.nodes[self._transform_of(name)].attrs["visibility"] = 0
+
+    def directionalLight(self, intensity=1.0, rotation=(0.0, 0.0, 0.0), name=None, **kwargs):
+        transform = self._add(FakeNode(self._unique(name or "directionalLight1"), "transform"))
+        transform.rotate = list(rotation)
+        shapeName = self._unique(transform.name.replace("directionalLight", "directionalLightShape"))
+        shape = self._add(FakeNode(shapeName, "directionalLight", transform.name))
+        shape.attrs["intensity"] = intensity
+        return shape.name
+
+    def ambientLight(self, intensity=1.0, name=None, **kwargs):
+        transform = self._add(FakeNode(self._unique(name or "ambientLight1"), "transform"))
+        shape = self._add(FakeNode(self._unique(transform.name.replace("ambientLight", "ambientLightShape")),
+                                   "ambientLight", transform.name))
+        shape.attrs["intensity"] = intensity
+        return shape.name
+
+    def group(self, *args, **kwargs):
+        name = self._unique(kwargs.get("n") or kwargs.get("name") or "group1")
+        members = [] if (kwargs.get("em") or kwargs.get("empty")) else self._targets(args)
+        grp = self._add(FakeNode(name, "transform", kwargs.get("p") or kwargs.get("parent")))
+        for member in members:
+            self.nodes[self._transform_of(member)].parent = grp.name
+        self.selection = [grp.name]
+        return grp.name
+
+    def parent(self, *args, **kwargs):
+        objs = _as_list(args)
+        if kwargs.get("w") or kwargs.get("world"):
+            children, newParent = objs, None
+        else:
+            children, newParent = objs[:-1], self._node(objs[-1]).name
+        for child in children:
+            self._node(child).parent = newParent
+        return [self._node(c).name for c in children]
+
+    def listCameras(self, **kwargs):
+        return [self.nodes[n].parent for n in self.order if self.nodes[n].type == "camera"]
+
+    def camera(self, **kwargs):
+        transform = self._add(FakeNode(self._unique("camera1"), "transform"))
+        shape = self._add(FakeNode(self._unique(transform.name.replace("camera", "cameraShape")), "camera",
+                                   transform.name))
+        shape.attrs.update({"horizontalFilmAperture": 1.41732, "verticalFilmAperture": 0.94488,
+                            "focalLength": 35.0})
+        return [transform.name, shape.name]
+
+    def rename(self, old, new):
+        node = self._node(old)
+        oldName = node.name
+        new = self._unique(new)
+        self.nodes[new] = self.nodes.pop(oldName)
+        self.order[self.order.index(oldName)] = new
+        node.name = new
+        for n in self.order:
+            if self.nodes[n].parent == oldName:
+                self.nodes[n].parent = new
+            target = self.nodes[n].attrs.get("target")
+            if target and target.split(".")[0] == oldName:
+                self.nodes[n].attrs["target"] = new + "." + target.split(".", 1)[1]
+        self.selection = [new if s == oldName else s for s in self.selection]
+        # maya renames the shape of a renamed transform along with it
+        if node.type == "transform":
+            for child in self._children(new):
+                if self.nodes[child].type != "transform":
+                    self.rename(child, new + "Shape")
+        return new
+
+    def viewFit(self, *args, **kwargs):
+        cameraShape = self._node(args[0]) if args else self.nodes["perspShape"]
+        box = self._world_bbox(self.selection)
+        center = [(box[a] + box[a + 3]) / 2.0 for a in range(3)]
+        radius = math.sqrt(sum((box[a + 3] - box[a]) ** 2 for a in range(3))) / 2.0
+        fraction = kwargs.get("f", kwargs.get("fitFactor", 1.0)) or 1.0
+        fov = math.radians(54.43)
+        distance = radius / fraction / math.tan(fov / 2.0)
+        transform = self.nodes[self._transform_of(cameraShape.name)]
+        transform.translate = [center[0], center[1], center[2] + distance]
+
+    def expression(self, n="expression1", s="", **kwargs):
+        node = self._add(FakeNode(self._unique(n), "expression"))
+        node.attrs["expression"] = s
+        return node.name
+
+    def playbackOptions(self, **kwargs):
+        self.options.update(("playback_" + k, v) for k, v in kwargs.items())
+
+    def setAttr(self, attr, *values, **kwargs):
+        nodeName, attrName = attr.split(".", 1)
+        node = self._node(nodeName)
+        if not values:
+            return
+        value = values[0] if len(values) == 1 else list(values)
+        keyRange = re.match(r"^(?:ktv|keyTimeValue)\[(\d+)(?::(\d+))?\]$", attrName)
+        if keyRange and node.type.startswith("animCurve"):
+            # time value pairs of the keys first to last, the way scene files store curves
+            keys = node.attrs["keys"]
+            first = int(keyRange.group(1))
+            for index, pair in enumerate(zip(values[0::2], values[1::2])):
+                if first + index < len(keys):
+                    keys[first + index] = list(pair)
+                else:
+                    keys.append(list(pair))
+            keys.sort()
+        elif attrName in ("translate", "t"):
+            node.translate = list(value)
+        elif attrName in ("rotate", "r"):
+            node.rotate = list(value)
+        elif attrName in ("translateX", "translateY", "translateZ"):
+            node.translate["XYZ".index(attrName[-1])] = value
+        elif attrName in ("rotateX", "rotateY", "rotateZ"):
+            node.rotate["XYZ".index(attrName[-1])] = value
+        else:
+            node.attrs[attrName] = value
+
+    def getAttr(self, attr, time=None, **kwargs):
+        nodeName, attrName = attr.split(".", 1)
+        node = self._node(nodeName)
+        if time is None:
+            time = self.currentTime()
+        if attrName in ("translate", "t", "rotate", "r"):
+            channel = "translate" if attrName[0] == "t" else "rotate"
+            return [tuple(self._channel(node, channel + axis, time) for axis in "XYZ")]
+        if attrName in ("translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ"):
+            return self._channel(node, attrName, time)
+        if attrName == "worldMatrix":
+            return self._world_matrix(node.name, time)
+        if attrName not in node.attrs:
+            raise ValueError("No attribute %s" % attr)
+        return node.attrs[attrName]
+
+    def addAttr(self, node, longName=None, ln=None, dataType=None, dt=None, attributeType=None, at=None,
+                **kwargs):
+        self._node(node).attrs.setdefault(longName or ln, "" if (dataType or dt) else 0)
+
+    def attributeQuery(self, attr, node=None, exists=False, **kwargs):
+        return attr in self._node(node).attrs
+
+    def currentTime(self, *args, **kwargs):
+        if args:
+            self.options["currentTime"] = args[0]
+        return self.options.get("currentTime", 1)
+
+    def render(self, *args, **kwargs):
+        # nothing is drawn, the returned path follows the maya software naming
+        camera = args[0] if args else "persp"
+        return "%s/%s.%04d.iff" % (self.workspace(), camera, int(self.currentTime()))
+
+    def _channel(self, node, attrName, time):
+        curve = self._curve(node.name, attrName)
+        if curve:
+            return self._evaluate(curve, time)
+        values = node.translate if attrName.startswith("translate") else node.rotate
+        return values["XYZ".index(attrName[-1])]
+
+    def _world_matrix(self, name, time):
+        """
+        world matrix of a transform from its rotate (xyz order) and translate channels, pivots are ignored.
+        """
+        matrix = [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]]
+        while name:
+            node = self.nodes[name]
+            rx, ry, rz = [math.radians(self._channel(node, "rotate" + a, time)) for a in "XYZ"]
+            tx, ty, tz = [self._channel(node, "translate" + a, time) for a in "XYZ"]
+            cx, sx, cy, sy, cz, sz = math.cos(rx), math.sin(rx), math.cos(ry), math.sin(ry), math.cos(rz), \
+                math.sin(rz)
+            local = [[cy * cz, cy * sz, -sy, 0.0],
+                     [sx * sy * cz - cx * sz, sx * sy * sz + cx * cz, sx * cy, 0.0],
+                     [cx * sy * cz + sx * sz, cx * sy * sz - sx * cz, cx * cy, 0.0],
+                     [tx, ty, tz, 1.0]]
+            matrix = [[sum(matrix[r][k] * local[k][c] for k in range(4)) for c in range(4)] for r in range(4)]
+            name = node.parent
+        return [value for row in matrix for value in row]
+
+    def _curve(self, nodeName, attrName, create=False):
+        target = nodeName + "." + attrName
+        for n in self.order:
+            if self.nodes[n].type.startswith("animCurve") and self.nodes[n].attrs.get("target") == target:
+                return self.nodes[n]
+        if not create:
+            return None
+        curveType = "animCurveTA" if attrName.startswith("rotate") else \
+            "animCurveTL" if attrName.startswith("translate") else "animCurveTU"
+        curve = self._add(FakeNode(self._unique(nodeName + "_" + attrName), curveType))
+        curve.attrs.update({"target": target, "keys": [], "outTangentType": "linear"})
+        return curve
+
+    def _evaluate(self, curve, time):
+        keys = curve.attrs["keys"]
+        if len(keys) == 1 or time <= keys[0][0] and curve.attrs.get("preInfinite") != "linear":
+            return keys[0][1]
+        if time >= keys[-1][0] and curve.attrs.get("postInfinite") != "linear":
+            return keys[-1][1]
+        index = 1
+        while index < len(keys) - 1 and keys[index][0] < time:
+            index += 1
+        (t0, v0), (t1, v1) = keys[index - 1], keys[index]
+        if curve.attrs.get("outTangentType") == "step":
+            return v0 if time < t1 else v1
+        return v0 + (v1 - v0) * (time - t0) / float(t1 - t0)
+
+    def setKeyframe(self, obj, attribute=None, at=None, time=None, t=None, value=None, v=None, **kwargs):
+        node = self._node(obj)
+        attrName = attribute or at
+        time = time if time is not None else (t if t is not None else self.currentTime())
+        value = value if value is not None else v
+        # a list of times keys every one of them
+        times = list(time) if isinstance(time, (list, tuple)) else [time]
+        keys = [[keyTime, self._channel(node, attrName, keyTime) if value is None else value] for keyTime in times]
+        curve = self._curve(node.name, attrName, create=True)
+        curve.attrs["keys"] = sorted([k for k in curve.attrs["keys"] if k[0] not in times] + keys)
+        return len(keys)
+
+    def keyframe(self, obj, attribute=None, at=None, query=False, q=False, keyframeCount=False, timeChange=None,
+                 valueChange=None, index=None, edit=False, e=False, absolute=True, name=False, n=False, **kwargs):
+        curve = self._curve(self._node(obj).name, attribute or at)
+        if query or q:
+            if curve is None:
+                return 0 if keyframeCount else None
+            if name or n:
+                return [curve.name]
+            if keyframeCount:
+                return len(curve.attrs["keys"])
+            if valueChange:
+                return [k[1] for k in curve.attrs["keys"]]
+            return [k[0] for k in curve.attrs["keys"]]
+        if edit or e:
+            key = curve.attrs["keys"][index[0]]
+            if timeChange is not None:
+                key[0] = timeChange
+            if valueChange is not None:
+                key[1] = valueChange
+            curve.attrs["keys"].sort()
+            return 1
+
+    def keyTangent(self, obj, attribute=None, at=None, inTangentType=None, outTangentType=None, **kwargs):
+        curve = self._curve(self._node(obj).name, attribute or at)
+        if outTangentType:
+            curve.attrs["outTangentType"] = outTangentType
+        if inTangentType:
+            curve.attrs["inTangentType"] = inTangentType
+
+    def setInfinity(self, obj, attribute=None, at=None, preInfinite=None, postInfinite=None, **kwargs):
+        curve = self._curve(self._node(obj).name, attribute or at)
+        curve.attrs["preInfinite"] = preInfinite
+        curve.attrs["postInfinite"] = postInfinite
+
+    def cutKey(self, obj, attribute=None, at=None, clear=False, **kwargs):
+        curve = self._curve(self._node(obj).name, attribute or at)
+        if curve:
+            self.delete(curve.name)
+
+    # ---- shading ----
+
+    def shadingNode(self, nodeType, asShader=False, asUtility=False, name=None, **kwargs):
+        return self._add(FakeNode(self._unique(name or nodeType + "1"), nodeType)).name
+
+    def connectAttr(self, source, destination, force=False, **kwargs):
+        self._node(source)
+        nodeName, attrName = destination.split(".", 1)
+        self._node(nodeName).attrs.setdefault("connections", {})[attrName] = source
+
+    def listConnections(self, attr, source=True, destination=True, type=None, **kwargs):
+        if "." not in attr:
+            attr += "."
+        nodeName, attrName = attr.split(".", 1)
+        result = []
+        connection = self._node(nodeName).attrs.get("connections", {}).get(attrName)
+        if connection and source:
+            result.append(connection.split(".")[0])
+        if destination:
+            # nodes with an input from this attribute (or from any attribute of this node when none is given)
+            for n in self.order:
+                for src in self.nodes[n].attrs.get("connections", {}).values():
+                    if src == attr or (not attrName and src.split(".")[0] == nodeName):
+                        result.append(n)
+        if type:
+            result = [n for n in result if self.nodes[n].type in _as_list(type)]
+        return result or None
+
+    def sets(self, *args, **kwargs):
+        """
+        object sets and shading groups, members are kept as given in the set's "members" attribute.
+        """
+        objs = _as_list(args)
+        if kwargs.get("q") or kwargs.get("query"):
+            return list(self._node(objs[0]).attrs.get("members", [])) or None
+        if kwargs.get("e") or kwargs.get("edit"):
+            target = self._node(kwargs.get("forceElement") or kwargs.get("fe") or kwargs.get("addElement"))
+            for member in objs:
+                self._node(member)
+            layer = self.options.get("currentRenderLayer", "defaultRenderLayer")
+            if layer != "defaultRenderLayer":
+                # assignments in a render layer are overrides of that layer, the scene itself keeps its own
+                overrides = self.nodes[layer].attrs.setdefault("overrides", {})
+                overrides.update((member, target.name) for member in objs)
+                return None
+            # a member belongs to one shading group at a time
+            moved = set(objs)
+            for n in self.order:
+                if self.nodes[n].type == "shadingEngine" and n != target.name:
+                    members = self.nodes[n].attrs.get("members", [])
+                    self.nodes[n].attrs["members"] = [m for m in members if m not in moved]
+            members = target.attrs.setdefault("members", [])
+            known = set(members)
+            members.extend(m for m in objs if m not in known)
+            return None
+        nodeType = "shadingEngine" if kwargs.get("renderable") else "objectSet"
+        node = self._add(FakeNode(self._unique(kwargs.get("name") or kwargs.get("n") or "set1"), nodeType))
+        node.attrs["members"] = [] if kwargs.get("empty") else objs
+        return node.name
+
+    def createRenderLayer(self, *args, **kwargs):
+        layer = self._add(FakeNode(self._unique(kwargs.get("name") or kwargs.get("n") or "layer1"), "renderLayer"))
+        layer.attrs.update({"members": [self._node(o).name for o in _as_list(args)], "renderable": 1})
+        if kwargs.get("makeCurrent") or kwargs.get("mc"):
+            self.options["currentRenderLayer"] = layer.name
+        return layer.name
+
+    def editRenderLayerGlobals(self, currentRenderLayer=None, crl=None, query=False, q=False, **kwargs):
+        if query or q:
+            return self.options.get("currentRenderLayer", "defaultRenderLayer")
+        self.options["currentRenderLayer"] = self._node(currentRenderLayer or crl).name
+
+    def filterExpand(self, objs, sm=None, selectionMask=None, expand=True, ex=None, **kwargs):
+        """
+        faces only, f[a:b] ranges are expanded to one entry per face unless expand is off.
+        """
+        expand = expand if ex is None else ex
+        result = []
+        for obj in _as_list(objs):
+            match = re.match(r"^(.*)\.f\[(\d+)(?::(\d+))?\]$", obj)
+            if not match:
+                continue
+            self._node(match.group(1))
+            if not expand:
+                result.append(obj)
+                continue
+            first = int(match.group(2))
+            last = int(match.group(3) or first)
+            result.extend("%s.f[%d]" % (match.group(1), face) for face in range(first, last + 1))
+        return result or None
+
+    # ---- polygons, a fake mesh is a box with a face count ----
+
+    def _mesh(self, name, bbox, faces, parent=None):
+        transform = self._add(FakeNode(self._unique(name), "transform", parent))
+        shape = self._add(FakeNode(self._unique(transform.name + "Shape"), "mesh", transform.name))
+        shape.bbox = list(bbox)
+        shape.attrs["faces"] = faces
+        return transform.name
+
+    def polyEvaluate(self, *args, **kwargs):
+        shapes = []
+        for name in self._targets(args):
+            if self.nodes[name].type == "mesh":
+                shapes.append(name)
+            else:
+                shapes.extend(n for n in self._descendants(name) if self.nodes[n].type == "mesh")
+        return sum(int(self.nodes[n].attrs.get("faces", 6)) for n in set(shapes))
+
+    def polyCube(self, width=1.0, height=1.0, depth=1.0, name="pCube1", **kwargs):
+        return [self._mesh(name, [-width / 2.0, -height / 2.0, -depth / 2.0, width / 2.0, height / 2.0, depth / 2.0], 6)]
+
+    def duplicate(self, *args, **kwargs):
+        copies = []
+        for name in self._targets(args):
+            renamed = {}
+            for n in [name] + self._descendants(name):
+                node = self.nodes[n]
+                copy = FakeNode.from_dict(json.loads(json.dumps(node.to_dict())))
+                copy.name = self._unique(n)
+                copy.parent = renamed.get(node.parent, node.parent)
+                renamed[n] = copy.name
+                self._add(copy)
+            copies.append(renamed[name])
+        return copies
+
+    def polyUnite(self, *args, **kwargs):
+        shapes = [self._node(n).name for n in _as_list(args)]
+        transform = self._mesh(kwargs.get("name") or kwargs.get("n") or "polySurface1", self._world_bbox(shapes),
+                               self.polyEvaluate(shapes))
+        # without construction history the combined meshes are gone, their transforms stay
+        for shape in shapes:
+            self.delete(shape)
+        return [transform]
+
+    def polyReduce(self, *args, **kwargs):
+        percentage = kwargs.get("percentage", kwargs.get("p", 0.0))
+        for name in self._targets(args):
+            for n in [name] + self._descendants(name):
+                if self.nodes[n].type == "mesh":
+                    faces = int(self.nodes[n].attrs.get("faces", 6))
+                    self.nodes[n].attrs["faces"] = max(1, int(round(faces * (1.0 - percentage / 100.0))))
+
+    # ---- namespaces, a node is in the namespace its name starts with ----
+
+    def namespace(self, exists=None, removeNamespace=None, deleteNamespaceContent=False, **kwargs):
+        if exists is not None:
+            return any(n.startswith(exists.lstrip(":") + ":") for n in self.order)
+        if removeNamespace:
+            content = [n for n in self.order if n.startswith(removeNamespace.lstrip(":") + ":")]
+            if content and not deleteNamespaceContent:
+                raise RuntimeError("Namespace %s is not empty" % removeNamespace)
+            if any(ns.startswith(removeNamespace + ":") for p, ns in self.references):
+                raise RuntimeError("Namespace %s contains referenced nodes" % removeNamespace)
+            if content:
+                self.delete(content)
+
+    def namespaceInfo(self, parent=":", listOnlyNamespaces=False, **kwargs):
+        return sorted(set(":" + n.split(":")[0] for n in self.order if ":" in n)) or None
+
+    def flushUndo(self):
+        pass
+
+    def undoInfo(self, **kwargs):
+        self.options.update(("undo_" + k, v) for k, v in kwargs.items())
+
+    def objExists(self, name):
+        return str(name).split(".")[0].split("|")[-1] in self.nodes
+
+    def nodeType(self, name):
+        return self._node(name).type
+
+
+class CommandRecorder(object):
+    """
+    wraps a FakeCmds and counts every command that goes through it, the way maya.cmds is looked up by the previewer.
+    """
+
+    def __init__(self, fake):
+        self._fake = fake
+        self.calls = []
+
+    def __getattr__(self, name):
+        command = getattr(self._fake, name)
+        if name.startswith("_") or not callable(command):
+            return command
+
+        def recorded(*args, **kwargs):
+            self.calls.append(name)
+            return command(*args, **kwargs)
+        return recorded
+
+    def reset_calls(self):
+        self.calls = []
+
+    def call_count(self, name=None):
+        if name is None:
+            return len(self.calls)
+        return self.calls.count(name)
+
+
+class FakeMel(object):
+    def __init__(self):
+        self.evaluated = []
+
+    def eval(self, script):
+        self.evaluated.append(script)
+
+
+cmds = None
+mel = None
+
+
+def install(reset=True):
+    """
+    register the stand-in as maya, maya.cmds, maya.mel and maya.utils in sys.modules and return the recording cmds object.
+    """
+    global cmds, mel
+    if cmds is None or reset:
+        cmds = CommandRecorder(FakeCmds())
+        mel = FakeMel()
+    package = types.ModuleType("maya")
+    package.__path__ = []
+    package.cmds = cmds
+    package.mel = mel
+    standalone = types.ModuleType("maya.standalone")
+    standalone.initialize = lambda *args, **kwargs: None
+    standalone.uninitialize = lambda *args, **kwargs: None
+    package.standalone = standalone
+    utils = types.ModuleType("maya.utils")
+    # there is no idle queue without a maya session, deferred calls run right away
+    utils.executeDeferred = lambda function, *args, **kwargs: function(*args, **kwargs)
+    package.utils = utils
+    sys.modules["maya"] = package
+    sys.modules["maya.cmds"] = cmds
+    sys.modules["maya.mel"] = mel
+    sys.modules["maya.standalone"] = standalone
+    sys.modules["maya.utils"] = utils
+    return cmds
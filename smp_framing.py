@@ -0,0 +1,141 @@
+# Title: Simple Model Previewer - camera framing
+# Description: Frames SMP_Camera on the model without touching the selection. The model bounds are read in one
+#              bulk query (or, with NumPy, a tight bounding sphere is computed from the vertex positions) and the
+#              camera distance is solved from the lens and film aperture so that the sphere, and therefore the model,
+#              stays in frame for every angle of the orbit around the origin.
+# License: GPL v3
+
+
+import math
+
+import maya.cmds as cmds
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+CAMERA = "SMP_Camera"
+# factor of 0.5 means the geometry will occupy about half of the fov
+FIT_FACTOR = 0.5
+MM_PER_INCH = 25.4
+
+
+def world_bounds(nodes):
+    """
+    world space [xmin, ymin, zmin, xmax, ymax, zmax] of all the given nodes in a single query.
+    """
+    if not nodes:
+        return [-0.5, -0.5, -0.5, 0.5, 0.5, 0.5]
+    return cmds.exactWorldBoundingBox(nodes)
+
+
+def box_sphere(bounds):
+    center = [(bounds[axis] + bounds[axis + 3]) / 2.0 for axis in range(3)]
+    radius = math.sqrt(sum((bounds[axis + 3] - bounds[axis]) ** 2 for axis in range(3))) / 2.0
+    return center, radius
+
+
+def vertex_positions(shapes):
+    """
+    world space vertex positions of the given mesh shapes as an N x 3 array, read through the maya API when it is
+    there, else with one xform query per shape. Returns None without NumPy.
+    """
+    if numpy is None or not shapes:
+        return None
+    arrays = []
+    try:
+        import maya.api.OpenMaya as om
+    except ImportError:
+        om = None
+    if om is not None:
+        selection = om.MSelectionList()
+        for shape in shapes:
+            selection.add(shape)
+        for index in range(selection.length()):
+            dagPath = selection.getDagPath(index)
+            if dagPath.hasFn(om.MFn.kMesh):
+                points = om.MFnMesh(dagPath).getPoints(om.MSpace.kWorld)
+                arrays.append(numpy.array([(p.x, p.y, p.z) for p in points]))
+    else:
+        for shape in shapes:
+            flat = cmds.xform(shape + ".vtx[*]", q=True, ws=True, t=True) or []
+            if flat:
+                arrays.append(numpy.array(flat, dtype=float).reshape(-1, 3))
+    if not arrays:
+        return None
+    return numpy.concatenate(arrays)
+
+
+def bounding_sphere(points, iterations=32):
+    """
+    Ritter's bounding sphere of an N x 3 array, within a few percent of the smallest enclosing sphere.
+    """
+    first = points[0]
+    far = points[numpy.argmax(((points - first) ** 2).sum(axis=1))]
+    other = points[numpy.argmax(((points - far) ** 2).sum(axis=1))]
+    center = (far + other) / 2.0
+    radius = numpy.sqrt(((other - far) ** 2).sum()) / 2.0
+    for i in range(iterations):
+        distances = numpy.sqrt(((points - center) ** 2).sum(axis=1))
+        outside = numpy.argmax(distances)
+        if distances[outside] <= radius:
+            break
+        # grow the sphere just enough to reach the farthest point
+        newRadius = (radius + distances[outside]) / 2.0
+        center = center + (points[outside] - center) * ((newRadius - radius) / distances[outside])
+        radius = newRadius
+    return [float(v) for v in center], float(radius)
+
+
+def model_sphere(roots, shapes=None, tight=False):
+    """
+    sphere around the model, from the vertices when tight is asked and possible, from the bounds otherwise.
+    """
+    if tight:
+        points = vertex_positions(shapes or [])
+        if points is not None and len(points):
+            return bounding_sphere(points)
+    return box_sphere(world_bounds(roots))
+
+
+def half_fov(aperture, focalLength):
+    """
+    smallest half angle of view, in radians, of a film aperture (inches) and focal length (mm).
+    """
+    return min(math.atan(aperture[0] * MM_PER_INCH / (2.0 * focalLength)),
+               math.atan(aperture[1] * MM_PER_INCH / (2.0 * focalLength)))
+
+
+def fit_distance(radius, halfAngle, fitFactor=FIT_FACTOR):
+    """
+    camera distance at which a sphere of radius spans fitFactor of the narrowest side of the image.
+    """
+    angle = math.atan(fitFactor * math.tan(halfAngle))
+    return radius / math.sin(angle)
+
+
+def frame_camera(roots, shapes=None, aperture=None, fitFactor=FIT_FACTOR, tight=False, camera=CAMERA):
+    """
+    place the camera on the +Z axis at the fitting distance with its pivots at the origin, where the orbit turns it.
+    Returns the distance.
+    """
+    cameraShape = camera + "Shape"
+    if aperture:
+        cmds.setAttr(cameraShape + ".cameraAperture", aperture[0], aperture[1])
+    else:
+        aperture = cmds.getAttr(cameraShape + ".cameraAperture")[0]
+    focalLength = cmds.getAttr(cameraShape + ".focalLength")
+
+    center, radius = model_sphere(roots, shapes, tight)
+    # the orbit turns around the origin, so the sphere is widened to be centered there
+    radius = max(radius + math.sqrt(sum(c * c for c in center)), 1e-3)
+    distance = fit_distance(radius, half_fov(aperture, focalLength), fitFactor)
+
+    cmds.setAttr(camera + ".translate", 0, 0, distance)
+    # pivots are in object space, -distance puts them on the origin
+    cmds.setAttr(camera + ".rotatePivot", 0, 0, -distance)
+    cmds.setAttr(camera + ".scalePivot", 0, 0, -distance)
+    cmds.setAttr(cameraShape + ".farClipPlane", max(10000.0, (distance + radius) * 2.0))
+    return distance
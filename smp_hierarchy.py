@@ -0,0 +1,106 @@
+# Title: Simple Model Previewer - scene hierarchy index
+# Description: Builds an in-memory index of the DAG from two bulk ls queries, so roots, descendants and shapes of
+#              the imported model are answered without walking parents one listRelatives call at a time.
+# License: GPL v3
+
+
+import maya.cmds as cmds
+
+
+# groups of geometry the previewer adds itself, never part of the model, see smp_proxy
+PLUGIN_ROOTS = ("|SMP_Proxies",)
+
+
+class SceneHierarchy(object):
+    """
+    snapshot of the scene DAG. Every node is kept by its long (full path) name, e.g. |car|wheels|wheelShape1.
+    With a namespace only the geometry under roots of that namespace counts, the model of one asset.
+    Call build() again after the scene has changed.
+    """
+
+    def __init__(self, namespace=None):
+        self.namespace = namespace
+        self.build()
+
+    def build(self):
+        # one query for the geometry shapes, one for the whole DAG
+        self.shapes = [shape for shape in cmds.ls(geometry=True, long=True) or []
+                       if root_path(shape) not in PLUGIN_ROOTS]
+        if self.namespace:
+            prefix = "|" + self.namespace + ":"
+            self.shapes = [shape for shape in self.shapes if root_path(shape).startswith(prefix)]
+        self.nodes = cmds.ls(dag=True, long=True) or []
+
+        self.children = {}
+        self.shortNames = {}
+        for path in self.nodes:
+            self.children.setdefault(parent_path(path), []).append(path)
+            self.shortNames.setdefault(path.rsplit("|", 1)[-1], path)
+
+        self.rootList = []
+        self.shapesByRoot = {}
+        for shape in self.shapes:
+            root = root_path(shape)
+            if root not in self.shapesByRoot:
+                self.rootList.append(root)
+                self.shapesByRoot[root] = []
+            self.shapesByRoot[root].append(shape)
+
+    def roots(self, shapes=None):
+        """
+        unique root transforms of the given shapes (all geometry shapes by default), in scene order.
+        """
+        if shapes is None:
+            return list(self.rootList)
+        result = []
+        seen = set()
+        for shape in shapes:
+            root = root_path(self.long_name(shape))
+            if root not in seen:
+                seen.add(root)
+                result.append(root)
+        return result
+
+    def descendants(self, node):
+        """
+        every node below the given one, depth first.
+        """
+        result = []
+        stack = list(reversed(self.children.get(self.long_name(node), [])))
+        while stack:
+            path = stack.pop()
+            result.append(path)
+            stack.extend(reversed(self.children.get(path, [])))
+        return result
+
+    def shapes_under(self, node):
+        """
+        geometry shapes at or below the given node.
+        """
+        node = self.long_name(node)
+        if node in self.shapesByRoot:
+            return list(self.shapesByRoot[node])
+        prefix = node + "|"
+        return [shape for shape in self.shapesByRoot.get(root_path(node), [])
+                if shape == node or shape.startswith(prefix)]
+
+    def long_name(self, node):
+        """
+        map a short or partial name to its full path using the index, without asking maya.
+        """
+        if node.startswith("|"):
+            return node
+        if "|" in node:
+            suffix = "|" + node
+            for path in self.nodes:
+                if path.endswith(suffix):
+                    return path
+        return self.shortNames.get(node, "|" + node)
+
+
+def parent_path(path):
+    return path.rsplit("|", 1)[0]
+
+
+def root_path(path):
+    return "|" + path.split("|")[1]
@@ -0,0 +1,154 @@
+# Title: Simple Model Previewer - material assignment
+# Description: Assigns the shading groups of the material library in bulk. Targets, whole shapes or face components,
+#              are grouped by shading group and every group gets a single sets call instead of one select and one sets
+#              call per element. Rules assign materials across a whole scene without any selection: name patterns,
+#              hierarchy roots, or a per asset mapping file kept next to the model.
+# License: GPL v3
+# Usage:
+#   rules = [{"pattern": "*glass*", "material": "glass"},
+#            {"root": "chair", "material": "wood"},
+#            {"material": "plastic"}]
+#   smp_materials.apply_rules(rules)
+
+
+import fnmatch
+import json
+import os
+
+import maya.cmds as cmds
+
+import smp_hierarchy
+
+
+SG_SUFFIX = "SG"
+# shape types a shading group can be assigned to as a whole
+ASSIGNABLE_SHAPE_TYPES = ["mesh", "nurbsSurface", "subdiv"]
+# filterExpand selection masks of the components a shading group can be assigned to
+COMPONENT_MASKS = (10, 12, 34, 38, 68, 70, 72)
+# per asset mapping file, chair.ma -> chair.materials.json
+RULES_SUFFIX = ".materials.json"
+
+
+def shading_group(material):
+    return material + SG_SUFFIX
+
+
+def selection_targets(selection, hierarchy=None):
+    """
+    assignable targets of a selection. Selected objects and groups are expanded to their shapes through the
+    hierarchy index, components are only filtered, face ranges stay ranges.
+    """
+    components = [i for i in selection if "." in i]
+    objects = [i for i in selection if "." not in i]
+    targets = []
+    if objects:
+        hierarchy = hierarchy or smp_hierarchy.SceneHierarchy()
+        shapes = []
+        for obj in objects:
+            shapes.extend(hierarchy.shapes_under(obj))
+        targets.extend(cmds.ls(shapes, type=ASSIGNABLE_SHAPE_TYPES, long=True) or [])
+    if components:
+        targets.extend(cmds.filterExpand(components, sm=COMPONENT_MASKS, expand=False) or [])
+    return targets
+
+
+def assign(assignment):
+    """
+    assignment is {shading group: [members]}, members are shapes or components. Each shading group gets one sets
+    call; when maya refuses it, the members are tried one by one so that only the bad ones are left out.
+    Returns the members that could not be assigned.
+    """
+    failed = []
+    for sg, members in sorted(assignment.items()):
+        members = sorted(set(members))
+        if not members:
+            continue
+        if not cmds.objExists(sg):
+            print("Warning, shading group %s does not exist, please load the material file." % sg)
+            failed.extend(members)
+            continue
+        try:
+            cmds.sets(members, e=True, forceElement=sg)
+        except (RuntimeError, ValueError):
+            for member in members:
+                try:
+                    cmds.sets(member, e=True, forceElement=sg)
+                except (RuntimeError, ValueError):
+                    print("Cannot assign material to %s" % member)
+                    failed.append(member)
+    return failed
+
+
+def normalize_rules(rules):
+    """
+    rules as a list of dicts. A {pattern: material} dict is accepted as well, patterns are then tried in order.
+    """
+    if not rules:
+        return []
+    if isinstance(rules, dict):
+        return [{"pattern": pattern, "material": material} for pattern, material in sorted(rules.items())]
+    return list(rules)
+
+
+def load_rules(path):
+    with open(path) as f:
+        return normalize_rules(json.load(f))
+
+
+def asset_rules_path(modelFile):
+    return os.path.splitext(modelFile)[0] + RULES_SUFFIX
+
+
+def asset_rules(modelFile):
+    """
+    rules of the mapping file next to a model, empty when there is none.
+    """
+    path = asset_rules_path(modelFile)
+    if modelFile and os.path.isfile(path):
+        return load_rules(path)
+    return []
+
+
+def short_name(path):
+    return path.split("|")[-1].split(":")[-1]
+
+
+def rule_matches(rule, shape):
+    """
+    a rule with a pattern matches the shape or its transform by short name or long name, a rule with a root matches
+    everything under that root, a rule with neither matches every shape.
+    """
+    if "root" in rule and short_name(smp_hierarchy.root_path(shape)) != short_name(rule["root"]):
+        return False
+    if "pattern" in rule:
+        transform = smp_hierarchy.parent_path(shape)
+        names = [shape, short_name(shape)] + ([transform, short_name(transform)] if transform else [])
+        if not any(fnmatch.fnmatchcase(name, rule["pattern"]) for name in names):
+            return False
+    return True
+
+
+def resolve_rules(rules, hierarchy=None):
+    """
+    {shading group: [shapes]} for the assignable shapes of the scene, the first matching rule wins.
+    """
+    rules = normalize_rules(rules)
+    if not rules:
+        return {}
+    hierarchy = hierarchy or smp_hierarchy.SceneHierarchy()
+    shapes = cmds.ls(hierarchy.shapes, type=ASSIGNABLE_SHAPE_TYPES, long=True) or []
+    assignment = {}
+    for shape in shapes:
+        for rule in rules:
+            if rule_matches(rule, shape):
+                assignment.setdefault(shading_group(rule["material"]), []).append(shape)
+                break
+    return assignment
+
+
+def apply_rules(rules, hierarchy=None):
+    """
+    assign materials to the whole scene by rules. Returns the resolved assignment and the members that failed.
+    """
+    assignment = resolve_rules(rules, hierarchy)
+    return assignment, assign(assignment)
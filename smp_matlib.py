@@ -0,0 +1,88 @@
+# Title: Simple Model Previewer - material library
+# Description: Loads the material library file by reference instead of importing it. The reference is made once per
+#              scene and found again on later loads, the shaders are discovered from the file itself rather than
+#              from a fixed list, and every shader gets one <shader>SG shading group in the root namespace that is
+#              reused from then on. Loading the library again, or for the next asset of a batch, adds nothing.
+# License: GPL v3
+
+
+import os
+
+import maya.cmds as cmds
+
+import smp_materials
+
+
+LIBRARY_NAMESPACE = "smpMaterials"
+# shaders of every maya scene, they are never part of a library
+DEFAULT_SHADERS = ("lambert1", "particleCloud1", "shaderGlow1")
+
+# (library path, modification time) -> shader names, shared by every asset a batch worker processes
+_libraryShaders = {}
+
+
+def same_file(a, b):
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def referenced_namespace(path):
+    """
+    namespace of the reference to a file in the current scene, None when it is not referenced.
+    """
+    for referenceFile in cmds.file(q=True, reference=True) or []:
+        # maya appends {n} to a file referenced more than once
+        if same_file(referenceFile.split("{")[0], path):
+            return cmds.file(referenceFile, q=True, namespace=True)
+    return None
+
+
+def reference_library(path):
+    """
+    reference the library file unless the scene already does. Returns its namespace.
+    """
+    namespace = referenced_namespace(path)
+    if namespace is None:
+        cmds.file(path, reference=True, namespace=LIBRARY_NAMESPACE)
+        namespace = referenced_namespace(path)
+    return namespace
+
+
+def library_shaders(path, namespace):
+    """
+    names of the shaders the library file contains, without namespace. Discovered once per file version.
+    """
+    memo = (os.path.abspath(path), os.path.getmtime(path))
+    if memo not in _libraryShaders:
+        shaders = [shader.split(":")[-1] for shader in cmds.ls(namespace + ":*", materials=True) or []]
+        _libraryShaders[memo] = sorted(shader for shader in shaders if shader not in DEFAULT_SHADERS)
+    return list(_libraryShaders[memo])
+
+
+def ensure_shading_groups(shaders, namespace):
+    """
+    make sure every library shader drives a <shader>SG shading group. Existing shading groups are reused and only
+    reconnected when they point somewhere else. Returns the shading groups.
+    """
+    shadingGroups = []
+    for shader in shaders:
+        sg = smp_materials.shading_group(shader)
+        if not cmds.objExists(sg):
+            cmds.sets(empty=True, renderable=True, noSurfaceShader=True, name=sg)
+        source = namespace + ":" + shader
+        if (cmds.listConnections(sg + ".surfaceShader", source=True, destination=False) or [None])[0] != source:
+            cmds.connectAttr(source + ".outColor", sg + ".surfaceShader", force=True)
+        shadingGroups.append(sg)
+    return shadingGroups
+
+
+def load_library(path):
+    """
+    reference a material library and set up its shading groups. Returns the material names.
+    Calling it again with the same file leaves the scene unchanged.
+    """
+    if not os.path.isfile(path):
+        raise IOError("Material library %s does not exist" % path)
+    namespace = reference_library(path)
+    shaders = library_shaders(path, namespace)
+    ensure_shading_groups(shaders, namespace)
+    return shaders
@@ -0,0 +1,271 @@
+# Title: Simple Model Previewer - render monitor
+# Description: Follows a running render job from a background thread: frames done, frames per minute, time left, and
+#              whether the job stalled or its render processes crashed. Frames are found by watching the output
+#              folder, which is listed again only when its modification time changes, so an idle poll is one stat
+#              call. The status is written next to the images as smp_progress.json for other processes to read,
+#              and the job can be cancelled from the monitor.
+# License: GPL v3
+# Usage:
+#   monitor = smp_monitor.RenderMonitor(scheduler)
+#   monitor.watch(callback)     callback(status) after every poll, from the monitor thread
+#   scheduler.run()
+#   monitor.cancel()            from anywhere, kills the render processes
+
+
+import json
+import os
+import re
+import threading
+import time
+
+import smp_render
+
+
+POLL_INTERVAL = 1.0
+# no new frame for this long is a stall, or for STALL_FACTOR times the usual time between frames when that is longer
+STALL_SECONDS = 120.0
+STALL_FACTOR = 10.0
+# the folder is listed every this many polls even when its modification time did not change, coarse mtimes
+FULL_LIST_EVERY = 30
+PROGRESS_FILE = "smp_progress.json"
+# the job states a status reports
+WAITING, RENDERING, STALLED, DONE, FAILED, CANCELLED = "waiting", "rendering", "stalled", "done", "failed", "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+class FrameWatcher(object):
+    """
+    frames of a job that are complete in the output folder. Only names not seen before are looked at, and empty
+    files, frames still being written, are checked again on the next polls.
+    """
+
+    def __init__(self, outputDir, frames, extension, prefix=smp_render.IMAGE_PREFIX,
+                 padding=smp_render.FRAME_PADDING):
+        self.outputDir = outputDir
+        self.expected = set(frames)
+        self.pattern = re.compile(r"^%s\.(\d{%d,})\.%s$" % (re.escape(prefix), padding, re.escape(extension)))
+        self.done = set()
+        self._seen = set()
+        self._pending = set()
+        self._mtime = None
+        self._polls = 0
+
+    def poll(self):
+        """
+        returns the frames completed since the last poll.
+        """
+        try:
+            mtime = os.stat(self.outputDir).st_mtime
+        except OSError:
+            return []
+        self._polls += 1
+        if mtime != self._mtime or self._polls % FULL_LIST_EVERY == 0:
+            self._mtime = mtime
+            names = [name for name in os.listdir(self.outputDir) if name not in self._seen]
+        else:
+            names = list(self._pending)
+        new = []
+        for name in names:
+            match = self.pattern.match(name)
+            if not match or int(match.group(1)) not in self.expected:
+                self._seen.add(name)
+                continue
+            try:
+                size = os.path.getsize(os.path.join(self.outputDir, name))
+            except OSError:
+                self._pending.discard(name)
+                continue
+            if size > 0:
+                self._seen.add(name)
+                self._pending.discard(name)
+                self.done.add(int(match.group(1)))
+                new.append(int(match.group(1)))
+            else:
+                self._pending.add(name)
+        return sorted(new)
+
+
+class RenderMonitor(object):
+    """
+    progress of one RenderScheduler job. Frames already on disk when the monitor starts count as done but not
+    towards the render speed. A job rendering several layers has a watcher per layer folder, a frame is done when
+    every layer wrote it.
+    """
+
+    def __init__(self, scheduler, pollInterval=POLL_INTERVAL, stallSeconds=STALL_SECONDS, cancelStalled=False):
+        self.scheduler = scheduler
+        self.pollInterval = pollInterval
+        self.stallSeconds = stallSeconds
+        # headless runs have nobody to press cancel, a stalled job is cancelled by the watch thread
+        self.cancelStalled = cancelStalled
+        self.total = len(scheduler.job_frames())
+        self.watchers = [FrameWatcher(frameDir, scheduler.job_frames(), scheduler.extension, scheduler.prefix)
+                         for frameDir in scheduler.frame_dirs()]
+        self.done = set()
+        self.resumed = len(self.poll_frames())
+        self.rendered = 0
+        self.lastFrameTime = None
+        self.progressFile = os.path.join(scheduler.outputDir, PROGRESS_FILE)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll_frames(self):
+        """
+        returns the frames completed in every folder since the last poll.
+        """
+        for watcher in self.watchers:
+            watcher.poll()
+        done = set.intersection(*[watcher.done for watcher in self.watchers])
+        new = done - self.done
+        self.done = done
+        return sorted(new)
+
+    def poll(self):
+        new = self.poll_frames()
+        if new:
+            self.rendered += len(new)
+            self.lastFrameTime = time.time()
+        return self.status()
+
+    def crashed_calls(self):
+        """
+        render calls that exited with an error, killed ones of a cancelled job aside.
+        """
+        if self.scheduler.cancelled:
+            return []
+        return [result for result in list(self.scheduler.chunkResults)
+                if result["return_code"] not in (0, None)]
+
+    def stall_threshold(self, elapsed):
+        if not self.rendered:
+            return self.stallSeconds
+        return max(self.stallSeconds, STALL_FACTOR * elapsed / self.rendered)
+
+    def state(self, now, elapsed):
+        scheduler = self.scheduler
+        if scheduler.cancelled:
+            return CANCELLED
+        if scheduler.finished:
+            return DONE if len(self.done) >= self.total else FAILED
+        if scheduler.started is None:
+            return WAITING
+        if now - (self.lastFrameTime or scheduler.started) > self.stall_threshold(elapsed):
+            return STALLED
+        return RENDERING
+
+    def status(self):
+        now = time.time()
+        started = self.scheduler.started
+        elapsed = now - started if started else 0.0
+        done = len(self.done)
+        framesPerMinute = 60.0 * self.rendered / elapsed if self.rendered and elapsed > 0 else None
+        crashed = self.crashed_calls()
+        state = self.state(now, elapsed)
+        if state in FINAL_STATES:
+            framesPerMinute = framesPerMinute if state == DONE else None
+        return {"output_dir": self.scheduler.outputDir,
+                "state": state,
+                "done": done,
+                "total": self.total,
+                "resumed": self.resumed,
+                "percent": round(100.0 * done / self.total, 1) if self.total else 100.0,
+                "elapsed_seconds": round(elapsed, 1),
+                "frames_per_minute": round(framesPerMinute, 2) if framesPerMinute else None,
+                "eta_seconds": round(60.0 * (self.total - done) / framesPerMinute, 1) if framesPerMinute else None,
+                "seconds_since_frame": round(now - (self.lastFrameTime or started), 1) if started else None,
+                "crashed_calls": len(crashed),
+                "last_error_log": crashed[-1].get("log") if crashed else None,
+                "time": now}
+
+    def write_progress(self, status):
+        try:
+            with open(self.progressFile, "w") as f:
+                json.dump(status, f, indent=1, sort_keys=True)
+        except (IOError, OSError):
+            pass
+
+    def watch(self, callback=None):
+        """
+        poll on a background thread until the job ends, writing the progress file and calling callback(status)
+        after every poll. Returns the thread.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, args=(callback,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self._thread
+
+    def _watch(self, callback):
+        while True:
+            # checked before the poll so that the last poll sees every frame of the finished job
+            finished = self.scheduler.finished or self._stop.is_set()
+            status = self.poll()
+            self.write_progress(status)
+            if callback:
+                try:
+                    callback(status)
+                except Exception as e:
+                    print("Warning, render progress callback failed. %s" % e)
+            if finished or status["state"] in FINAL_STATES:
+                return
+            if status["state"] == STALLED and self.cancelStalled:
+                print("Render in %s stalled, no frame for %s seconds, cancelling it." %
+                      (self.scheduler.outputDir, status["seconds_since_frame"]))
+                self.scheduler.cancel()
+            self._stop.wait(self.pollInterval)
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def cancel(self):
+        self.scheduler.cancel()
+        self.stop(wait=False)
+
+
+def read_progress(outputDir):
+    """
+    the last status written for a render folder, None when there is none yet.
+    """
+    try:
+        with open(os.path.join(outputDir, PROGRESS_FILE)) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "%d:%02d:%02d" % (hours, minutes, seconds) if hours else "%d:%02d" % (minutes, seconds)
+
+
+def describe(status):
+    """
+    one line summary of a status.
+    """
+    speed = "%.1f frames/min" % status["frames_per_minute"] if status["frames_per_minute"] else "-- frames/min"
+    line = "%s %d/%d frames (%.0f%%), %s, %s left" % (status["state"], status["done"], status["total"],
+                                                      status["percent"], speed, format_seconds(status["eta_seconds"]))
+    if status["crashed_calls"]:
+        line += ", %d render calls failed" % status["crashed_calls"]
+    return line
+
+
+def folders_progress(outputDirs):
+    """
+    sum of the progress files found in render folders, for a driver following renders of other processes.
+    Returns the totals, with the number of folders in every state, and the statuses of the folders that have one.
+    """
+    statuses = [status for status in (read_progress(outputDir) for outputDir in outputDirs) if status]
+    totals = {"folders": len(statuses),
+              "done": sum(status["done"] for status in statuses),
+              "total": sum(status["total"] for status in statuses),
+              "frames_per_minute": round(sum(status["frames_per_minute"] or 0 for status in statuses
+                                             if status["state"] == RENDERING), 2),
+              "states": dict((state, len([status for status in statuses if status["state"] == state]))
+                             for state in (WAITING, RENDERING, STALLED, DONE, FAILED, CANCELLED))}
+    return totals, statuses
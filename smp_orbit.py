@@ -0,0 +1,137 @@
+# Title: Simple Model Previewer - camera orbit
+# Description: Bakes the camera motion of SMP_Camera into linear animation curves instead of a per frame expression.
+#              An orbit is a list of segments, each one turning the camera around the origin while its elevation
+#              moves from one angle to another, so turntables, multi ring orbits and elevation sweeps are all
+#              described the same way and updated in place when the animation length changes.
+# License: GPL v3
+
+
+import maya.cmds as cmds
+
+
+CAMERA = "SMP_Camera"
+# name of the expression older versions of the previewer drove the camera with
+LEGACY_EXPRESSION = "SMP_Camera_Motion_Expression"
+# default tilt of the camera, looking slightly down on the model
+ELEVATION = -20.0
+
+
+def turntable(totalFrames, elevation=ELEVATION):
+    """
+    one full turn over the whole animation, rotateY = (frame - 1) * 360 / totalFrames.
+    """
+    return [(1, totalFrames + 1, elevation, elevation, 1.0)]
+
+
+def rings(totalFrames, elevations=(ELEVATION, -45.0, 10.0)):
+    """
+    one full turn per elevation, the animation split evenly between them.
+    """
+    elevations = list(elevations) or [ELEVATION]
+    length = float(totalFrames) / len(elevations)
+    segments = []
+    for index, elevation in enumerate(elevations):
+        segments.append((1 + index * length, 1 + (index + 1) * length, elevation, elevation, 1.0))
+    return segments
+
+
+def sweep(totalFrames, startElevation=ELEVATION, endElevation=-60.0, turns=2.0):
+    """
+    turns around the model while the elevation moves smoothly from startElevation to endElevation.
+    """
+    return [(1, totalFrames + 1, startElevation, endElevation, float(turns))]
+
+
+ORBITS = {"turntable": turntable,
+          "rings": rings,
+          "sweep": sweep}
+ORBIT_NAMES = ["turntable", "rings", "sweep"]
+
+
+def orbit_segments(orbit, totalFrames, **options):
+    if orbit not in ORBITS:
+        raise ValueError("Unknown camera orbit %s" % orbit)
+    return ORBITS[orbit](totalFrames, **options)
+
+
+def view_frames(segments, count):
+    """
+    frames of the orbit that look at the model from count evenly spaced azimuths, on every segment.
+    Returns [(frame, azimuth, elevation)], the angles being the ones of the rounded frame.
+    """
+    views = []
+    for start, end, startElevation, endElevation, turns in segments:
+        length = float(end - start)
+        seen = set()
+        for index in range(count):
+            # the views of a segment spread over its first turn, or over all of it when it turns less
+            fraction = float(index) / count / max(turns, 1.0)
+            frame = int(round(start + fraction * length))
+            if frame >= end or frame in seen:
+                continue
+            seen.add(frame)
+            fraction = (frame - start) / length
+            views.append((frame,
+                          round((360.0 * turns * fraction) % 360.0, 3),
+                          round(startElevation + (endElevation - startElevation) * fraction, 3)))
+    return views
+
+
+def orbit_keys(segments):
+    """
+    turn segments into keys, {attr: ([(time, value), ...], tangentType)} for rotateX and rotateY.
+    rotateY is always linear. When every segment keeps its elevation, rotateX gets one stepped key per segment,
+    so rings change elevation from one frame to the next; elevation sweeps are keyed linear.
+    """
+    turnKeys = []
+    angle = 0.0
+    for start, end, startElevation, endElevation, turns in segments:
+        if not turnKeys or turnKeys[-1][0] != start:
+            turnKeys.append((start, angle))
+        angle += 360.0 * turns
+        turnKeys.append((end, angle))
+
+    stepped = all(startElevation == endElevation for start, end, startElevation, endElevation, turns in segments)
+    elevationKeys = []
+    for start, end, startElevation, endElevation, turns in segments:
+        if elevationKeys and elevationKeys[-1][0] == start:
+            elevationKeys.pop()
+        elevationKeys.append((start, startElevation))
+        if not stepped:
+            elevationKeys.append((end, endElevation))
+    return {"rotateX": (elevationKeys, "step" if stepped else "linear"),
+            "rotateY": (turnKeys, "linear")}
+
+
+def bake_orbit(segments, camera=CAMERA):
+    """
+    key the orbit on the camera. Existing curves with the same number of keys are edited in place,
+    otherwise they are replaced, so repeated calls never add nodes to the scene. The keys of a curve are set
+    together, the number of calls does not grow with the number of keys.
+    """
+    delete_legacy_expressions()
+    for attr, (keys, tangentType) in sorted(orbit_keys(segments).items()):
+        oldTimes = cmds.keyframe(camera, attribute=attr, query=True, timeChange=True) or []
+        if len(oldTimes) != len(keys):
+            if oldTimes:
+                cmds.cutKey(camera, attribute=attr, clear=True)
+            # a curve with a key at every time, the values follow
+            cmds.setKeyframe(camera, attribute=attr, time=[time for time, value in keys])
+        curve = cmds.keyframe(camera, attribute=attr, query=True, name=True)[0]
+        # every time and value in one call, the way scene files store curves
+        cmds.setAttr("%s.keyTimeValue[0:%d]" % (curve, len(keys) - 1), *[x for key in keys for x in key])
+        if tangentType == "step":
+            cmds.keyTangent(camera, attribute=attr, outTangentType="step")
+        else:
+            # linear in between and beyond the keys, the way the expression behaved
+            cmds.keyTangent(camera, attribute=attr, inTangentType="linear", outTangentType="linear")
+            cmds.setInfinity(camera, attribute=attr, preInfinite="linear", postInfinite="linear")
+
+
+def delete_legacy_expressions():
+    """
+    remove the camera expressions left in scenes made by earlier versions of the previewer.
+    """
+    expressions = [e for e in cmds.ls(type="expression") or [] if e.startswith(LEGACY_EXPRESSION)]
+    if expressions:
+        cmds.delete(expressions)
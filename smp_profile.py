@@ -0,0 +1,239 @@
+# Title: Simple Model Previewer - stage profiling
+# Description: Records wall time, maya.cmds call counts and scene node counts of the pipeline stages (model load,
+#              preparation, camera, materials, render setup and the render itself) plus per frame render durations,
+#              and writes them as a json report per asset. It is switched on with the SMP_PROFILE environment
+#              variable, no code edits needed. When on, the cost is one counter increment per maya.cmds call and
+#              two node listings per stage. When off, a stage is a single flag check.
+# License: GPL v3
+# Usage:
+#   SMP_PROFILE=1 maya                   reports go to ~/smp_profiles/<asset>.json
+#   SMP_PROFILE=/shared/profiles maya    reports go to that directory
+#   python smp_batch.py --profile ...    reports go to every asset output folder as smp_profile.json
+
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+import smp_render
+
+
+ENV_VAR = "SMP_PROFILE"
+DEFAULT_REPORT_DIR = os.path.join(os.path.expanduser("~"), "smp_profiles")
+REPORT_NAME = "smp_profile.json"
+# modules whose maya.cmds calls are counted
+MODULE_PREFIXES = ("smp_", "simpleModelPreviewer")
+
+_counter = None
+
+
+def env_setting():
+    value = os.environ.get(ENV_VAR, "").strip()
+    return "" if value.lower() in ("", "0", "off", "false", "no") else value
+
+
+def report_dir():
+    value = env_setting()
+    return DEFAULT_REPORT_DIR if value.lower() in ("1", "on", "true", "yes") else value
+
+
+class CallCounter(object):
+    """
+    stands in for maya.cmds and counts the calls going through it. A command is wrapped the first time it is
+    looked up and then kept on the instance, so later lookups are plain attribute reads.
+    """
+
+    def __init__(self, cmds):
+        self._cmds = cmds
+        self.count = 0
+
+    def __getattr__(self, name):
+        command = getattr(self._cmds, name)
+        if name.startswith("_") or not callable(command):
+            return command
+
+        def counted(*args, **kwargs):
+            self.count += 1
+            return command(*args, **kwargs)
+        setattr(self, name, counted)
+        return counted
+
+
+def instrument():
+    """
+    route the maya.cmds of every loaded previewer module through one CallCounter. Returns the counter.
+    """
+    global _counter
+    import maya.cmds
+    if _counter is None or _counter._cmds is not maya.cmds:
+        _counter = CallCounter(maya.cmds)
+    for name, module in list(sys.modules.items()):
+        if module is not None and name.startswith(MODULE_PREFIXES) and name != __name__ and \
+                getattr(module, "cmds", None) is maya.cmds:
+            module.cmds = _counter
+    return _counter
+
+
+def node_count(counter):
+    # straight to maya.cmds, the profiler's own queries are not counted
+    return len(counter._cmds.ls() or [])
+
+
+def frame_durations(renderReport, extension, prefix=smp_render.IMAGE_PREFIX):
+    """
+    seconds spent on every frame a render job wrote, from the modification times of the images of each chunk.
+    The first frame of a chunk includes the start of its render process. A frame of a job rendering several
+    layers is written last to the folder of the last layer.
+    """
+    durations = {}
+    for chunk in renderReport.get("chunk_results", []):
+        previous = chunk.get("started")
+        if previous is None:
+            continue
+        for frame in smp_render.chunk_range(chunk["chunk"]):
+            path = os.path.join(renderReport.get("frame_dirs", [renderReport["output_dir"]])[-1],
+                                smp_render.frame_filename(frame, extension, prefix))
+            if not os.path.isfile(path):
+                continue
+            written = os.path.getmtime(path)
+            # frames of an earlier attempt or an earlier run
+            if written < chunk["started"]:
+                continue
+            durations[frame] = round(written - previous, 3)
+            previous = written
+    return durations
+
+
+class Profiler(object):
+    """
+    collects the stages of one asset. Stages nest, each one records its parent.
+    """
+
+    def __init__(self, enabled=None):
+        self.enabled = bool(env_setting()) if enabled is None else enabled
+        self.counter = instrument() if self.enabled else None
+        # reports go to reportDir as <asset>.json, or as reportName when it is set
+        self.reportDir = report_dir() if self.enabled else None
+        self.reportName = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.set_asset(None)
+
+    def set_asset(self, asset):
+        """
+        start the report of another asset. Stages still open are recorded into the new report.
+        """
+        self.asset = asset
+        self.started = time.time()
+        self.stages = []
+        self.frames = {}
+
+    def report_path(self):
+        if not self.reportDir or not (self.reportName or self.asset):
+            return None
+        return os.path.join(self.reportDir,
+                            self.reportName or os.path.splitext(os.path.basename(self.asset))[0] + ".json")
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def stage(self, name, sceneQueries=True):
+        """
+        a stage, as context manager. Without sceneQueries it records the time and calls only, no node counts and no
+        report write, so it can run off the main thread where maya.cmds must not be called.
+        """
+        return _Stage(self, name, sceneQueries)
+
+    def add_frames(self, durations):
+        with self._lock:
+            self.frames.update(durations)
+
+    def report(self):
+        totals = {}
+        for stage in self.stages:
+            total = totals.setdefault(stage["name"], {"count": 0, "seconds": 0.0, "cmds_calls": 0})
+            total["count"] += 1
+            total["seconds"] = round(total["seconds"] + stage["seconds"], 4)
+            total["cmds_calls"] += stage["cmds_calls"]
+        frameTimes = list(self.frames.values())
+        return {"asset": self.asset,
+                "started": self.started,
+                "stages": self.stages,
+                "totals": totals,
+                "frames": {"count": len(frameTimes),
+                           "mean_seconds": round(sum(frameTimes) / len(frameTimes), 3) if frameTimes else None,
+                           "max_seconds": max(frameTimes) if frameTimes else None,
+                           "durations": dict((str(frame), seconds) for frame, seconds in sorted(self.frames.items()))}}
+
+    def write(self, path=None):
+        """
+        write the json report, to the path of the asset when none is given. Returns the path.
+        """
+        path = path or self.report_path()
+        if not self.enabled or not path:
+            return None
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with self._lock:
+            report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+        return path
+
+
+class _Stage(object):
+    def __init__(self, profiler, name, sceneQueries=True):
+        self.profiler = profiler
+        self.name = name
+        self.sceneQueries = sceneQueries
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        counter = self.profiler.counter
+        self.nodesBefore = node_count(counter) if self.sceneQueries else None
+        self.callsBefore = counter.count
+        self.start = time.time()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        seconds = time.time() - self.start
+        counter = self.profiler.counter
+        calls = counter.count - self.callsBefore
+        self.profiler._stack().pop()
+        record = {"name": self.name,
+                  "parent": self.parent,
+                  "seconds": round(seconds, 4),
+                  "cmds_calls": calls,
+                  "nodes_before": self.nodesBefore,
+                  "nodes_after": node_count(counter) if self.sceneQueries else None,
+                  "error": excType.__name__ if excType else None}
+        with self.profiler._lock:
+            self.profiler.stages.append(record)
+        if self.parent is None and self.sceneQueries:
+            self.profiler.write()
+        return False
+
+
+def profiled(name, sceneQueries=True):
+    """
+    method decorator recording a stage on the profiler of the instance, self.profiler. Methods that run on a
+    thread pass sceneQueries=False, see Profiler.stage.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = self.profiler
+            if not profiler.enabled:
+                return method(self, *args, **kwargs)
+            with profiler.stage(name, sceneQueries):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
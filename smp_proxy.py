@@ -0,0 +1,240 @@
+# Title: Simple Model Previewer - viewport proxies
+# Description: Stand-ins for heavy models while working in the viewport. Every root of the model with more than
+#              PROXY_MIN_FACES faces gets a proxy, a decimated copy of its meshes or a box of its bounds, under the
+#              SMP_Proxies group. The full geometry is hidden while the proxies are shown and comes back only for the
+#              scene written for rendering. Proxies are built in the coordinates of the imported file, before the
+#              model is centered, and cached next to the asset so each model file is decimated once.
+# License: GPL v3
+
+
+import glob
+import os
+
+import maya.cmds as cmds
+
+import smp_cache
+import smp_framing
+import smp_scenecache
+
+
+PROXY_GROUP = "SMP_Proxies"
+# none, a decimated mesh per root, or a bounding box per root
+PROXY_MODES = ["none", "decimated", "bbox"]
+# roots lighter than this are drawn as they are
+PROXY_MIN_FACES = 100000
+# faces a decimated proxy is reduced to
+PROXY_TARGET_FACES = 20000
+PROXY_SUFFIX = "_smpProxy"
+# string attribute of a proxy naming the root it stands for
+SOURCE_ATTR = "smpProxySource"
+# string attribute of the proxy group naming the mode its proxies were built in
+MODE_ATTR = "smpProxyMode"
+# bump when the proxy building changes, older cached proxies are then ignored
+PROXY_VERSION = 1
+
+
+def face_count(shapes):
+    meshes = cmds.ls(shapes, type="mesh") or []
+    return cmds.polyEvaluate(meshes, face=True) if meshes else 0
+
+
+def heavy_roots(hierarchy, minFaces=PROXY_MIN_FACES):
+    """
+    {root: face count} of the roots worth a proxy.
+    """
+    heavy = {}
+    for root in hierarchy.roots():
+        faces = face_count(hierarchy.shapes_under(root))
+        if faces > minFaces:
+            heavy[root] = faces
+    return heavy
+
+
+def proxy_name(root):
+    return root.split("|")[-1].split(":")[-1] + PROXY_SUFFIX
+
+
+def bbox_proxy(root):
+    bounds = smp_framing.world_bounds([root])
+    proxy = cmds.polyCube(width=bounds[3] - bounds[0], height=bounds[4] - bounds[1], depth=bounds[5] - bounds[2],
+                          constructionHistory=False, name=proxy_name(root))[0]
+    cmds.move((bounds[0] + bounds[3]) / 2.0, (bounds[1] + bounds[4]) / 2.0, (bounds[2] + bounds[5]) / 2.0, proxy)
+    return proxy
+
+
+def decimated_proxy(root, faces, targetFaces=PROXY_TARGET_FACES):
+    """
+    one mesh made of the meshes under the root, reduced to about targetFaces faces.
+    """
+    copy = cmds.duplicate(root, returnRootsOnly=True)[0]
+    meshes = cmds.ls(cmds.listRelatives(copy, allDescendents=True, type="mesh", fullPath=True) or [],
+                     noIntermediate=True, long=True) or []
+    if len(meshes) > 1:
+        proxy = cmds.polyUnite(meshes, constructionHistory=False, mergeUVSets=True, name=proxy_name(root))[0]
+    else:
+        proxy = cmds.listRelatives(meshes[0], parent=True, fullPath=True)[0]
+        if proxy.split("|")[-1] != copy.split("|")[-1]:
+            proxy = cmds.parent(proxy, world=True)[0]
+        proxy = cmds.rename(proxy, proxy_name(root))
+    if cmds.objExists(copy):
+        cmds.delete(copy)
+    if faces > targetFaces:
+        cmds.polyReduce(proxy, percentage=100.0 * (1.0 - float(targetFaces) / faces), keepQuadsWeight=0.0,
+                        constructionHistory=False)
+    return proxy
+
+
+def build_proxies(hierarchy, mode):
+    """
+    build the proxies of the heavy roots under the proxy group. Returns {root: proxy}.
+    """
+    proxies = {}
+    for root, faces in sorted(heavy_roots(hierarchy).items()):
+        if mode == "bbox":
+            proxy = bbox_proxy(root)
+        else:
+            proxy = decimated_proxy(root, faces)
+        cmds.addAttr(proxy, longName=SOURCE_ATTR, dataType="string")
+        cmds.setAttr(proxy + "." + SOURCE_ATTR, root, type="string")
+        proxies[root] = proxy
+    if proxies:
+        cmds.group(list(proxies.values()), name=PROXY_GROUP, world=True)
+        cmds.addAttr(PROXY_GROUP, longName=MODE_ATTR, dataType="string")
+        cmds.setAttr(PROXY_GROUP + "." + MODE_ATTR, mode, type="string")
+    return scene_proxies()
+
+
+def scene_proxies():
+    """
+    {root: proxy} of the proxies in the scene, found through the proxy group.
+    """
+    if not cmds.objExists(PROXY_GROUP):
+        return {}
+    proxies = {}
+    for proxy in cmds.listRelatives(PROXY_GROUP, children=True, type="transform", fullPath=True) or []:
+        if cmds.attributeQuery(SOURCE_ATTR, node=proxy, exists=True):
+            root = cmds.getAttr(proxy + "." + SOURCE_ATTR)
+            if cmds.objExists(root):
+                proxies[root] = proxy
+    return proxies
+
+
+def scene_proxy_mode():
+    """
+    the mode of the proxies in the scene, none without proxies and None when the proxy group does not tell.
+    """
+    if not cmds.objExists(PROXY_GROUP):
+        return "none"
+    if not cmds.attributeQuery(MODE_ATTR, node=PROXY_GROUP, exists=True):
+        return None
+    return cmds.getAttr(PROXY_GROUP + "." + MODE_ATTR)
+
+
+def remove_proxies():
+    """
+    delete the proxies, their roots are shown again.
+    """
+    show_proxies(scene_proxies(), False)
+    if cmds.objExists(PROXY_GROUP):
+        cmds.delete(PROXY_GROUP)
+
+
+def cache_path(modelFile, mode):
+    key = smp_cache.digest([PROXY_VERSION, smp_cache.file_digest(modelFile), mode, PROXY_MIN_FACES,
+                            PROXY_TARGET_FACES])
+    base = os.path.splitext(os.path.basename(modelFile))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(modelFile)), smp_scenecache.CACHE_FOLDER,
+                        "%s_proxy_%s.mb" % (base, key[:16]))
+
+
+def store(path):
+    """
+    export the proxy group as the cached proxies of a model, removing the ones cached with other settings.
+    """
+    directory = os.path.dirname(path)
+    base = os.path.basename(path).rsplit("_", 1)[0]
+    selection = cmds.ls(selection=True, long=True) or []
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for old in glob.glob(os.path.join(directory, base + "_" + "?" * 16 + ".mb")):
+            if old != path:
+                os.remove(old)
+        # exporting a part of the scene goes through the selection, it is put back right after
+        cmds.select(PROXY_GROUP, replace=True)
+        cmds.file(path, exportSelected=True, type="mayaBinary", force=True)
+    except (IOError, OSError, RuntimeError) as e:
+        print("Warning, unable to cache the proxies in %s. %s" % (directory, e))
+    finally:
+        if selection:
+            cmds.select(selection, replace=True)
+        else:
+            cmds.select(clear=True)
+
+
+def load_proxies(modelFile, hierarchy, mode):
+    """
+    proxies for the model just imported, from the cache next to it or built and cached. Called before the model
+    is moved, the proxy group then moves along with it. Without a model file they are built from the scene as it
+    is and not cached. Returns {root: proxy}.
+    """
+    remove_proxies()
+    if mode == "none":
+        return {}
+    path = cache_path(modelFile, mode) if modelFile and os.path.isfile(modelFile) else None
+    if path and os.path.isfile(path):
+        cmds.file(path, i=True)
+        proxies = scene_proxies()
+        # the cached proxies are used only when they still match the roots of the model
+        if proxies and sorted(proxies) == sorted(heavy_roots(hierarchy)):
+            return proxies
+        remove_proxies()
+    proxies = build_proxies(hierarchy, mode)
+    if path and proxies:
+        store(path)
+    return proxies
+
+
+def show_proxies(proxies, show=True):
+    """
+    draw the proxies instead of the full geometry of their roots, or the other way around.
+    """
+    if not proxies:
+        return
+    for root in proxies:
+        cmds.setAttr(root + ".visibility", not show)
+    cmds.setAttr(PROXY_GROUP + ".visibility", show)
+
+
+class FullGeometry(object):
+    """
+    context manager showing the full geometry, for writing the render scene. The proxies come back afterwards.
+    """
+
+    def __init__(self, proxies):
+        self.proxies = proxies
+
+    def __enter__(self):
+        show_proxies(self.proxies, False)
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        show_proxies(self.proxies, True)
+        return False
+
+
+def source_selection(selection, proxies):
+    """
+    a selection with the selected proxies replaced by the roots they stand for.
+    """
+    sources = dict((proxy.split("|")[-1], root) for root, proxy in proxies.items())
+    result = []
+    for item in selection:
+        name = item.split("|")[-1].split(".")[0]
+        if name in sources:
+            if "." in item:
+                print("Components of the proxy %s cannot be assigned, the whole model is used." % name)
+            item = sources[name]
+        if item not in result:
+            result.append(item)
+    return result
@@ -0,0 +1,98 @@
+# Title: Simple Model Previewer - render quality tiers
+# Description: Named quality tiers that set the resolution scale, edge anti-aliasing, raytracing and reflection depth
+#              of a render together. A render starts with the draft tier, a fast low resolution look written to a
+#              draft folder, and goes on to the final tier when that is the requested quality. With the draft
+#              pre-pass switched off a final render goes straight to the final tier. The cost per frame of every
+#              tier is recorded next to its images so the tiers can be tuned.
+# License: GPL v3
+
+
+import json
+import os
+import time
+
+
+# edgeAntiAliasing of maya software: 0 highest, 1 high, 2 medium, 3 low
+TIERS = {"draft": {"resolutionScale": 0.5,
+                   "edgeAntiAliasing": 3,
+                   "enableRaytracing": 0,
+                   "reflections": 0,
+                   "folder": "draft"},
+         "final": {"resolutionScale": 1.0,
+                   "edgeAntiAliasing": 1,
+                   "enableRaytracing": 1,
+                   "reflections": 2,
+                   "folder": ""}}
+# in the order they are rendered
+TIER_NAMES = ["draft", "final"]
+COST_FILE = "smp_quality.json"
+
+
+def tier_settings(tier):
+    if tier not in TIERS:
+        raise ValueError("Unknown quality tier %s" % tier)
+    return TIERS[tier]
+
+
+def render_tiers(quality, draftPreview=True):
+    """
+    the tiers a render of the given quality goes through, with draftPreview every tier up to it, the draft first.
+    """
+    tier_settings(quality)
+    if draftPreview:
+        return TIER_NAMES[:TIER_NAMES.index(quality) + 1]
+    return [quality]
+
+
+def tier_output_dir(outputDir, tier):
+    folder = tier_settings(tier)["folder"]
+    return os.path.join(outputDir, folder) if folder else outputDir
+
+
+def scaled_resolution(width, height, tier):
+    scale = tier_settings(tier)["resolutionScale"]
+    return max(2, int(round(width * scale))), max(2, int(round(height * scale)))
+
+
+def render_attrs(tier):
+    """
+    (attribute, value) of the render quality settings of a tier, the resolution aside.
+    """
+    settings = tier_settings(tier)
+    return [("defaultRenderQuality.edgeAntiAliasing", settings["edgeAntiAliasing"]),
+            ("defaultRenderQuality.enableRaytracing", settings["enableRaytracing"]),
+            ("defaultRenderQuality.reflections", settings["reflections"])]
+
+
+def frame_cost(report):
+    """
+    render process seconds per rendered frame of a render report, None when nothing was rendered.
+    """
+    rendered = report.get("rendered", 0)
+    if not rendered:
+        return None
+    processSeconds = sum(chunk["seconds"] for chunk in report.get("chunk_results", []))
+    return round(processSeconds / rendered, 4)
+
+
+def record_cost(outputDir, tier, report, resolution):
+    """
+    add the cost of a finished render to the cost file of its folder. Returns the entry.
+    """
+    entry = {"tier": tier,
+             "settings": tier_settings(tier),
+             "resolution": list(resolution),
+             "frames_rendered": report.get("rendered", 0),
+             "wall_seconds": report.get("seconds"),
+             "processes": report.get("processes"),
+             "seconds_per_frame": frame_cost(report),
+             "time": time.time()}
+    path = os.path.join(outputDir, COST_FILE)
+    history = []
+    if os.path.isfile(path):
+        with open(path) as f:
+            history = json.load(f)
+    history.append(entry)
+    with open(path, "w") as f:
+        json.dump(history, f, indent=1, sort_keys=True)
+    return entry
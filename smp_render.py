@@ -0,0 +1,381 @@
+# Title: Simple Model Previewer - render scheduler
+# Description: Renders a saved scene with several local maya software render processes. The frame range is split
+#              into chunks, frames already in the output directory are skipped so an interrupted job resumes where it
+#              stopped, and chunks that fail are retried for the frames they did not write. Frames can be a sparse
+#              selection of the range, and a progressive job renders them coarse to fine. A job can render several
+#              render layers of the scene in every Render call, each layer into a sub folder of the output directory.
+# License: GPL v3
+# Usage:
+#   python smp_render.py scene.mb -o /renders/chair -s 1 -e 1440 -j 8
+
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+
+IMAGE_PREFIX = "smp_render"
+SCENE_NAME = "smp_scene.mb"
+# the renderOutput naming: prefix.####.ext, frame number before the extension, 4 digit padding
+FRAME_PADDING = 4
+CAMERA = "SMP_Camera"
+LOG_DIR = "smp_logs"
+# full: every frame in order, sparse: a few views of the orbit, progressive: every frame, coarse to fine
+RENDER_MODES = ["full", "sparse", "progressive"]
+# frame, azimuth and elevation of every image of a sparse render
+VIEWS_INDEX = "smp_views.json"
+# Render replaces it in the image prefix by the name of the layer being rendered
+LAYER_TOKEN = "<RenderLayer>"
+
+
+# Render starts the actual renderer as a child process, each one gets its own process group so a cancel stops both
+if os.name == "nt":
+    NEW_PROCESS_GROUP = {"creationflags": 0x00000200}
+elif sys.version_info[0] >= 3:
+    NEW_PROCESS_GROUP = {"start_new_session": True}
+else:
+    NEW_PROCESS_GROUP = {"preexec_fn": os.setsid}
+
+
+def kill_process_tree(process):
+    try:
+        if os.name == "nt":
+            with open(os.devnull, "w") as devnull:
+                subprocess.call(["taskkill", "/F", "/T", "/PID", str(process.pid)], stdout=devnull, stderr=devnull)
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+    except OSError:
+        # already gone
+        pass
+
+
+def default_render_executable():
+    mayaLocation = os.environ.get("MAYA_LOCATION")
+    if mayaLocation:
+        return os.path.join(mayaLocation, "bin", "Render")
+    return "Render"
+
+
+def frame_filename(frame, extension, prefix=IMAGE_PREFIX, padding=FRAME_PADDING):
+    return "%s.%0*d.%s" % (prefix, padding, frame, extension)
+
+
+def existing_frames(outputDir, extension, prefix=IMAGE_PREFIX, padding=FRAME_PADDING):
+    """
+    frame numbers already written to the output directory, found with a single directory listing.
+    Empty files are left out, they are frames a killed render never finished.
+    """
+    if not os.path.isdir(outputDir):
+        return set()
+    pattern = re.compile(r"^%s\.(\d{%d,})\.%s$" % (re.escape(prefix), padding, re.escape(extension)))
+    frames = set()
+    for name in os.listdir(outputDir):
+        match = pattern.match(name)
+        if match and os.path.getsize(os.path.join(outputDir, name)) > 0:
+            frames.add(int(match.group(1)))
+    return frames
+
+
+def frame_written(outputDir, frame, extension, prefix=IMAGE_PREFIX, padding=FRAME_PADDING):
+    path = os.path.join(outputDir, frame_filename(frame, extension, prefix, padding))
+    return os.path.isfile(path) and os.path.getsize(path) > 0
+
+
+def missing_frames(startFrame, endFrame, done):
+    return [frame for frame in range(startFrame, endFrame + 1) if frame not in done]
+
+
+def chunk_frames(frames, chunkSize):
+    """
+    split a sorted list of frames into (start, end, step) runs of evenly spaced frames, at most chunkSize frames
+    long. A run is one Render call, -s start -e end -b step.
+    """
+    chunks = []
+    count = 0
+    for frame in frames:
+        if chunks and count < chunkSize:
+            start, end, step = chunks[-1]
+            # the second frame of a run decides its step
+            if frame - end == step or (start == end and frame > end):
+                chunks[-1] = (start, frame, frame - end)
+                count += 1
+                continue
+        chunks.append((frame, frame, 1))
+        count = 1
+    return chunks
+
+
+def chunk_range(chunk):
+    start, end, step = chunk
+    return list(range(start, end + 1, step))
+
+
+def progressive_passes(frames, coarsest=64):
+    """
+    order frames coarse to fine: every coarsest-th frame first, then the frames halfway between them, and so on
+    down to every frame. Returns the passes, each a sorted list of evenly spaced frames. coarsest is a power of two.
+    """
+    frames = sorted(frames)
+    passes = [frames[::coarsest]]
+    step = coarsest
+    while step > 1:
+        passes.append(frames[step // 2::step])
+        step //= 2
+    return [p for p in passes if p]
+
+
+def default_chunk_size(frameCount, processes):
+    # a few chunks per process keeps every process busy until the end without paying startup too often
+    return int(max(1, min(100, math.ceil(frameCount / float(processes * 4)))))
+
+
+def write_views_index(outputDir, views, extension, prefix=IMAGE_PREFIX):
+    """
+    describe the stills of a sparse render, [(frame, azimuth, elevation)], next to them.
+    """
+    if not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+    index = [{"frame": frame, "azimuth": azimuth, "elevation": elevation,
+              "image": frame_filename(frame, extension, prefix)} for frame, azimuth, elevation in views]
+    with open(os.path.join(outputDir, VIEWS_INDEX), "w") as f:
+        json.dump(index, f, indent=1)
+
+
+class RenderScheduler(object):
+    """
+    renders frames startFrame..endFrame of a scene into outputDir with up to `processes` Render commands at once.
+    """
+
+    def __init__(self, scene, outputDir, startFrame, endFrame, extension="png", processes=None, chunkSize=None,
+                 retries=2, renderExecutable=None, prefix=IMAGE_PREFIX, camera=CAMERA, frames=None,
+                 progressive=False, layers=None):
+        self.scene = scene
+        self.outputDir = outputDir
+        self.startFrame = startFrame
+        self.endFrame = endFrame
+        self.extension = extension
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunkSize = chunkSize
+        self.retries = retries
+        self.renderExecutable = renderExecutable or default_render_executable()
+        self.prefix = prefix
+        self.camera = camera
+        # only these frames of the range when given, sparse views
+        self.frames = sorted(frames) if frames is not None else None
+        # coarse to fine frame order instead of start to end
+        self.progressive = progressive
+        # render layers rendered by every Render call, a frame is done once all of them wrote it
+        self.layers = list(layers) if layers else None
+
+        self.skipped = 0
+        self.chunkResults = []
+        self.started = None
+        self.finished = False
+        self.finishedTime = None
+        self.cancelled = False
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def render_command(self, start, end, step=1):
+        if not self.layers:
+            return [self.renderExecutable, "-r", "sw", "-s", str(start), "-e", str(end), "-b", str(step),
+                    "-cam", self.camera, "-rd", self.outputDir, "-im", self.prefix, self.scene]
+        # the scene is loaded once for all the layers, each one writes into its own folder
+        return [self.renderExecutable, "-r", "sw", "-s", str(start), "-e", str(end), "-b", str(step),
+                "-cam", self.camera, "-rl", ",".join(self.layers), "-rd", self.outputDir,
+                "-im", LAYER_TOKEN + "/" + self.prefix, self.scene]
+
+    def frame_dirs(self):
+        """
+        the folders the images are written to, one per layer.
+        """
+        if not self.layers:
+            return [self.outputDir]
+        return [os.path.join(self.outputDir, layer) for layer in self.layers]
+
+    def frame_done(self, frame):
+        return all(frame_written(frameDir, frame, self.extension, self.prefix) for frameDir in self.frame_dirs())
+
+    def job_frames(self):
+        if self.frames is not None:
+            return list(self.frames)
+        return list(range(self.startFrame, self.endFrame + 1))
+
+    def pending_frames(self):
+        done = None
+        for frameDir in self.frame_dirs():
+            frames = existing_frames(frameDir, self.extension, self.prefix)
+            done = frames if done is None else done & frames
+        return [frame for frame in self.job_frames() if frame not in done]
+
+    def job_chunks(self, frames):
+        """
+        the Render calls for the frames, in the order they should start.
+        """
+        chunkSize = self.chunkSize or default_chunk_size(len(frames), self.processes)
+        if not self.progressive:
+            return chunk_frames(frames, chunkSize)
+        passes = progressive_passes(frames)
+        # the coarse passes are too small to pay a Render call per chunk of their own. They are rendered together,
+        # shared by all the processes in chunks of at least a quarter of the job's chunk size so they finish first,
+        # and the finer passes in chunks of the job's size, about as many Render calls as a full job
+        coarse = []
+        while passes and len(coarse) < self.processes * max(1, chunkSize // 4):
+            coarse = sorted(coarse + passes.pop(0))
+        chunks = chunk_frames(coarse, int(math.ceil(len(coarse) / float(self.processes))))
+        for framePass in passes:
+            chunks.extend(chunk_frames(framePass, chunkSize))
+        return chunks
+
+    def render_chunk(self, chunk):
+        """
+        render one chunk, retrying the frames it did not write and the frames of Render calls that exited with an
+        error, the last image of a crashed call may be cut off. Returns the frames that are still missing.
+        """
+        start, end, step = chunk
+        logDir = os.path.join(self.outputDir, LOG_DIR)
+        attempt = 0
+        frames = chunk_range(chunk)
+        while True:
+            if self.cancelled:
+                return frames
+            chunkStart = time.time()
+            # the first error of the attempt is reported, with the log of its call
+            returnCode = None
+            failed = []
+            for subChunk in chunk_frames(frames, len(frames)):
+                logPath = os.path.join(logDir, "chunk_%04d-%04d-%d_try%d.log" % (subChunk + (attempt,)))
+                with open(logPath, "w") as log:
+                    subCode = self.call_render(self.render_command(*subChunk), log)
+                if subCode not in (0, None):
+                    failed.extend(chunk_range(subChunk))
+                if returnCode in (0, None):
+                    returnCode, resultLog = subCode, logPath
+            frames = [frame for frame in frames if frame in failed or not self.frame_done(frame)]
+            missing = [frame for frame in frames if not self.frame_done(frame)]
+            with self._lock:
+                self.chunkResults.append({"chunk": [start, end, step], "attempt": attempt, "return_code": returnCode,
+                                          "missing": len(missing), "started": chunkStart, "log": resultLog,
+                                          "seconds": round(time.time() - chunkStart, 3)})
+            if not frames or attempt >= self.retries or self.cancelled:
+                return missing
+            attempt += 1
+            print("Retrying %d frames of chunk %d-%d." % (len(frames), start, end))
+
+    def call_render(self, command, log):
+        """
+        run one Render process to the end, unless the job is cancelled. Returns its exit code.
+        """
+        with self._lock:
+            if self.cancelled:
+                return None
+            try:
+                process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, **NEW_PROCESS_GROUP)
+            except OSError as e:
+                # the render executable could not be started at all
+                log.write("%s\n" % e)
+                return -1
+            self._processes.add(process)
+        try:
+            return process.wait()
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+    def cancel(self):
+        """
+        stop the job: chunks not started yet are dropped and the running Render processes are killed.
+        """
+        with self._lock:
+            self.cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            kill_process_tree(process)
+
+    def run(self):
+        """
+        render everything still missing and return a report. Frames found on disk are not rendered again.
+        """
+        self.started = time.time()
+        self.finished = False
+        for directory in [os.path.join(self.outputDir, LOG_DIR)] + self.frame_dirs():
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        frames = self.pending_frames()
+        total = len(self.job_frames())
+        self.skipped = total - len(frames)
+        start = time.time()
+        chunks = self.job_chunks(frames)
+        if self.skipped:
+            print("Resuming, %d of %d frames are already rendered." % (self.skipped, total))
+
+        stillMissing = []
+        try:
+            if chunks:
+                pool = ThreadPool(min(self.processes, len(chunks)))
+                try:
+                    for missing in pool.map(self.render_chunk, chunks, chunksize=1):
+                        stillMissing.extend(missing)
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            self.finishedTime = time.time()
+            self.finished = True
+        return {"scene": self.scene,
+                "output_dir": self.outputDir,
+                "layers": self.layers,
+                "frame_dirs": self.frame_dirs(),
+                "frames": [self.startFrame, self.endFrame],
+                "frame_count": total,
+                "progressive": self.progressive,
+                "processes": self.processes,
+                "chunks": len(chunks),
+                "skipped": self.skipped,
+                "rendered": len(frames) - len(stillMissing),
+                "missing": sorted(stillMissing),
+                "cancelled": self.cancelled,
+                "seconds": round(time.time() - start, 3),
+                "chunk_results": self.chunkResults}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a scene with several local render processes.")
+    parser.add_argument("scene", help="maya scene prepared by the previewer")
+    parser.add_argument("-o", "--output", required=True, help="output directory")
+    parser.add_argument("-s", "--start", type=int, default=1, help="start frame")
+    parser.add_argument("-e", "--end", type=int, required=True, help="end frame")
+    parser.add_argument("-j", "--processes", type=int, default=multiprocessing.cpu_count(),
+                        help="number of render processes (default: number of cores)")
+    parser.add_argument("--chunk-size", type=int, help="frames per render process call")
+    parser.add_argument("--retries", type=int, default=2, help="times a failed chunk is retried")
+    parser.add_argument("--format", default="png", help="image extension to look for when resuming")
+    parser.add_argument("--frames", type=int, nargs="+", help="render only these frames of the range")
+    parser.add_argument("--progressive", action="store_true",
+                        help="render every 64th frame first, then every 32nd and so on, for an early preview")
+    parser.add_argument("--layers", nargs="+", help="render these render layers, each into a sub folder")
+    parser.add_argument("--render-executable", help="maya Render command (default: $MAYA_LOCATION/bin/Render)")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    scheduler = RenderScheduler(args.scene, args.output, args.start, args.end, extension=args.format,
+                                processes=args.processes, chunkSize=args.chunk_size, retries=args.retries,
+                                renderExecutable=args.render_executable, frames=args.frames,
+                                progressive=args.progressive, layers=args.layers)
+    report = scheduler.run()
+    print("Rendered %d frames, skipped %d, %d missing, in %.1f seconds." % (report["rendered"], report["skipped"],
+                                                                           len(report["missing"]),
+                                                                           report["seconds"]))
+    return 0 if not report["missing"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+# Title: Simple Model Previewer - prepared scene cache
+# Description: Keeps the fully prepared scene of a model (centered roots, sky light rig, camera and its orbit) as a
+#              maya binary file next to the asset, in a .smp_cache folder. The file name carries a key made from the
+#              model file hash and the previewer settings used to prepare it, so a reload with the same settings
+#              opens it directly instead of importing and preparing the model again.
+# License: GPL v3
+
+
+import glob
+import os
+
+import maya.cmds as cmds
+
+import smp_cache
+
+
+CACHE_FOLDER = ".smp_cache"
+# bump when the preparation steps change, older cached scenes are then ignored
+CACHE_VERSION = 4
+
+
+def cache_key(modelFile, settings):
+    return smp_cache.digest([CACHE_VERSION, smp_cache.file_digest(modelFile), settings])
+
+
+def cache_path(modelFile, settings):
+    base = os.path.splitext(os.path.basename(modelFile))[0]
+    key = cache_key(modelFile, settings)
+    return os.path.join(os.path.dirname(os.path.abspath(modelFile)), CACHE_FOLDER, "%s_%s.mb" % (base, key[:16]))
+
+
+def scene_is_untouched():
+    """
+    True when opening another scene loses nothing: no geometry and no unsaved changes.
+    """
+    return not cmds.ls(geometry=True) and not cmds.file(q=True, modified=True)
+
+
+def store(path):
+    """
+    export the current scene as the cached scene of a model, removing the ones cached with other settings.
+    Returns False when the asset folder is not writable.
+    """
+    directory = os.path.dirname(path)
+    base = os.path.basename(path).rsplit("_", 1)[0]
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for old in glob.glob(os.path.join(directory, base + "_" + "?" * 16 + ".mb")):
+            if old != path:
+                os.remove(old)
+        cmds.file(path, exportAll=True, type="mayaBinary", force=True)
+    except (IOError, OSError, RuntimeError) as e:
+        print("Warning, unable to cache the prepared scene in %s. %s" % (directory, e))
+        return False
+    return True
+
+
+def open_cached(path, modelFile):
+    """
+    open a cached scene. It is renamed right away so that saving it never overwrites the cache.
+    """
+    cmds.file(path, open=True, force=True)
+    cmds.file(rename=os.path.splitext(os.path.abspath(modelFile))[0] + "_smp_preview.mb")
@@ -0,0 +1,229 @@
+# Title: Simple Model Previewer - settings
+# Description: The settings of a preview (animation length and frame rate, frame range, output size and format, light
+#              rig, camera orbit, render mode and quality, caches) as one plain object, apart from maya and the
+#              window. The frame numbers and the image format id are derived from it, it checks its own values and
+#              goes to and from json, so the same settings drive the window, the batch driver and its workers.
+#              Presets are json files in ~/smp_presets, or in the folder $SMP_PRESETS names, a share the whole
+#              farm reads from.
+# License: GPL v3
+# Usage:
+#   settings = smp_settings.PreviewSettings(outputWidth=1280, outputHeight=720, quality="final")
+#   smp_settings.save_preset(settings, "hd_final")
+#   settings = smp_settings.load_preset("hd_final")
+
+
+import json
+import multiprocessing
+import os
+
+import smp_encode
+import smp_monitor
+import smp_quality
+import smp_render
+
+
+# maya software image format ids of the supported output formats
+OUTPUT_FORMAT_IDS = {"png": 32, "tif": 3, "tga": 19}
+FPS_CHOICES = [12, 24, 25, 30, 50, 60]
+PRESET_ENV_VAR = "SMP_PRESETS"
+PRESET_SUFFIX = ".json"
+
+# the settings a preview is made with, in the order they are listed
+SETTING_KEYS = ("frameLength", "animationFPS", "startFrame", "endFrame",
+                "outputWidth", "outputHeight", "pixelAspectRatio", "deviceAspectRatio", "outputFormat",
+                "skyRig", "skyRigOptions", "orbit", "orbitOptions", "renderProcesses",
+                "useRenderCache", "useSceneCache", "tightFraming", "inputMaterialFilename", "materialRules",
+                "renderMode", "sparseViews", "quality", "draftPreview", "stallSeconds",
+                "encodePreview", "viewportProxy", "renderVariants")
+# choices of the settings checked here, the light rigs, orbits and proxies are checked by smp_core within maya
+CHOICES = {"outputFormat": sorted(OUTPUT_FORMAT_IDS),
+           "renderMode": smp_render.RENDER_MODES,
+           "quality": smp_quality.TIER_NAMES,
+           "encodePreview": smp_encode.ENCODE_MODES}
+
+
+class PreviewSettings(object):
+    """
+    the settings of a preview, keyword arguments override the defaults.
+    """
+
+    def __init__(self, **values):
+        self.frameLength = 60.0
+        self.animationFPS = 24
+        self.startFrame = 1
+        # None renders to the end of the animation
+        self.endFrame = None
+
+        self.outputWidth = 720
+        self.outputHeight = 576
+        self.pixelAspectRatio = 1.0
+        self.deviceAspectRatio = 720.0 / 576.0
+        self.outputFormat = "png"
+
+        # strategy of the simulated skylight, see smp_skyrig
+        self.skyRig = "full"
+        self.skyRigOptions = {}
+        # camera motion, see smp_orbit
+        self.orbit = "turntable"
+        self.orbitOptions = {}
+        # frame the camera on a bounding sphere of the vertices instead of the bounding box, needs NumPy
+        self.tightFraming = False
+        # stand-ins drawn instead of heavy model roots, see smp_proxy
+        self.viewportProxy = "decimated"
+
+        # number of local render processes the frame range is shared between
+        self.renderProcesses = multiprocessing.cpu_count()
+        # frames rendered before with the same settings are taken from the render cache, see smp_cache
+        self.useRenderCache = True
+        # prepared scenes are cached next to the asset, see smp_scenecache
+        self.useSceneCache = True
+
+        self.inputMaterialFilename = ""
+        # rules assigning the materials across the whole model, see smp_materials
+        self.materialRules = []
+        # render the model in every material of the library, one render layer each, see smp_variants
+        self.renderVariants = False
+
+        # full turntable, a few sparse views or the turntable coarse to fine, see smp_render
+        self.renderMode = "full"
+        self.sparseViews = 8
+        # quality tier a render goes to, see smp_quality
+        self.quality = "final"
+        # render the draft tier first for a fast downscaled look, before a final render
+        self.draftPreview = True
+        # movie and contact sheet encoded from the frames while they render, see smp_encode
+        self.encodePreview = "both"
+        # seconds without a new frame before a render counts as stalled, see smp_monitor
+        self.stallSeconds = smp_monitor.STALL_SECONDS
+
+        self.update(values)
+
+    @property
+    def totalFramenumber(self):
+        return int(self.frameLength * self.animationFPS)
+
+    @property
+    def endFrame(self):
+        return self.totalFramenumber if self._endFrame is None else self._endFrame
+
+    @endFrame.setter
+    def endFrame(self, value):
+        self._endFrame = value
+
+    @property
+    def outputFormatID(self):
+        return OUTPUT_FORMAT_IDS[self.outputFormat]
+
+    def update(self, values):
+        for key, value in values.items():
+            if key not in SETTING_KEYS:
+                raise ValueError("Unknown setting %s" % key)
+            setattr(self, key, value)
+
+    def to_dict(self, changedOnly=False):
+        """
+        the settings as json types. With changedOnly only the ones that differ from the defaults, an end frame
+        following the animation length is None.
+        """
+        values = dict((key, getattr(self, key)) for key in SETTING_KEYS)
+        values["endFrame"] = self._endFrame
+        if changedOnly:
+            defaults = PreviewSettings().to_dict()
+            values = dict((key, value) for key, value in values.items() if value != defaults[key])
+        return json.loads(json.dumps(values))
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
+
+    def copy(self):
+        return PreviewSettings.from_dict(self.to_dict())
+
+    def problems(self, choices=None):
+        """
+        what is wrong with the settings, as readable lines. choices adds {setting: allowed values} to CHOICES.
+        """
+        problems = []
+        allChoices = dict(CHOICES)
+        allChoices.update(choices or {})
+        for key, allowed in sorted(allChoices.items()):
+            if getattr(self, key) not in allowed:
+                problems.append("%s %s is not one of %s" % (key, getattr(self, key), ", ".join(map(str, allowed))))
+        for key in ("frameLength", "animationFPS", "outputWidth", "outputHeight", "pixelAspectRatio",
+                    "deviceAspectRatio", "renderProcesses", "sparseViews", "stallSeconds"):
+            value = getattr(self, key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                problems.append("%s must be a positive number, not %r" % (key, value))
+        if not problems:
+            if self.totalFramenumber < 1:
+                problems.append("the animation is shorter than a frame")
+            elif not 1 <= self.startFrame <= self.endFrame:
+                problems.append("frame range %s-%s is not within 1-%d" % (self.startFrame, self.endFrame,
+                                                                          self.totalFramenumber))
+        for key in ("skyRigOptions", "orbitOptions"):
+            if not isinstance(getattr(self, key), dict):
+                problems.append("%s must be a dictionary" % key)
+        if not isinstance(self.materialRules, list):
+            problems.append("materialRules must be a list")
+        return problems
+
+    def validate(self, choices=None):
+        """
+        raise ValueError naming every problem of the settings.
+        """
+        problems = self.problems(choices)
+        if problems:
+            raise ValueError("Invalid settings: %s" % "; ".join(problems))
+        return self
+
+    def save(self, path, changedOnly=False):
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(changedOnly), f, indent=1, sort_keys=True)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def preset_dir():
+    return os.environ.get(PRESET_ENV_VAR) or os.path.join(os.path.expanduser("~"), "smp_presets")
+
+
+def preset_path(name):
+    """
+    the file of a preset, a name in the preset folder or a path to a json file.
+    """
+    if name.endswith(PRESET_SUFFIX) or os.sep in name:
+        return name
+    return os.path.join(preset_dir(), name + PRESET_SUFFIX)
+
+
+def preset_names():
+    directory = preset_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-len(PRESET_SUFFIX)] for name in os.listdir(directory) if name.endswith(PRESET_SUFFIX))
+
+
+def save_preset(settings, name):
+    """
+    write the settings that differ from the defaults as a preset, so a machine with other defaults (the number of
+    render processes) keeps its own. Returns the file.
+    """
+    return settings.save(preset_path(name), changedOnly=True)
+
+
+def load_preset(name):
+    path = preset_path(name)
+    if not os.path.isfile(path):
+        raise ValueError("No preset %s, the presets in %s are: %s" % (name, preset_dir(),
+                                                                      ", ".join(preset_names()) or "none"))
+    try:
+        return PreviewSettings.load(path)
+    except ValueError as e:
+        raise ValueError("Preset %s: %s" % (path, e))
@@ -0,0 +1,173 @@
+# Title: Simple Model Previewer - sky light rig
+# Description: Builds the simulated skylight (SMP_Lights) with one of several strategies. Every strategy keeps the
+#              total light energy of the original rig: three rings of directional lights every 5 degrees at +75, 0
+#              and -75 degrees plus a top light, with intensities from the generalIntensity formula.
+# License: GPL v3
+
+
+import json
+
+import maya.cmds as cmds
+
+
+RIG_GROUP = "SMP_Lights"
+# string attribute on the rig group recording how it was built, so an identical rig can be reused
+RIG_TAG_ATTR = "smpSkyRig"
+
+# the original rig: 3 rings at +75, 0, -75 degree, the middle ring twice as bright, plus a top light
+ANGLE_STEP = 5.0
+RING_ANGLES = (75.0, 0.0, -75.0)
+RING_WEIGHTS = (1.0, 2.0, 1.0)
+TOP_ROTATION = (-90, 0, 0)
+# this formula gives the unit light intensity
+GENERAL_INTENSITY = 1 / (360.0 / ANGLE_STEP * 3) * 1.5
+RING_ENERGY = [GENERAL_INTENSITY * weight * 360.0 / ANGLE_STEP for weight in RING_WEIGHTS]
+TOP_ENERGY = GENERAL_INTENSITY * 360 / ANGLE_STEP * 0.5
+
+# averaged over every surface orientation a directional light delivers a quarter of its intensity,
+# while an ambient light without shading delivers all of it
+AMBIENT_FACTOR = 0.25
+
+GOLDEN_ANGLE = 137.50776
+
+
+def full_rig():
+    """
+    the original 217 light rig, 72 lights per ring.
+    """
+    lights = []
+    angle = 0.0
+    while (angle < 360.0):
+        for ring, elevation in enumerate(RING_ANGLES):
+            lights.append(("directionalLight", GENERAL_INTENSITY * RING_WEIGHTS[ring], (elevation, angle, 0)))
+        angle += ANGLE_STEP
+    lights.append(("directionalLight", TOP_ENERGY, TOP_ROTATION))
+    return lights
+
+
+def adaptive_rig(ringLights=12):
+    """
+    the same three rings with fewer, brighter lights. Each ring keeps its energy whatever the count.
+    """
+    ringLights = max(int(ringLights), 1)
+    step = 360.0 / ringLights
+    lights = []
+    for index in range(ringLights):
+        for ring, elevation in enumerate(RING_ANGLES):
+            lights.append(("directionalLight", RING_ENERGY[ring] / ringLights, (elevation, index * step, 0)))
+    lights.append(("directionalLight", TOP_ENERGY, TOP_ROTATION))
+    return lights
+
+
+def importance_rig(lightCount=24):
+    """
+    lightCount lights in total, the top light and the rest shared out between the rings in proportion to their
+    energy so that every light carries about the same intensity, at least one per ring. Rings are rotated against
+    each other by the golden angle to avoid banding.
+    """
+    ringBudget = max(int(lightCount) - 1, len(RING_ANGLES))
+    totalRingEnergy = sum(RING_ENERGY)
+    shares = [ringBudget * energy / totalRingEnergy for energy in RING_ENERGY]
+    counts = [1] * len(RING_ANGLES)
+    # the lights left go one by one to the ring furthest below its share, the counts add up to the budget
+    for extra in range(ringBudget - len(counts)):
+        ring = max(range(len(counts)), key=lambda index: shares[index] - counts[index])
+        counts[ring] += 1
+    lights = []
+    for ring, elevation in enumerate(RING_ANGLES):
+        step = 360.0 / counts[ring]
+        offset = (ring * GOLDEN_ANGLE) % step
+        for index in range(counts[ring]):
+            lights.append(("directionalLight", RING_ENERGY[ring] / counts[ring],
+                           (elevation, offset + index * step, 0)))
+    lights.append(("directionalLight", TOP_ENERGY, TOP_ROTATION))
+    return lights
+
+
+def ambient_key_rig():
+    """
+    the rings collapsed into one ambient light, the top light kept as a directional key.
+    """
+    return [("ambientLight", sum(RING_ENERGY) * AMBIENT_FACTOR, (0, 0, 0)),
+            ("directionalLight", TOP_ENERGY, TOP_ROTATION)]
+
+
+def dome_rig():
+    """
+    a single ambient light carrying the energy of the whole rig.
+    """
+    return [("ambientLight", (sum(RING_ENERGY) + TOP_ENERGY) * AMBIENT_FACTOR, (0, 0, 0))]
+
+
+STRATEGIES = {"full": full_rig,
+              "adaptive": adaptive_rig,
+              "importance": importance_rig,
+              "ambient_key": ambient_key_rig,
+              "dome": dome_rig}
+STRATEGY_NAMES = ["full", "adaptive", "importance", "ambient_key", "dome"]
+
+
+def light_specs(strategy, **options):
+    if strategy not in STRATEGIES:
+        raise ValueError("Unknown sky rig strategy %s" % strategy)
+    return STRATEGIES[strategy](**options)
+
+
+def rig_energy(lights):
+    """
+    total energy of a list of light specs, ambient lights converted to their directional equivalent.
+    """
+    total = 0.0
+    for lightType, intensity, rotation in lights:
+        if lightType == "ambientLight":
+            total += intensity / AMBIENT_FACTOR
+        else:
+            total += intensity
+    return total
+
+
+def rig_tag(strategy, options):
+    return json.dumps([strategy, sorted(options.items())])
+
+
+def build_rig(strategy="full", **options):
+    """
+    create the lights of a strategy and group them as SMP_Lights. Returns the group name.
+    """
+    lightList = []
+    for lightType, intensity, rotation in light_specs(strategy, **options):
+        if lightType == "ambientLight":
+            light = cmds.ambientLight(intensity=intensity)
+            # no directional shading, the light fills every side of the model evenly
+            cmds.setAttr(light + ".ambientShade", 0)
+        else:
+            light = cmds.directionalLight(intensity=intensity, rotation=rotation)
+        lightList.append(light)
+    # organize all lights into group
+    group = cmds.group(lightList, n=RIG_GROUP)
+    cmds.addAttr(group, longName=RIG_TAG_ATTR, dataType="string")
+    cmds.setAttr(group + "." + RIG_TAG_ATTR, rig_tag(strategy, options), type="string")
+    return group
+
+
+def ensure_rig(strategy="full", **options):
+    """
+    reuse the SMP_Lights group already in the scene when it was built with the same strategy and options,
+    otherwise replace it. Returns the group name.
+    """
+    if cmds.ls(RIG_GROUP):
+        if cmds.attributeQuery(RIG_TAG_ATTR, node=RIG_GROUP, exists=True) and \
+                cmds.getAttr(RIG_GROUP + "." + RIG_TAG_ATTR) == rig_tag(strategy, options):
+            return RIG_GROUP
+        cmds.delete(RIG_GROUP)
+    return build_rig(strategy, **options)
+
+
+def rig_lights(lights):
+    """
+    split a list of long light names into the ones belonging to the rig and all the others.
+    """
+    prefix = "|" + RIG_GROUP + "|"
+    own = [light for light in lights if light.startswith(prefix)]
+    others = [light for light in lights if not light.startswith(prefix)]
+    return own, others
@@ -0,0 +1,105 @@
+# Title: Simple Model Previewer - material variant layers
+# Description: Renders the model in every material of the library from one scene. Each material gets a render layer
+#              holding the model, the sky light rig and the camera, with a layer override assigning that material to
+#              the whole model, and the master layer is left out of the render. A Render call then renders every
+#              variant of its frames, so the scene is loaded and translated once for all of them instead of once per
+#              material, and the images of a variant go to a folder named after its layer. The layers exist only in
+#              the scene written for rendering, the open scene keeps its own assignment.
+# License: GPL v3
+
+
+import maya.cmds as cmds
+
+import smp_materials
+import smp_render
+import smp_skyrig
+
+
+LAYER_PREFIX = "variant_"
+MASTER_LAYER = "defaultRenderLayer"
+
+
+def layer_name(material):
+    return LAYER_PREFIX + material
+
+
+def variant_layers(materials):
+    return [layer_name(material) for material in materials]
+
+
+def available_materials(materials):
+    """
+    the materials that have a shading group in the scene, in the given order.
+    """
+    return [material for material in materials if cmds.objExists(smp_materials.shading_group(material))]
+
+
+def scene_layers():
+    return cmds.ls(LAYER_PREFIX + "*", type="renderLayer") or []
+
+
+def layer_members(hierarchy):
+    # lights and the camera outside of a layer do not take part in its render
+    return hierarchy.roots() + [node for node in (smp_skyrig.RIG_GROUP, smp_render.CAMERA) if cmds.objExists(node)]
+
+
+def build_layers(materials, hierarchy):
+    """
+    one render layer per material with the whole model in that material, the master layer is not rendered.
+    Returns the layers.
+    """
+    remove_layers()
+    shapes = cmds.ls(hierarchy.shapes, type=smp_materials.ASSIGNABLE_SHAPE_TYPES, long=True) or []
+    members = layer_members(hierarchy)
+    layers = []
+    try:
+        for material in materials:
+            layer = cmds.createRenderLayer(members, name=layer_name(material), makeCurrent=True)
+            if layer != layer_name(material):
+                raise RuntimeError("Render layer %s is named %s, its images would go elsewhere" %
+                                   (layer_name(material), layer))
+            # an assignment made while a layer is current is an override of that layer only
+            smp_materials.assign({smp_materials.shading_group(material): shapes})
+            cmds.setAttr(layer + ".renderable", 1)
+            layers.append(layer)
+    except Exception:
+        remove_layers()
+        raise
+    finally:
+        cmds.editRenderLayerGlobals(currentRenderLayer=MASTER_LAYER)
+    cmds.setAttr(MASTER_LAYER + ".renderable", 0)
+    return layers
+
+
+def remove_layers():
+    """
+    delete the variant layers, the master layer is rendered again.
+    """
+    layers = scene_layers()
+    if not layers:
+        return
+    cmds.editRenderLayerGlobals(currentRenderLayer=MASTER_LAYER)
+    cmds.delete(layers)
+    cmds.setAttr(MASTER_LAYER + ".renderable", 1)
+
+
+class VariantLayers(object):
+    """
+    context manager building the variant layers of the materials, for writing the render scene. Without
+    materials it does nothing.
+    """
+
+    def __init__(self, materials, hierarchy):
+        self.materials = materials
+        self.hierarchy = hierarchy
+        self.layers = []
+
+    def __enter__(self):
+        if self.materials:
+            self.layers = build_layers(self.materials, self.hierarchy)
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if self.materials:
+            remove_layers()
+        return False
@@ -0,0 +1,78 @@
+# Title: Simple Model Previewer - window test
+# Description: Loads and reloads a synthetic model through the window class on the stand-in maya module, a reload
+#              opens the prepared scene cached by the first load instead of preparing the model again, also when
+#              the batch prepared it without viewport proxies.
+# License: GPL v3
+# Usage:
+#   python -m pytest test_simpleModelPreviewer.py
+
+
+import json
+import sys
+
+import pytest
+
+import smp_benchmark
+
+
+@pytest.fixture
+def fake_cmds():
+    # the modules bound to the stand-in are dropped afterwards, other tests start their own maya
+    before = set(sys.modules)
+    import smp_fakemaya
+    cmds = smp_fakemaya.install()
+    yield cmds
+    for name in set(sys.modules) - before:
+        del sys.modules[name]
+
+
+def make_previewer(tmpdir):
+    import simpleModelPreviewer
+    smp = simpleModelPreviewer.simpleModelPreviewer()
+    smp.settings.viewportProxy = "none"
+    smp.inputModelFilename = smp_benchmark.write_scene(smp_benchmark.synthetic_scene(8), str(tmpdir), "chair")
+    return smp
+
+
+def test_reload_opens_prepared_scene(tmpdir, fake_cmds):
+    answers = []
+    fake_cmds._fake.confirmDialog = lambda *args, **kwargs: answers.append(kwargs["title"]) or "Open Prepared"
+    smp = make_previewer(tmpdir)
+    smp.reload_model()
+    assert smp.lastLoad["mode"] == "cold"
+
+    smp.reload_model()
+    assert answers == ["Prepared scene cached."]
+    assert smp.lastLoad["mode"] == "warm"
+    assert smp.hierarchy.shapes
+
+
+def test_reload_imports_when_declined(tmpdir, fake_cmds):
+    fake_cmds._fake.confirmDialog = lambda *args, **kwargs: "Import"
+    smp = make_previewer(tmpdir)
+    smp.reload_model()
+    smp.reload_model()
+    assert smp.lastLoad["mode"] == "cold"
+
+
+def test_window_opens_batch_prepared_scene(tmpdir, fake_cmds):
+    import simpleModelPreviewer
+    import smp_core
+    import smp_proxy
+    import smp_settings
+    model = str(tmpdir.join("scan.ma"))
+    with open(model, "w") as f:
+        json.dump({"nodes": [{"name": "scan", "type": "transform"},
+                             {"name": "scanShape", "type": "mesh", "parent": "scan",
+                              "bbox": [-1, -1, -1, 1, 1, 1], "attrs": {"faces": 400000}}]}, f)
+    batch = smp_core.ModelPreviewer(smp_settings.PreviewSettings(viewportProxy="none"))
+    batch.replaceScene = True
+    batch.import_model(model)
+    assert batch.lastLoad["mode"] == "cold"
+    assert not batch.proxies
+
+    smp = simpleModelPreviewer.simpleModelPreviewer()
+    smp.import_model(model, replaceScene=True)
+    assert smp.lastLoad["mode"] == "warm"
+    assert smp.proxies
+    assert smp_proxy.scene_proxy_mode() == smp.settings.viewportProxy
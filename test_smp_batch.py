@@ -0,0 +1,94 @@
+# Title: Simple Model Previewer - batch driver test
+# Description: Runs the batch driver end to end on the stand-in maya module, synthetic models and a stand-in Render
+#              command writing placeholder images: the manifest, the images of every asset, a second run resuming
+#              from the frames on disk and a worker dying on an asset.
+# License: GPL v3
+# Usage:
+#   python -m pytest test_smp_batch.py
+
+
+import json
+import os
+import stat
+import sys
+
+import smp_batch
+import smp_benchmark
+
+
+# writes a placeholder image for every frame and layer of the call, like maya's Render
+FAKE_RENDER = """#!%s
+import os, sys
+args = sys.argv
+value = lambda flag: args[args.index(flag) + 1]
+start, end, step = int(value("-s")), int(value("-e")), int(value("-b"))
+layers = value("-rl").split(",") if "-rl" in args else [None]
+for layer in layers:
+    name = value("-im").replace("<RenderLayer>", layer) if layer else value("-im")
+    directory = os.path.dirname(os.path.join(value("-rd"), name))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for frame in range(start, end + 1, step):
+        with open(os.path.join(value("-rd"), "%%s.%%04d.png" %% (name, frame)), "w") as f:
+            f.write("x")
+"""
+FRAMES = 12
+
+
+def make_batch(tmpdir, names, monkeypatch):
+    monkeypatch.setenv("SMP_RENDER_CACHE", str(tmpdir.join("render_cache")))
+    assets = tmpdir.mkdir("assets")
+    for name in names:
+        smp_benchmark.write_scene(smp_benchmark.synthetic_scene(8), str(assets), name)
+    render = str(tmpdir.join("Render"))
+    with open(render, "w") as f:
+        f.write(FAKE_RENDER % sys.executable)
+    os.chmod(render, os.stat(render).st_mode | stat.S_IEXEC)
+    return str(assets), render
+
+
+def run(assets, render, output, *options):
+    argv = ["--fake", "-j", "2", "--length", "1", "--fps", str(FRAMES), "--encode", "none",
+            "--progress-interval", "0", "--render-executable", render, "-o", output, assets] + list(options)
+    returnCode = smp_batch.main(argv)
+    with open(os.path.join(output, smp_batch.MANIFEST_NAME)) as f:
+        return returnCode, json.load(f)
+
+
+def frames(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith(".png"))
+
+
+def test_batch_renders_and_resumes(tmpdir, monkeypatch):
+    assets, render = make_batch(tmpdir, ["chair", "table"], monkeypatch)
+    output = str(tmpdir.join("renders"))
+    returnCode, manifest = run(assets, render, output)
+    assert returnCode == 0
+    assert (manifest["succeeded"], manifest["failed"]) == (2, 0)
+    for result in manifest["assets"]:
+        assert result["status"] == "ok", result["error"]
+        assert sorted(result["render"]) == ["draft", "final"]
+        assert result["render"]["final"]["rendered"] == FRAMES
+        assert len(frames(result["output_dir"])) == FRAMES
+        assert len(frames(os.path.join(result["output_dir"], "draft"))) == FRAMES
+
+    # the frames of the first run are on disk, nothing is rendered again
+    returnCode, manifest = run(assets, render, output)
+    assert returnCode == 0
+    for result in manifest["assets"]:
+        for tier in ("draft", "final"):
+            assert result["render"][tier]["rendered"] == 0
+            assert result["render"][tier]["skipped"] == FRAMES
+
+
+def test_batch_survives_dead_worker(tmpdir, monkeypatch):
+    assets, render = make_batch(tmpdir, ["chair", "table"], monkeypatch)
+    with open(os.path.join(assets, "broken.ma"), "w") as f:
+        json.dump({"crash": 139}, f)
+    returnCode, manifest = run(assets, render, str(tmpdir.join("renders")), "--no-draft-first")
+    assert returnCode == 1
+    results = dict((os.path.basename(result["asset"]), result) for result in manifest["assets"])
+    assert results["broken.ma"]["status"] == "failed"
+    assert results["broken.ma"]["error"].startswith("WorkerDied")
+    assert results["chair.ma"]["status"] == "ok"
+    assert results["table.ma"]["status"] == "ok"
@@ -0,0 +1,49 @@
+# Title: Simple Model Previewer - benchmark suite test
+# Description: Runs the benchmark regression suite against the stored baseline with the stand-in maya module, so a
+#              stage making more maya.cmds calls than its baseline fails the tests. Each run is a separate process,
+#              the stand-in replaces maya in the modules it loads.
+# License: GPL v3
+# Usage:
+#   python -m pytest test_smp_benchmark.py
+
+
+import os
+import subprocess
+import sys
+
+import smp_benchmark
+
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "smp_benchmark.py")
+
+
+def run_benchmark(*args):
+    process = subprocess.Popen([sys.executable, SCRIPT] + list(args), stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, universal_newlines=True)
+    output = process.communicate()[0]
+    return process.returncode, output
+
+
+def test_suite_matches_baseline():
+    # calls only, the times depend on the machine and on what else runs on it
+    returnCode, output = run_benchmark("--suite")
+    assert returnCode == 0, output
+    assert "No regression" in output
+
+
+def test_compare_reports_more_calls():
+    baseline = {"python": smp_benchmark.python_version(),
+                "results": {"10": {"prep_model": {"calls": 100, "seconds": 1.0}}}}
+    same = {"10": {"prep_model": {"calls": 105, "seconds": 1.0}}}
+    more = {"10": {"prep_model": {"calls": 120, "seconds": 1.0}}}
+    slower = {"10": {"prep_model": {"calls": 100, "seconds": 5.0}}}
+    assert smp_benchmark.compare(same, baseline) == []
+    assert len(smp_benchmark.compare(more, baseline)) == 1
+    assert smp_benchmark.compare(slower, baseline) == []
+    assert len(smp_benchmark.compare(slower, baseline, compareTimes=True)) == 1
+
+
+def test_materials_defaults():
+    returnCode, output = run_benchmark("--materials", "--json")
+    assert returnCode == 0, output
+    assert "\"shapes\": 100" in output